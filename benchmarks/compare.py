@@ -0,0 +1,53 @@
+"""Compare two benchmark result files and flag regressions.
+
+Usage:
+    python benchmarks/compare.py baseline.json current.json [--threshold 1.10]
+
+Exits with status 1 when any benchmark's median time grew by more than the threshold ratio.
+"""
+import argparse
+import json
+import sys
+
+
+def result_key(entry):
+    params = ", ".join(f"{k}={v}" for k, v in sorted(entry['params'].items()))
+    return f"{entry['benchmark']} [{entry['size'] or '-'}] {params}".strip()
+
+
+def load_results(path):
+    with open(path, 'r') as f:
+        report = json.load(f)
+    return {result_key(entry): entry for entry in report['results']}, report.get('environment', {})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare benchmark results")
+    parser.add_argument('baseline')
+    parser.add_argument('current')
+    parser.add_argument('--threshold', type=float, default=1.10, help="median ratio treated as a regression")
+    args = parser.parse_args()
+
+    baseline, baseline_env = load_results(args.baseline)
+    current, current_env = load_results(args.current)
+    print(f"baseline: {baseline_env.get('git_commit')}  current: {current_env.get('git_commit')}")
+
+    regressions = 0
+    for key in sorted(set(baseline) | set(current)):
+        if key not in baseline or key not in current:
+            print(f"  {'only in ' + ('current' if key in current else 'baseline'):<16} {key}")
+            continue
+        old = baseline[key]['seconds']['median']
+        new = current[key]['seconds']['median']
+        ratio = new / old if old > 0 else float('inf')
+        status = "REGRESSION" if ratio > args.threshold else ("faster" if ratio < 1 / args.threshold else "")
+        if status == "REGRESSION":
+            regressions += 1
+        print(f"  {ratio:6.2f}x  {old * 1000:9.2f} -> {new * 1000:9.2f} ms  {key}  {status}")
+
+    print(f"{regressions} regression(s) above {args.threshold:.2f}x")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
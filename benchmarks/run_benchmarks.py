@@ -0,0 +1,552 @@
+"""Headless benchmarks for the ingest and rendering hot paths.
+
+Usage:
+    python benchmarks/run_benchmarks.py --output results.json
+    python benchmarks/run_benchmarks.py --sizes 128x128x128 --repeat 3 --output quick.json
+    python benchmarks/compare.py baseline.json results.json
+
+Synthetic series are written once to --data-dir and reused between runs. Qt runs on the
+offscreen platform, so no display is needed.
+"""
+import argparse
+import csv
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_ROOT)
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import numpy as np # type: ignore
+from PyQt5.QtWidgets import QApplication # type: ignore
+from PyQt5.QtCore import QT_VERSION_STR # type: ignore
+from synthetic_dicom import write_series, write_multiframe
+from handlers.track_registry import TRACK_PALETTE
+
+DEFAULT_SIZES = "256x256x256,512x512x600,512x512x1200"
+ZOOM_LEVELS = [0.5, 1.0, 2.0, 4.0]
+REALTIME_POINT_COUNTS = [100, 1000, 10000]
+TRACK_COUNT = 4
+CSV_ROWS = 2000
+DECODE_SIZE = (256, 256, 64)
+
+
+def summarize(samples):
+    samples = np.asarray(samples, dtype=np.float64)
+    return {
+        'min': float(samples.min()),
+        'median': float(np.median(samples)),
+        'mean': float(samples.mean()),
+        'p95': float(np.percentile(samples, 95)),
+        'max': float(samples.max()),
+    }
+
+
+def measure(func, repeat, warmup=1):
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def result(name, size, samples, **params):
+    entry = {'benchmark': name, 'size': size, 'params': params, 'repeat': len(samples), 'seconds': summarize(samples)}
+    return entry
+
+
+def environment():
+    info = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'qt': QT_VERSION_STR,
+    }
+    for module in ('pydicom', 'PIL', 'vispy'):
+        try:
+            info[module] = __import__(module).__version__
+        except Exception:
+            info[module] = None
+    try:
+        info['git_commit'] = subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=REPO_ROOT,
+                                                     stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        info['git_commit'] = None
+    return info
+
+
+def bench_load(window, size_label, series_name, repeat):
+    samples = []
+    for _ in range(repeat):
+        window.volume3d = None
+        window.dicom_handler.volume3d = None
+        start = time.perf_counter()
+        volume3d, img_shape = window.dicom_handler.load_dicom_images(series_name)
+        samples.append(time.perf_counter() - start)
+    return [result('DicomHandler.load_dicom_images', size_label, samples)], volume3d
+
+
+def show_volume(window, volume3d):
+    window.volume3d = volume3d
+    window.global_min = float(volume3d.min())
+    window.global_max = float(volume3d.max())
+    from handlers.volume_geometry import VolumeGeometry
+    window.geometry = window.dicom_handler.geometry or VolumeGeometry(volume3d.shape)
+    window.X, window.Y, window.Z = (dim // 2 for dim in volume3d.shape)
+    window.Z_for_axis = window.geometry.index_to_slider(2, window.Z)
+    window.IsSelectedItem = 1
+
+
+def bench_rendering(window, size_label, volume3d, repeat):
+    results = []
+    gui = window.gui_components
+    panel = gui.panels[0]
+    xy_slice = volume3d[:, :, volume3d.shape[2] // 2]
+
+    samples = measure(lambda: gui.create_image_from_array(xy_slice, window.brightness, window.contrast), repeat)
+    results.append(result('GUIComponents.create_image_from_array', size_label, samples, plane='XY'))
+
+    for zoom in ZOOM_LEVELS:
+        samples = measure(lambda: gui.update_panel_image(panel, xy_slice, zoom, window.brightness, window.contrast), repeat)
+        results.append(result('GUIComponents.update_panel_image', size_label, samples, zoom=zoom))
+
+    extractors = {
+        'YZ': lambda: np.ascontiguousarray(np.flipud(np.rot90(volume3d[:, window.Y, :]))),
+        'XZ': lambda: np.ascontiguousarray(np.flipud(np.rot90(volume3d[window.X, :, :]))),
+    }
+    for plane, extract in extractors.items():
+        samples = measure(extract, repeat)
+        results.append(result('slice_extraction', size_label, samples, plane=plane))
+
+    for plane in ('XY', 'YZ', 'XZ'):
+        panel.plane_name = plane
+        samples = measure(lambda: window.load_panel_image(panel, 0), repeat)
+        results.append(result('MainWindow.load_panel_image', size_label, samples, plane=plane))
+    panel.plane_name = 'XY'
+    return results
+
+
+def bench_needle_path(size_label, volume3d, repeat):
+    from handlers.voxel_traversal import NeedlePath
+    rows, cols, slices = volume3d.shape
+    count = 1000
+    route = np.column_stack([np.linspace(cols * 0.1, cols * 0.9, count), np.linspace(rows * 0.2, rows * 0.8, count),
+                             np.linspace(0, slices - 1, count)])
+    route += np.random.default_rng(0).normal(0, 0.3, size=route.shape)
+
+    def full():
+        NeedlePath(volume3d).update(route)
+    samples = measure(full, repeat)
+    results = [result('NeedlePath.update', size_label, samples, mode='full', points=count)]
+
+    # One new sample per call, then the tip read, as during a live insertion
+    path = NeedlePath(volume3d)
+    path.update(route[:count // 2])
+    received = [count // 2]
+    def one_more():
+        received[0] = min(received[0] + 1, count)
+        path.update(route[:received[0]])
+        path.tip()
+    samples = measure(one_more, min(repeat, count // 2 - 1))
+    results.append(result('NeedlePath.update', size_label, samples, mode='incremental', points=1))
+    return results
+
+
+def bench_histogram(size_label, volume3d, repeat):
+    from handlers.volume_histogram import VolumeHistogram
+    histogram = VolumeHistogram()
+    index = [0]
+    def add_slice():
+        histogram.add(volume3d[:, :, index[0] % volume3d.shape[2]])
+        index[0] += 1
+    samples = measure(add_slice, repeat)
+    results = [result('VolumeHistogram.add', size_label, samples, per='slice')]
+    samples = measure(lambda: (volume3d.min(), volume3d.max()), repeat)
+    # Baseline: the two full-volume passes the histogram replaces
+    results.append(result('volume.min_max', size_label, samples, per='volume'))
+    full = VolumeHistogram.from_volume(volume3d)
+    def auto_window():
+        full.cumulative = None
+        full.auto_window()
+    samples = measure(auto_window, repeat)
+    results.append(result('VolumeHistogram.auto_window', size_label, samples))
+    return results
+
+
+def bench_slice_statistics(size_label, volume3d, repeat):
+    from handlers.slice_statistics import SliceStatistics
+    statistics = SliceStatistics(volume3d.shape)
+    index = [0]
+    slices = [np.ascontiguousarray(volume3d[:, :, i]) for i in range(min(volume3d.shape[2], 8))]
+    def add_slice():
+        statistics.add(index[0] % len(slices), slices[index[0] % len(slices)])
+        index[0] += 1
+    samples = measure(add_slice, repeat)
+    results = [result('SliceStatistics.add', size_label, samples, per='slice')]
+    samples = measure(lambda: statistics.value_range(0, volume3d.shape[0] // 2), repeat)
+    results.append(result('SliceStatistics.value_range', size_label, samples))
+    samples = measure(lambda: (volume3d[volume3d.shape[0] // 2].min(), volume3d[volume3d.shape[0] // 2].max()), repeat)
+    results.append(result('SliceStatistics.value_range', size_label, samples, mode='slice scan'))
+    return results
+
+
+def bench_slice_overview(size_label, volume3d, repeat):
+    from handlers.slice_overview import SliceOverview
+    overview = None
+    def compute():
+        nonlocal overview
+        overview = SliceOverview.compute(volume3d)
+    samples = measure(compute, 1, warmup=0)
+    results = [result('SliceOverview.compute', size_label, samples, factor=overview.factor)]
+    value_range = (float(volume3d.min()), float(volume3d.max()))
+    def strip():
+        for index in range(overview.count(2)):
+            overview.thumbnail("XY", index, value_range)
+    samples = measure(strip, repeat)
+    results.append(result('SliceOverview.thumbnail', size_label, samples, thumbnails=overview.count(2)))
+    return results
+
+
+def bench_headless(size_label, volume3d, repeat):
+    from handlers.headless_renderer import render_view
+    from handlers.volume_geometry import VolumeGeometry
+    geometry = VolumeGeometry(volume3d.shape)
+    rows, cols, slices = volume3d.shape
+    value_range = (float(volume3d.min()), float(volume3d.max()))
+    plan = np.array([[cols * 0.1, rows * 0.2, slices // 2], [cols * 0.9, rows * 0.8, slices // 2]])
+    track = np.column_stack([np.linspace(cols * 0.1, cols * 0.9, 1000), np.linspace(rows * 0.2, rows * 0.8, 1000),
+                             np.full(1000, slices // 2)])
+    results = []
+    for plane_name in ("XY", "YZ"):
+        samples = measure(lambda: render_view(volume3d, plane_name, volume3d.shape[2 if plane_name == "XY" else 1] // 2,
+                                              value_range, zoom=1.5, plan=plan, tracks=[("#ff0000", track)],
+                                              geometry=geometry), repeat)
+        results.append(result('render_view', size_label, samples, plane=plane_name, zoom=1.5, overlays=True))
+    return results
+
+
+def bench_geometry(size_label, volume3d, repeat, point_count=100000):
+    from handlers.volume_geometry import VolumeGeometry
+    rows, cols, slices = volume3d.shape
+    # Anisotropic, oblique series: 0.7 mm pixels, 2.5 mm slices, tilted 10 degrees about x
+    angle = np.radians(10.0)
+    geometry = VolumeGeometry.from_positions(volume3d.shape, (0.7, 0.7), (1, 0, 0, 0, np.cos(angle), np.sin(angle)),
+                                             (0, 0, 0), thickness=2.5)
+    points = np.random.default_rng(0).random((point_count, 3)) * [cols, rows, slices]
+    results = []
+    samples = measure(lambda: geometry.voxel_to_patient(points), repeat)
+    results.append(result('VolumeGeometry.voxel_to_patient', size_label, samples, points=point_count))
+    patient = geometry.voxel_to_patient(points)
+    panel = geometry.panel("YZ")
+    def project():
+        geometry.patient_projection(panel.screen_projection(1.5, 800, 600, (10, -5))).project(patient)
+    samples = measure(project, repeat)
+    results.append(result('PanelGeometry.screen_projection', size_label, samples, points=point_count, source='patient'))
+    samples = measure(lambda: panel.screen_projection(1.5, 800, 600, (10, -5)), repeat)
+    results.append(result('PanelGeometry.screen_projection', size_label, samples, points=0, cached=True))
+    return results
+
+
+def bench_slab(size_label, volume3d, repeat, thickness=16):
+    from handlers.slab_renderer import SlabRenderer
+    results = []
+    slices = volume3d.shape[2]
+    for mode in ("MIP", "Average"):
+        # Scroll the axial slab one slice per call, in both directions
+        renderer = SlabRenderer(volume3d, 2)
+        position = [slices // 2, 1]
+        renderer.render(position[0], thickness, mode)
+        def scroll():
+            if not 0 < position[0] + position[1] < slices - 1:
+                position[1] = -position[1]
+            position[0] += position[1]
+            renderer.render(position[0], thickness, mode)
+        samples = measure(scroll, repeat)
+        results.append(result('SlabRenderer.render', size_label, samples, mode=mode, thickness=thickness))
+    samples = measure(lambda: volume3d[:, :, slices // 2 - thickness // 2:slices // 2 + thickness // 2].max(axis=2), repeat)
+    results.append(result('SlabRenderer.render', size_label, samples, mode='MIP direct', thickness=thickness))
+    return results
+
+
+def bench_tissue_masks(size_label, volume3d, repeat):
+    from handlers.tissue_segmentation import TissueMasks
+    from handlers.voxel_traversal import path_voxels
+    masks = None
+    def compute():
+        nonlocal masks
+        masks = TissueMasks.compute(volume3d)
+    samples = measure(compute, 1, warmup=0)
+    results = [result('TissueMasks.compute', size_label, samples)]
+    rows, cols, slices = volume3d.shape
+    voxels = path_voxels([[cols * 0.1, rows * 0.2, 0], [cols * 0.9, rows * 0.8, slices - 1]])
+    samples = measure(lambda: masks.route_risk(voxels), repeat)
+    results.append(result('TissueMasks.route_risk', size_label, samples, voxels=len(voxels)))
+
+    from handlers.trajectory_planner import TrajectoryPlanner, on_outer_contour
+    target = (cols // 2, rows // 2, slices // 2)
+    planner = routes = None
+    def suggest():
+        nonlocal planner, routes
+        planner = TrajectoryPlanner(volume3d, masks)
+        routes, _ = planner.suggest(target)
+    samples = measure(suggest, 1, warmup=0)
+    # Entries must start on the skin, not on lung or bowel walls inside the body
+    entries = np.array([route['entry'][[1, 0, 2]] for route in routes], dtype=np.int64).reshape(-1, 3) // planner.factor
+    on_skin = int(on_outer_contour(planner.body, entries).sum())
+    if on_skin < len(routes):
+        print(f"WARNING: {len(routes) - on_skin} of {len(routes)} suggested entries are not on the outer skin")
+    results.append(result('TrajectoryPlanner.suggest', size_label, samples, top_k=5, entries_on_skin=on_skin))
+    return results
+
+
+def bench_csv_ingest(workdir, repeat):
+    from handlers.csv_handler import CSVHandler
+    results = []
+    csv_path = os.path.join(workdir, 'bench_realtime.csv')
+    rows = [[256.0, 179.0 + i * 0.1, 83.0] for i in range(CSV_ROWS)]
+
+    def run_bulk():
+        with open(csv_path, 'w', newline='') as f:
+            csv.writer(f).writerows(rows)
+        handler = None
+
+        def on_point():
+            if len(handler.realtime_points) >= CSV_ROWS:
+                handler.stop_thread = True
+
+        handler = CSVHandler(on_point)
+        handler.set_csv_file(csv_path)
+        handler.check_csv_for_updates()
+
+    samples = measure(run_bulk, repeat, warmup=0)
+    entry = result('CSVHandler.check_csv_for_updates', None, samples, mode='bulk', rows=CSV_ROWS)
+    entry['rows_per_second'] = CSV_ROWS / entry['seconds']['median']
+    results.append(entry)
+
+    def run_tail():
+        open(csv_path, 'w').close()
+        handler = None
+
+        def on_point():
+            if len(handler.realtime_points) >= CSV_ROWS:
+                handler.stop_thread = True
+
+        def writer():
+            with open(csv_path, 'a', newline='') as f:
+                out = csv.writer(f)
+                for row in rows:
+                    out.writerow(row)
+                    f.flush()
+
+        handler = CSVHandler(on_point)
+        handler.set_csv_file(csv_path)
+        thread = threading.Thread(target=writer)
+        thread.start()
+        handler.check_csv_for_updates()
+        thread.join()
+
+    samples = measure(run_tail, repeat, warmup=0)
+    entry = result('CSVHandler.check_csv_for_updates', None, samples, mode='tail', rows=CSV_ROWS)
+    entry['rows_per_second'] = CSV_ROWS / entry['seconds']['median']
+    results.append(entry)
+    return results
+
+
+def bench_decode(data_dir, repeat):
+    """Read and decode an uncompressed and compressed series: pydicom's default pixel_array, one
+    slice at a time, against the FrameDecoder backend sequentially and on its worker threads.
+    Then load the series from one file per slice and from one enhanced multi-frame object."""
+    import pydicom # type: ignore
+    from pydicom.uid import ExplicitVRLittleEndian, RLELossless, JPEGLSLossless, JPEG2000Lossless # type: ignore
+    from handlers.dicom_decoders import FrameDecoder, available_backends
+    from handlers.dicom_handler import DicomHandler
+    from handlers.dicom_registry import DicomRegistry
+    try:
+        from pydicom.pixels import get_encoder # type: ignore
+        syntaxes = [uid for uid in (RLELossless, JPEGLSLossless, JPEG2000Lossless) if get_encoder(uid).is_available]
+    except ImportError:
+        syntaxes = [RLELossless]
+    syntaxes.insert(0, ExplicitVRLittleEndian)
+    rows, cols, slices = DECODE_SIZE
+    size_label = "x".join(str(n) for n in DECODE_SIZE)
+    results = []
+    for syntax in syntaxes:
+        if not available_backends(str(syntax)):
+            continue
+        folder = write_series(os.path.join(data_dir, f"synthetic_{size_label}_{syntax}"), rows, cols, slices,
+                              compression=None if syntax == ExplicitVRLittleEndian else syntax)
+        paths = [os.path.join(folder, name) for name in sorted(os.listdir(folder))]
+
+        def default():
+            for path in paths:
+                pydicom.dcmread(path, force=True).pixel_array
+
+        results.append(result('pixel_array', size_label, measure(default, repeat), syntax=syntax.name))
+        for workers in (1, None):
+            decoder = FrameDecoder(workers=workers)
+
+            def backend():
+                list(decoder.map(lambda path: decoder.decode(pydicom.dcmread(path, force=True)), paths))
+
+            samples = measure(backend, repeat)
+            results.append(result('FrameDecoder.decode', size_label, samples, syntax=syntax.name,
+                                  backend=decoder.chosen.get(str(syntax), available_backends(str(syntax))[0]),
+                                  workers=decoder.workers))
+
+        enhanced = write_multiframe(os.path.join(data_dir, f"synthetic_{size_label}_{syntax}_multiframe", "enhanced.dcm"),
+                                    rows, cols, slices, compression=None if syntax == ExplicitVRLittleEndian else syntax)
+        handler = DicomHandler(DicomRegistry())
+        for layout, study in (('single-frame', folder), ('multi-frame', os.path.dirname(enhanced))):
+            samples = measure(lambda: handler.load_dicom_images(study), repeat)
+            results.append(result('DicomHandler.load_dicom_images', size_label, samples, syntax=syntax.name,
+                                  layout=layout))
+    return results
+
+
+def bench_session(workdir, repeat, duration=7200.0, rate=100.0):
+    """A two-hour session at 100 samples/s: recording cost per batch, then seeks to random times"""
+    from handlers.session_recorder import SessionRecorder, SessionReader
+    path = os.path.join(workdir, 'bench_session.psr')
+    recorder = SessionRecorder(path)
+    count = int(duration * rate)
+    batch = 10
+    times = np.arange(0, count, batch) / rate
+    point = [(256.0, 179.0, 83.0, None)] * batch
+    started = time.perf_counter()
+    for t in times:
+        recorder.add_samples('primary', point, 1000.0 + t)
+        if int(t) % 30 == 0:
+            recorder.add_state({'X': t}, 1000.0 + t)
+    recorder.close()
+    per_batch = (time.perf_counter() - started) / len(times)
+    results = [result('SessionRecorder.add_samples', 'session', [per_batch], batch=batch,
+                      file_mb=round(os.path.getsize(path) / 1e6, 2))]
+
+    def open_reader():
+        SessionReader(path).close()
+    results.append(result('SessionReader.open', 'session', measure(open_reader, repeat)))
+    reader = SessionReader(path)
+    # A jump from nothing shown: everything since the last clear, read cold near the end
+    targets = iter(np.random.default_rng(0).uniform(reader.end - duration / 10, reader.end, size=repeat + 1))
+    def jump():
+        t = next(targets)
+        reader.decoded.clear()
+        reader.tracks_at(t)
+        reader.state_at(t)
+    results.append(result('SessionReader.tracks_at', 'session', measure(jump, repeat)))
+    # Dragging the replay slider: MainWindow.seek_replay reads only what one slider step adds
+    step = reader.duration() / 1000
+    steps = iter(reader.end - duration / 10 + step * np.arange(repeat + 1))
+    def seek():
+        t = next(steps)
+        reader.tracks_between(t - step, t)
+        reader.state_at(t)
+    results.append(result('SessionReader.seek', 'session', measure(seek, repeat), step_s=round(step, 3)))
+    reader.close()
+    os.remove(path)
+    return results
+
+
+def bench_vispy(window, repeat):
+    handler = window.gui_components.panel_3d_handler
+    mode = 'canvas'
+    try:
+        handler.visualize_vispy(np.zeros((64, 64, 64), dtype=np.float32))
+    except Exception as e:
+        # No usable OpenGL context: time the CPU side of the line visual on its own
+        print(f"VisPy canvas unavailable ({e}); timing a standalone line visual")
+        from vispy.scene import visuals # type: ignore
+        handler.realtime_line_vispy = visuals.Line(color='red', width=2, method='gl')
+        mode = 'standalone'
+    results = []
+    rng = np.random.default_rng(0)
+    for count in REALTIME_POINT_COUNTS:
+        points = np.cumsum(rng.normal(0, 1, size=(count, 3)), axis=0).tolist()
+        samples = measure(lambda: handler.update_realtime_line_vispy(points, False), repeat)
+        results.append(result('VisualizationHandler.update_realtime_line_vispy', None, samples, points=count, mode=mode))
+        # Same number of points split over several needle tracks drawn by the one batched visual
+        tracks = [(f"track-{i}", color, np.asarray(chunk, dtype=np.float32))
+                  for i, ((color, _), chunk) in enumerate(zip(TRACK_PALETTE, np.array_split(points, TRACK_COUNT)))]
+        samples = measure(lambda: handler.update_realtime_tracks_vispy(tracks, False), repeat)
+        results.append(result('VisualizationHandler.update_realtime_tracks_vispy', None, samples, points=count,
+                              tracks=TRACK_COUNT, mode=mode))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ingest and rendering hot paths")
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help="comma separated ROWSxCOLSxSLICES list")
+    parser.add_argument('--repeat', type=int, default=20, help="timed repetitions for fast operations")
+    parser.add_argument('--load-repeat', type=int, default=1, help="timed repetitions for full series loads")
+    parser.add_argument('--data-dir', default=os.path.join(BENCH_DIR, 'data'), help="where synthetic series are cached")
+    parser.add_argument('--output', default='benchmark_results.json', help="JSON results file")
+    args = parser.parse_args()
+    output_path = os.path.abspath(args.output)
+    data_dir = os.path.abspath(args.data_dir)
+
+    workdir = tempfile.mkdtemp(prefix='puncture-bench-')
+    os.chdir(workdir)  # MainWindow keeps its registry/index/cache under ./dicom-folder/
+    app = QApplication(sys.argv[:1])
+    from gui.main_window import MainWindow
+    window = MainWindow()
+    window.resize(1400, 1000)
+    window.show()
+    app.processEvents()
+
+    results = []
+    for size_label in args.sizes.split(','):
+        rows, cols, slices = (int(v) for v in size_label.lower().split('x'))
+        print(f"Preparing synthetic series {size_label}...")
+        folder = write_series(os.path.join(data_dir, f"synthetic_{size_label}"), rows, cols, slices)
+        series_name = window.dicom_registry.ingest(folder, "reference")
+
+        print(f"Benchmarking {size_label}...")
+        load_results, volume3d = bench_load(window, size_label, series_name, args.load_repeat)
+        results += load_results
+        show_volume(window, volume3d)
+        results += bench_rendering(window, size_label, volume3d, args.repeat)
+        results += bench_needle_path(size_label, volume3d, args.repeat)
+        results += bench_slab(size_label, volume3d, args.repeat)
+        results += bench_histogram(size_label, volume3d, args.repeat)
+        results += bench_slice_statistics(size_label, volume3d, args.repeat)
+        results += bench_slice_overview(size_label, volume3d, args.repeat)
+        results += bench_headless(size_label, volume3d, args.repeat)
+        results += bench_geometry(size_label, volume3d, args.repeat)
+        results += bench_tissue_masks(size_label, volume3d, args.repeat)
+        window.volume3d = None
+        del volume3d
+
+    print("Benchmarking CSV ingest...")
+    results += bench_csv_ingest(workdir, max(1, args.repeat // 4))
+    print("Benchmarking compressed DICOM decode...")
+    results += bench_decode(data_dir, max(1, args.repeat // 4))
+    print("Benchmarking VisPy real-time line...")
+    results += bench_vispy(window, args.repeat)
+    results += bench_session(workdir, args.repeat)
+
+    report = {'environment': environment(), 'results': results}
+    with open(output_path, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    for entry in results:
+        params = ", ".join(f"{k}={v}" for k, v in entry['params'].items())
+        print(f"{entry['benchmark']:<48} {entry['size'] or '':<14} {params:<28} "
+              f"median {entry['seconds']['median'] * 1000:9.2f} ms")
+    print(f"Results written to {output_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+import os
+import numpy as np # type: ignore
+from pydicom.dataset import Dataset, FileDataset, FileMetaDataset # type: ignore
+from pydicom.sequence import Sequence # type: ignore
+from pydicom.uid import ExplicitVRLittleEndian, CTImageStorage, EnhancedCTImageStorage, generate_uid # type: ignore
+
+
+def phantom_slice(rows, cols, z_fraction, rng):
+    """Body-like HU slice: soft tissue ellipse, two lungs, a bone ring and noise"""
+    yy, xx = np.mgrid[0:rows, 0:cols].astype(np.float32)
+    cy, cx = rows / 2, cols / 2
+    body = ((yy - cy) / (rows * 0.40)) ** 2 + ((xx - cx) / (cols * 0.45)) ** 2 <= 1
+    image = np.full((rows, cols), -1000, dtype=np.float32)
+    image[body] = 40
+    lung_scale = 0.5 + 0.5 * np.sin(np.pi * z_fraction)
+    for side in (-1, 1):
+        lung = (((yy - cy) / (rows * 0.22 * lung_scale + 1)) ** 2
+                + ((xx - cx - side * cols * 0.18) / (cols * 0.12 * lung_scale + 1)) ** 2) <= 1
+        image[lung] = -850
+    ring = np.abs(np.hypot((yy - cy) / rows, (xx - cx) / cols) - 0.36) < 0.015
+    image[ring & body] = 700
+    image += rng.normal(0, 15, size=image.shape).astype(np.float32)
+    return image
+
+
+def make_dataset(rows, cols, index, slice_count, study_uid, series_uid, pixel_spacing, slice_spacing):
+    meta = FileMetaDataset()
+    meta.MediaStorageSOPClassUID = CTImageStorage
+    meta.MediaStorageSOPInstanceUID = generate_uid()
+    meta.TransferSyntaxUID = ExplicitVRLittleEndian
+    ds = FileDataset(None, {}, file_meta=meta, preamble=b"\0" * 128)
+    ds.SOPClassUID = CTImageStorage
+    ds.SOPInstanceUID = meta.MediaStorageSOPInstanceUID
+    ds.Modality = 'CT'
+    ds.PatientID = 'BENCH'
+    ds.PatientName = 'Benchmark^Phantom'
+    ds.StudyInstanceUID = study_uid
+    ds.SeriesInstanceUID = series_uid
+    ds.SeriesDescription = f'Synthetic {rows}x{cols}x{slice_count}'
+    ds.InstanceNumber = index + 1
+    ds.Rows = rows
+    ds.Columns = cols
+    ds.SamplesPerPixel = 1
+    ds.PhotometricInterpretation = 'MONOCHROME2'
+    ds.BitsAllocated = 16
+    ds.BitsStored = 16
+    ds.HighBit = 15
+    ds.PixelRepresentation = 1
+    ds.PixelSpacing = [pixel_spacing, pixel_spacing]
+    ds.SliceThickness = slice_spacing
+    ds.ImagePositionPatient = [0.0, 0.0, -index * slice_spacing]
+    ds.ImageOrientationPatient = [1, 0, 0, 0, 1, 0]
+    ds.RescaleSlope = 1
+    ds.RescaleIntercept = -1024
+    return ds
+
+
+def save_dataset(ds, path):
+    try:
+        ds.save_as(path, enforce_file_format=True)
+    except TypeError:
+        # pydicom 2.x
+        ds.is_little_endian = True
+        ds.is_implicit_VR = False
+        ds.save_as(path, write_like_original=False)
+
+
+def write_series(folder, rows, cols, slice_count, pixel_spacing=0.7, slice_spacing=1.0, seed=0, compression=None):
+    """Write a synthetic CT series, one file per slice; reuses an existing complete series.
+
+    compression is a transfer syntax UID pydicom can encode (e.g. RLE Lossless); None writes
+    uncompressed pixel data.
+    """
+    os.makedirs(folder, exist_ok=True)
+    if len([f for f in os.listdir(folder) if f.endswith('.dcm')]) == slice_count:
+        return folder
+    rng = np.random.default_rng(seed)
+    study_uid, series_uid = generate_uid(), generate_uid()
+    for index in range(slice_count):
+        hu = phantom_slice(rows, cols, index / max(slice_count - 1, 1), rng)
+        ds = make_dataset(rows, cols, index, slice_count, study_uid, series_uid, pixel_spacing, slice_spacing)
+        ds.PixelData = np.clip(hu + 1024, -32768, 32767).astype(np.int16).tobytes()
+        if compression is not None:
+            ds.compress(compression)
+        save_dataset(ds, os.path.join(folder, f"IM{index:05d}.dcm"))
+    return folder
+
+
+def _item(**elements):
+    item = Dataset()
+    for keyword, value in elements.items():
+        setattr(item, keyword, value)
+    return Sequence([item])
+
+
+def write_multiframe(path, rows, cols, frame_count, pixel_spacing=0.7, slice_spacing=1.0, seed=0, compression=None):
+    """Write the same phantom as one enhanced CT object; reuses an existing file.
+
+    Frames are stored feet first (the reverse of display order) and placed only through the
+    per-frame PlanePositionSequence, so a loader has to use the functional groups to order them.
+    """
+    if os.path.exists(path):
+        return path
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    rng = np.random.default_rng(seed)
+    hu = np.stack([phantom_slice(rows, cols, index / max(frame_count - 1, 1), rng) for index in range(frame_count)])
+    ds = make_dataset(rows, cols, 0, frame_count, generate_uid(), generate_uid(), pixel_spacing, slice_spacing)
+    ds.file_meta.MediaStorageSOPClassUID = ds.SOPClassUID = EnhancedCTImageStorage
+    for keyword in ('ImagePositionPatient', 'ImageOrientationPatient', 'PixelSpacing', 'SliceThickness',
+                    'RescaleSlope', 'RescaleIntercept'):
+        delattr(ds, keyword)
+    ds.NumberOfFrames = frame_count
+    ds.SharedFunctionalGroupsSequence = _item(
+        PixelMeasuresSequence=_item(PixelSpacing=[pixel_spacing, pixel_spacing], SliceThickness=slice_spacing),
+        PlaneOrientationSequence=_item(ImageOrientationPatient=[1, 0, 0, 0, 1, 0]),
+        PixelValueTransformationSequence=_item(RescaleSlope=1, RescaleIntercept=-1024, RescaleType='HU'))
+    stored = range(frame_count - 1, -1, -1)
+    ds.PerFrameFunctionalGroupsSequence = Sequence([
+        _item(PlanePositionSequence=_item(ImagePositionPatient=[0.0, 0.0, -index * slice_spacing]))[0]
+        for index in stored])
+    ds.PixelData = np.clip(hu[list(stored)] + 1024, -32768, 32767).astype(np.int16).tobytes()
+    if compression is not None:
+        ds.compress(compression)
+    save_dataset(ds, path)
+    return path
@@ -1,12 +1,31 @@
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QGridLayout,
-    QPushButton, QLabel, QListWidget, QSlider, QScrollArea, QComboBox, QCheckBox
+    QPushButton, QLabel, QListWidget, QListWidgetItem, QListView, QSlider, QScrollArea, QComboBox, QCheckBox,
+    QSpinBox
 )
-from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QPainter, QPen, QPixmap, QColor
-from PIL import Image, ImageQt
-import numpy as np
+from PyQt5.QtCore import Qt, QSize, QTimer, QPointF
+from PyQt5.QtGui import QPainter, QPen, QPixmap, QColor, QIcon, QImage, QPolygonF
+from lazy_imports import lazy_import
+import perf_probes
+import latency_tracer
 from handlers.visualization_handler import VisualizationHandler
+from handlers.slab_renderer import SLAB_MODES, MAX_THICKNESS
+from handlers.render_pipeline import window_to_uint8, zoom_image, PLANE_AXES
+from handlers.volume_histogram import WINDOW_PRESETS
+
+Image = lazy_import("PIL.Image")
+ImageQt = lazy_import("PIL.ImageQt")
+
+def polygon_from_array(coords):
+    """QPolygonF of an (N, 2) array, filled with one buffer copy instead of a QPointF per point"""
+    points = coords.astype(float, order='C')
+    polygon = QPolygonF()
+    polygon.fill(QPointF(), len(points))
+    buffer = polygon.data()
+    buffer.setsize(points.nbytes)
+    memoryview(buffer)[:] = memoryview(points).cast('B')
+    return polygon
+
 
 class ImagePanel(QLabel):
     def __init__(self, plane_name, gui_components, parent=None):
@@ -19,13 +38,19 @@ class ImagePanel(QLabel):
         self.image_data = None
         self.current_pixmap = None
         self.needle_line = None
-        self.realtime_lines = []
+        # [(colour, QPolygonF)] per needle track, drawn as one polyline each
+        self.realtime_tracks = []
+        self.realtime_trace_id = None
+        # "Slice" or one of SLAB_MODES, over slab_thickness slices centred on the current one
+        self.slab_mode = "Slice"
+        self.slab_thickness = 1
         self.axes_lines = []
         self.locked = False
         self.dragging = False
         self.last_pos = None
         self.setMouseTracking(True)
 
+    @perf_probes.probe("ImagePanel.paintEvent")
     def paintEvent(self, event):
         painter = QPainter(self)
         painter.setRenderHint(QPainter.Antialiasing)
@@ -48,12 +73,17 @@ class ImagePanel(QLabel):
             painter.setPen(pen)
             start, end = self.needle_line['start'], self.needle_line['end']
             painter.drawLine(int(start[0]), int(start[1]), int(end[0]), int(end[1]))
-        for line in self.realtime_lines:
-            pen = QPen(QColor(line['color']), 3)
+        for color, polyline in self.realtime_tracks:
+            pen = QPen(QColor(color), 3)
             pen.setStyle(Qt.DashLine)
             painter.setPen(pen)
-            start, end = line['start'], line['end']
-            painter.drawLine(int(start[0]), int(start[1]), int(end[0]), int(end[1]))
+            painter.drawPolyline(polyline)
+        if self.realtime_tracks:
+            latency_tracer.mark_upto(self.realtime_trace_id, "paint")
+
+    def set_realtime_tracks(self, tracks):
+        """tracks: [(colour, (N, 2) widget coordinates)]"""
+        self.realtime_tracks = [(color, polygon_from_array(coords)) for color, coords in tracks if len(coords) > 1]
 
     def mousePressEvent(self, event):
         if event.button() == Qt.LeftButton:
@@ -81,6 +111,127 @@ class ImagePanel(QLabel):
             delta = event.angleDelta().y()
             self.gui_components.handle_panel_zoom(panel_index, delta > 0)
 
+class PerfOverlay(QLabel):
+    """Semi-transparent frame-time table drawn over the panels, refreshed twice a second"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setStyleSheet("background-color: rgba(0, 0, 0, 170); color: #7CFC00; "
+                           "font-family: monospace; font-size: 8pt; padding: 4px;")
+        self.setAttribute(Qt.WA_TransparentForMouseEvents)
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.timeout.connect(self.refresh)
+        self.hide()
+
+    def set_visible(self, visible):
+        if visible:
+            self.refresh()
+            self.show()
+            self.raise_()
+            self.refresh_timer.start(500)
+        else:
+            self.refresh_timer.stop()
+            self.hide()
+
+    def refresh(self):
+        text = "Timings (ms)\n" + perf_probes.format_stats()
+        if latency_tracer.is_enabled():
+            text += "\n\n" + latency_tracer.format_summary()
+        self.setText(text)
+        self.adjustSize()
+        self.move(8, 8)
+
+class SliceFilmstrip(QWidget):
+    """Scrollable strip of slice thumbnails for one plane; hover previews, click jumps to the slice"""
+
+    def __init__(self, main_app, parent=None):
+        super().__init__(parent)
+        self.main_app = main_app
+        self.overview = None
+        self.value_range = None
+        layout = QHBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        self.plane_selector = QComboBox()
+        self.plane_selector.addItems(["XY", "YZ", "XZ"])
+        self.plane_selector.currentTextChanged.connect(lambda _: self.refresh())
+        self.strip = QListWidget()
+        self.strip.setViewMode(QListView.IconMode)
+        self.strip.setFlow(QListView.LeftToRight)
+        self.strip.setWrapping(False)
+        self.strip.setMovement(QListView.Static)
+        self.strip.setIconSize(QSize(64, 64))
+        self.strip.setFixedHeight(96)
+        self.strip.setMouseTracking(True)
+        self.strip.itemEntered.connect(self.preview)
+        self.strip.itemClicked.connect(self.jump)
+        self.preview_label = QLabel()
+        self.preview_label.setFixedSize(96, 96)
+        self.preview_label.setAlignment(Qt.AlignCenter)
+        self.preview_label.setStyleSheet("background-color: black; color: white;")
+        layout.addWidget(self.plane_selector)
+        layout.addWidget(self.strip, 1)
+        layout.addWidget(self.preview_label)
+
+    def set_overview(self, overview, value_range):
+        self.overview = overview
+        self.value_range = value_range
+        self.refresh()
+
+    def refresh(self):
+        self.strip.clear()
+        self.preview_label.clear()
+        if self.overview is None or self.value_range is None:
+            return
+        plane = self.plane_selector.currentText()
+        axis = PLANE_AXES[plane]
+        for index in range(self.overview.count(axis)):
+            thumbnail = self.overview.thumbnail(plane, index, self.value_range)
+            height, width = thumbnail.shape
+            qimage = QImage(thumbnail.tobytes(), width, height, width, QImage.Format_Grayscale8).copy()
+            item = QListWidgetItem(QIcon(QPixmap.fromImage(qimage)), str(self.overview.slice_index(axis, index)))
+            item.setData(Qt.UserRole, (plane, self.overview.slice_index(axis, index)))
+            self.strip.addItem(item)
+
+    def preview(self, item):
+        pixmap = item.icon().pixmap(QSize(64, 64))
+        self.preview_label.setPixmap(pixmap.scaled(self.preview_label.size(), Qt.KeepAspectRatio))
+
+    def jump(self, item):
+        plane, index = item.data(Qt.UserRole)
+        self.main_app.go_to_slice(plane, index)
+
+class ReplayBar(QWidget):
+    """Time slider for replaying a recorded session; hidden while no recording is open"""
+
+    STEPS = 1000
+
+    def __init__(self, main_app, parent=None):
+        super().__init__(parent)
+        self.main_app = main_app
+        layout = QHBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(QLabel("Replay:"))
+        self.slider = QSlider(Qt.Horizontal)
+        self.slider.setRange(0, self.STEPS)
+        self.slider.valueChanged.connect(lambda value: self.main_app.seek_replay(value / self.STEPS))
+        self.time_label = QLabel()
+        self.time_label.setFixedWidth(130)
+        close_button = QPushButton("Close Replay")
+        close_button.clicked.connect(self.main_app.close_replay)
+        layout.addWidget(self.slider, 1)
+        layout.addWidget(self.time_label)
+        layout.addWidget(close_button)
+        self.hide()
+
+    def show_time(self, elapsed, duration):
+        self.time_label.setText(f"{format_clock(elapsed)} / {format_clock(duration)}")
+
+
+def format_clock(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}"
+
 class GUIComponents(QWidget):
     def __init__(self, main_app):
         super().__init__()
@@ -101,6 +252,7 @@ class GUIComponents(QWidget):
             ("Start Real-Time Route", self.main_app.start_realtime_data),
             ("Stop Real-Time Route", self.main_app.stop_realtime_data),
             ("Reset Pan", self.main_app.reset_pan_all, "background-color: lightyellow;"),
+            ("Perf Overlay", self.main_app.toggle_perf_overlay),
             ("Delete File", self.main_app.delete_selected_file, "background-color: salmon;")
         ]
         for text, slot, *style in buttons:
@@ -110,6 +262,12 @@ class GUIComponents(QWidget):
             btn.clicked.connect(slot)
             toolbar_layout.addWidget(btn)
 
+        toolbar_layout.addWidget(QLabel("Window:"))
+        self.window_selector = QComboBox()
+        self.window_selector.addItems(["Full Range", "Auto", *WINDOW_PRESETS])
+        self.window_selector.currentTextChanged.connect(self.main_app.set_window_preset)
+        toolbar_layout.addWidget(self.window_selector)
+
         toolbar_layout.addStretch()
 
         zoom_frame = QWidget()
@@ -129,12 +287,36 @@ class GUIComponents(QWidget):
         sidebar_content = QWidget()
         sidebar_layout = QVBoxLayout(sidebar_content)
         self.list_view = QListWidget()
+        self.list_view.setIconSize(QSize(32, 32))
         self.list_view.itemClicked.connect(self.main_app.list_view_item_click)
         sidebar_layout.addWidget(self.list_view)
         self.init_sliders(sidebar_layout)
         self.init_zoom_controls(sidebar_layout)
         self.sidebar.setWidget(sidebar_content)
 
+    def update_study_item(self, name, info=None, thumbnail=None):
+        """Add a series to the sidebar list if missing and refresh its tooltip and thumbnail"""
+        items = self.list_view.findItems(name, Qt.MatchExactly)
+        if items:
+            item = items[0]
+        else:
+            item = QListWidgetItem(name)
+            self.list_view.addItem(item)
+        if info:
+            item.setToolTip(
+                f"Patient: {info['patient_name']} ({info['patient_id']})\n"
+                f"Series: {info['series_description']}\n"
+                f"Size: {info['rows']} x {info['cols']} x {info['slice_count']}\n"
+                f"Spacing: {info['spacing_x']:.2f} x {info['spacing_y']:.2f} x {info['spacing_z']:.2f} mm\n"
+                f"HU{'' if info.get('hu_exact') else ' (middle slice)'}: "
+                f"{info['hu_min']:.0f} to {info['hu_max']:.0f}"
+            )
+        if thumbnail is not None:
+            height, width = thumbnail.shape
+            qimage = QImage(thumbnail.tobytes(), width, height, width, QImage.Format_Grayscale8).copy()
+            item.setIcon(QIcon(QPixmap.fromImage(qimage)))
+        return item
+
     def init_sliders(self, parent_layout):
         sliders_frame = QWidget()
         sliders_layout = QVBoxLayout(sliders_frame)
@@ -265,7 +447,22 @@ class GUIComponents(QWidget):
             lock_checkbox.stateChanged.connect(
                 lambda state, p=panel, s=selector: self.main_app.toggle_panel_lock(state, p, s)
             )
+            slab_mode = QComboBox()
+            slab_mode.addItems(["Slice", *SLAB_MODES])
+            slab_thickness = QSpinBox()
+            slab_thickness.setRange(1, MAX_THICKNESS)
+            slab_thickness.setValue(10)
+            slab_thickness.setSuffix(" sl")
+            slab_thickness.setToolTip("Slab thickness (slices)")
+            slab_mode.currentTextChanged.connect(
+                lambda text, p=panel, t=slab_thickness: self.main_app.on_slab_changed(p, text, t.value())
+            )
+            slab_thickness.valueChanged.connect(
+                lambda value, p=panel, m=slab_mode: self.main_app.on_slab_changed(p, m.currentText(), value)
+            )
             controls_layout.addWidget(selector)
+            controls_layout.addWidget(slab_mode)
+            controls_layout.addWidget(slab_thickness)
             controls_layout.addStretch()
             controls_layout.addWidget(lock_checkbox)
             container = QWidget()
@@ -288,6 +485,9 @@ class GUIComponents(QWidget):
         main_layout.setColumnStretch(1, 1)
         main_layout.setRowStretch(0, 1)
         main_layout.setRowStretch(1, 1)
+        self.perf_overlay = PerfOverlay(self.main_view_widget)
+        self.filmstrip = SliceFilmstrip(self.main_app)
+        self.replay_bar = ReplayBar(self.main_app)
 
     def handle_panel_drag(self, panel_index, dx, dy):
         if panel_index == 0:
@@ -313,40 +513,36 @@ class GUIComponents(QWidget):
             elif panel_index == 2: self.main_app.zoom_out_xz()
         self.update_zoom_info()
 
-    def update_panel_image(self, panel, image_data, zoom=1.0, brightness=0, contrast=1.0, pan_offset=(0, 0)):
+    @perf_probes.probe("update_panel_image")
+    def update_panel_image(self, panel, image_data, zoom=1.0, brightness=0, contrast=1.0, pan_offset=(0, 0),
+                           value_range=None, scale=(1.0, 1.0)):
         if image_data is None:
             panel.current_pixmap = None
             panel.update()
             return
-        image = self.create_image_from_array(image_data, brightness, contrast)
+        image = self.create_image_from_array(image_data, brightness, contrast, value_range)
         if image is None:
             return
-        if zoom != 1.0:
-            new_width = int(image.width * zoom)
-            new_height = int(image.height * zoom)
-            image = image.resize((new_width, new_height), Image.LANCZOS)
-        qimage = ImageQt.ImageQt(image)
-        pixmap = QPixmap.fromImage(qimage)
+        if zoom != 1.0 or tuple(scale) != (1.0, 1.0):
+            # scale stretches anisotropic voxels to their physical aspect
+            with perf_probes.section("update_panel_image.resize"):
+                image = zoom_image(image, zoom, scale)
+        with perf_probes.section("update_panel_image.to_pixmap"):
+            qimage = ImageQt.ImageQt(image)
+            pixmap = QPixmap.fromImage(qimage)
         panel.current_pixmap = pixmap
         panel.image_data = image_data
         panel.update()
         self.update_zoom_info()
 
-    def create_image_from_array(self, array, brightness=0, contrast=1.0):
+    @perf_probes.probe("create_image_from_array")
+    def create_image_from_array(self, array, brightness=0, contrast=1.0, value_range=None):
         try:
-            min_val = self.main_app.global_min
-            max_val = self.main_app.global_max
+            min_val, max_val = self.main_app.display_range()
             if min_val is None or max_val is None:
-                min_val, max_val = array.min(), array.max()
-            if max_val - min_val > 0:
-                array_clipped = np.clip(array, min_val, max_val)
-                array_normalized = ((array_clipped - min_val) / (max_val - min_val) * 255)
-            else:
-                array_normalized = np.zeros(array.shape)
-            adjusted_array = array_normalized.astype(np.float32)
-            adjusted_array = contrast * (adjusted_array - 128) + 128 + brightness
-            adjusted_array = np.clip(adjusted_array, 0, 255).astype(np.uint8)
-            return Image.fromarray(adjusted_array, mode='L')
+                # Slice range from the statistics index when known; scanning the slice is the last resort
+                min_val, max_val = value_range or (array.min(), array.max())
+            return Image.fromarray(window_to_uint8(array, min_val, max_val, brightness, contrast), mode='L')
         except Exception as e:
             print(f"Error creating image from array: {e}")
             return None
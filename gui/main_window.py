@@ -1,24 +1,63 @@
+import csv
 import os
+import threading
+import time
 import numpy as np # type: ignore
-import shutil
 from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QFileDialog, QMessageBox, QLabel, QPushButton) # type: ignore
-from PyQt5.QtWidgets import QMenu # type: ignore
-from PyQt5.QtCore import QTimer, Qt # type: ignore
+from PyQt5.QtWidgets import QMenu, QInputDialog # type: ignore
+from PyQt5.QtCore import QTimer, Qt, pyqtSignal # type: ignore
 from data_structures import Vector3D
 from handlers.dicom_handler import DicomHandler
+from handlers.dicom_decoders import DecodeError
+from handlers.dicom_registry import DicomRegistry
+from handlers.study_index import StudyIndex
+from handlers.volume_manager import VolumeManager
 from handlers.csv_handler import CSVHandler
+from handlers.realtime_sources import make_source, DEFAULT_RING_NAME
+from handlers.deviation_tracker import DeviationTracker
+from handlers.voxel_traversal import NeedlePath
+from handlers.tissue_segmentation import compute_async as compute_tissue_masks, RISK_TISSUES
+from handlers.trajectory_planner import TrajectoryPlanner
+from handlers.render_pipeline import extract_plane, overlay_half_width, PLANE_AXES
+from handlers.slab_renderer import slab_bounds
+from handlers.volume_histogram import VolumeHistogram, preset_window
+from handlers.slice_statistics import SliceStatistics
+from handlers.slice_overview import compute_async as compute_slice_overview
+from handlers.session_recorder import SessionRecorder, SessionReader
+from handlers.overlay_projection import ProjectedTrackCache, slab_runs, clip_segment_to_slab
+from handlers.volume_geometry import VolumeGeometry
 from gui.gui_components import GUIComponents
+import perf_probes
+import latency_tracer
 
 
 class MainWindow(QMainWindow):
+    # Emitted from the registry's copy thread, delivered on the UI thread
+    ingest_progress = pyqtSignal(str, int, int)
+    ingest_finished = pyqtSignal(str)
+    latency_alarm = pyqtSignal(bool, float)
+    study_index_updated = pyqtSignal(list)
+    realtime_samples_ready = pyqtSignal()
+    tissue_masks_ready = pyqtSignal(str, object)
+    slice_overview_ready = pyqtSignal(str, object)
+    trajectories_ready = pyqtSignal(list, int, float)
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("CT-Guided Puncture Assistance System")
         self.setGeometry(100, 100, 800, 600)
 
         # Initialize handlers
-        self.dicom_handler = DicomHandler()
-        self.csv_handler = CSVHandler(self.draw_realtime_line)
+        # Ingest mode: "reference" (use the folder in place), "link" (hard-link into
+        # ./dicom-folder/) or "copy"; copies run in the background
+        self.ingest_mode = os.environ.get('PUNCTURE_INGEST_MODE', 'reference')
+        self.dicom_registry = DicomRegistry()
+        self.dicom_handler = DicomHandler(self.dicom_registry)
+        self.study_index = StudyIndex()
+        self.volume_manager = VolumeManager()
+        # Samples arrive on the acquisition engine's thread; drawing happens on the UI thread
+        self.realtime_draw_pending = False
+        self.csv_handler = CSVHandler(self.schedule_realtime_draw)
 
         # Initialize variables
         self.X_init = 256
@@ -28,6 +67,9 @@ class MainWindow(QMainWindow):
         self.Y = 256
         self.Z = 256
         self.Z_for_axis = 256
+        # Voxel <-> patient mm <-> screen mappings; a placeholder matching the initial slider ranges
+        # until a series is loaded
+        self.geometry = VolumeGeometry((512, 512, 512))
 
         self.thetaX = 0
         self.thetaY = 0
@@ -36,9 +78,28 @@ class MainWindow(QMainWindow):
         self.brightness = 0
         self.contrast = 2.0
 
+        # Series shown in the panels; other loaded series stay open in the volume manager
+        self.volume3d = None
+        self.current_series = None
+
         # Global min/max for consistent normalization
         self.global_min = None
         self.global_max = None
+        # HU histogram of the displayed series and the display range picked from it;
+        # window_range None normalizes over global_min..global_max
+        self.histogram = None
+        self.window_preset = "Full Range"
+        self.window_range = None
+        # Per-slice statistics index of the displayed series (handlers/slice_statistics.py)
+        self.slice_stats = None
+        # Downsampled copy for the thumbnail filmstrip, built in the background after load
+        self.slice_overview = None
+        # Session recording (samples plus UI state) and the recording being replayed, if any
+        self.session_recorder = None
+        self.session_reader = None
+        # Replay position last shown and the track points it left, so seeks can step from there
+        self.replay_time = None
+        self.replay_points = 0
 
         # Initialize zoom factors for each plane
         self.zoom_xy = 1.0
@@ -50,7 +111,11 @@ class MainWindow(QMainWindow):
         self.zoom_step = 0.1
 
         self.CenterPoint = Vector3D(0, 0, 0)
-        self.NeedleMatrix3D = np.zeros((512, 512, 512), dtype=np.int16)
+        # Voxels and HU values along the planned route and each real-time track (instead of a 512³ needle mask)
+        self.plan_path = None
+        self.needle_paths = {}
+        # Tissue masks and distance maps of the displayed series, computed in the background after load
+        self.tissue_masks = None
         self.NowMatrix3D = np.zeros((512, 512, 512), dtype=np.int16)
 
         self.IsSelectedItem = 0
@@ -87,11 +152,34 @@ class MainWindow(QMainWindow):
             'xz': {'start': None, 'end': None}
         }
 
+        # Per plane: [(colour, (N, 3) widget x, y and slab depth)] for every needle track
         self.realtime_needle_coords = {
             'xy': [],
             'yz': [],
             'xz': []
         }
+        self.realtime_tracks = []
+        self.track_projections = ProjectedTrackCache()
+        # Half thickness (voxels) of the slab around each panel's slice in which routes are drawn; 0 draws everything
+        self.overlay_slab = float(os.environ.get('PUNCTURE_OVERLAY_SLAB', 0))
+        # Thick-slab projections of the current volume, one renderer per slab axis
+        self.slab_renderers = {}
+
+        # Live comparison of every track with the planned route (distances in voxels, angle in degrees)
+        self.deviation_trackers = {}
+        self.deviation_alarm = False
+        self.deviation_distance_alarm = float(os.environ.get('PUNCTURE_DEVIATION_ALARM', 5))
+        self.deviation_angle_alarm = float(os.environ.get('PUNCTURE_DEVIATION_ANGLE_ALARM', 5))
+
+        self.ingest_progress.connect(self.on_ingest_progress)
+        self.ingest_finished.connect(self.on_ingest_finished)
+        self.study_index_updated.connect(self.on_study_index_updated)
+        self.latency_alarm.connect(self.on_latency_alarm)
+        self.realtime_samples_ready.connect(self.on_realtime_samples_ready)
+        self.tissue_masks_ready.connect(self.on_tissue_masks_ready)
+        self.slice_overview_ready.connect(self.on_slice_overview_ready)
+        self.trajectories_ready.connect(self.on_trajectories_ready)
+        latency_tracer.add_alarm_callback(self.latency_alarm.emit)
 
         self.smooth_render_timer = QTimer()
         self.smooth_render_timer.timeout.connect(self.smooth_render_update)
@@ -100,6 +188,10 @@ class MainWindow(QMainWindow):
         # Initialize GUI
         self.gui_components = GUIComponents(self)
         self.init_ui()
+        self.populate_study_list()
+        QTimer.singleShot(0, self.refresh_study_index)
+        if os.environ.get('PUNCTURE_RECORD_SESSION') == '1':
+            QTimer.singleShot(0, self.start_session_recording)
 
     def init_ui(self):
         central_widget = QWidget()
@@ -113,14 +205,17 @@ class MainWindow(QMainWindow):
         content_layout.addWidget(self.gui_components.sidebar)
         content_layout.addWidget(self.gui_components.main_view_widget, 1)
         main_layout.addLayout(content_layout)
+        main_layout.addWidget(self.gui_components.filmstrip)
+        main_layout.addWidget(self.gui_components.replay_bar)
+        self.deviation_label = QLabel()
+        self.statusBar().addPermanentWidget(self.deviation_label)
 
     def cache_realtime_coordinates(self):
-        if not hasattr(self.csv_handler, 'realtime_points') or not self.csv_handler.realtime_points:
+        tracks = self.csv_handler.tracks.snapshot()
+        if not tracks:
             return
-        self.realtime_needle_coords = {'xy': []}
-        for point in self.csv_handler.realtime_points:
-            if len(point) >= 2:
-                self.realtime_needle_coords['xy'].append((point[0], point[1]))
+        self.realtime_tracks = tracks
+        latency_tracer.mark_upto(self.csv_handler.previous_data_length - 1, "cache")
 
     def smooth_render_update(self):
         self.draw_realtime_line_optimized()
@@ -172,25 +267,11 @@ class MainWindow(QMainWindow):
             self.load_panel_image(panel, num)
         self.smooth_render_timer.start(10)
 
-    def get_needle_center_xy(self):
-        if self.point_start and self.point_end:
-            center_x = (self.point_start[0] + self.point_end[0]) / 2
-            center_y = (self.point_start[1] + self.point_end[1]) / 2
-            return [center_x, center_y]
-        return None
-
-    def get_needle_center_yz(self):
-        if self.point_start and self.point_end:
-            center_y = (self.point_start[1] + self.point_end[1]) / 2
-            center_z = (self.point_start[2] + self.point_end[2]) / 2 if len(self.point_start) > 2 else self.Z_for_axis
-            return [center_y, 390 - center_z]
-        return None
-
-    def get_needle_center_xz(self):
+    def get_needle_center(self, plane_name):
+        """Midpoint of the planned route in a panel's image pixels (zoom 1), or None"""
         if self.point_start and self.point_end:
-            center_x = (self.point_start[0] + self.point_end[0]) / 2
-            center_z = (self.point_start[2] + self.point_end[2]) / 2 if len(self.point_start) > 2 else self.Z_for_axis
-            return [center_x, 390 - center_z]
+            center = self.plan_endpoints().mean(axis=0)
+            return self.geometry.panel(plane_name).image_projection().project(center)[0, :2].tolist()
         return None
 
     def reset_zoom_xy(self):
@@ -227,6 +308,24 @@ class MainWindow(QMainWindow):
             except ValueError:
                 print(f"Error: Panel not found in the list.")
 
+    def on_slab_changed(self, panel, mode, thickness):
+        panel.slab_mode = mode
+        panel.slab_thickness = thickness
+        if self.volume3d is not None:
+            try:
+                panel_index = self.gui_components.panels.index(panel)
+                self.load_panel_image(panel, panel_index)
+            except ValueError:
+                print(f"Error: Panel not found in the list.")
+
+    def slice_index(self, plane_name):
+        """Volume index of the slice a plane shows along its axis (see PLANE_AXES)"""
+        return {"XY": self.Z, "YZ": self.Y, "XZ": self.X}[plane_name]
+
+    def panel_overlay_slab(self, panel):
+        """Half thickness of the overlay slab for a panel"""
+        return overlay_half_width(self.overlay_slab, panel.slab_mode, panel.slab_thickness)
+
     def toggle_panel_lock(self, is_locked, panel, plane_buttons):
         """
         Handles the lock button toggle for a panel.
@@ -247,22 +346,11 @@ class MainWindow(QMainWindow):
 
     def slider_changed(self, name, value):
         if name == "X Value":
-            self.Y = int(value)
+            self.Y = self.geometry.slider_to_index(0, value)
         elif name == "Y Value":
-            self.X = int(value)
+            self.X = self.geometry.slider_to_index(1, value)
         elif name == "Z Value":
-            self.Z_for_axis = int(value)
-            low_end = 256 - (self.Z_init // 2)
-            upper_end = 256 + (self.Z_init // 2)
-            self.Z = int(value)
-            if self.Z < low_end:
-                self.Z = 1234
-            elif self.Z > upper_end:
-                self.Z = 1234
-            else:
-                self.Z = -int(int(value) - low_end)
-            if self.Z == 0:
-                self.Z = -1
+            self.set_z_value(value)
         elif name == "X Rotation":
             if hasattr(self.gui_components.panel_3d_handler, 'view') and self.gui_components.panel_3d_handler.view:
                 self.gui_components.panel_3d_handler.view.camera.elevation = float(value)
@@ -275,6 +363,23 @@ class MainWindow(QMainWindow):
 
         self.update_images()
 
+    def set_z_value(self, value):
+        self.Z_for_axis = int(value)
+        self.Z = self.geometry.slider_to_index(2, value)
+
+    def configure_sliders(self):
+        """Fit the X/Y/Z Value sliders to the loaded volume and move them to the current slices"""
+        sliders = self.gui_components.sliders
+        for name, axis, index in (("X Value", 0, self.Y), ("Y Value", 1, self.X), ("Z Value", 2, self.Z)):
+            slider = sliders[name]['slider']
+            value = self.geometry.index_to_slider(axis, index)
+            slider.blockSignals(True)
+            slider.setRange(0, self.geometry.dims[axis] - 1)
+            slider.setValue(value)
+            slider.blockSignals(False)
+            sliders[name]['label'].setText(str(value))
+        self.Z_for_axis = self.geometry.index_to_slider(2, self.Z)
+
     def brightness_changed(self, value):
         self.brightness = value
         self.update_images()
@@ -283,6 +388,15 @@ class MainWindow(QMainWindow):
         self.contrast = value / 50.0
         self.update_images()
 
+    def set_window_preset(self, name, redraw=True):
+        """Display range: "Full Range", "Auto" (histogram percentiles) or one of WINDOW_PRESETS"""
+        self.window_preset = name
+        self.window_range = preset_window(name, self.histogram)
+        if redraw and self.volume3d is not None:
+            self.update_images()
+            if self.slice_overview is not None:
+                self.gui_components.filmstrip.set_overview(self.slice_overview, self.display_range())
+
     def toggle_sidebar(self):
         if self.gui_components.sidebar.isVisible():
             self.gui_components.sidebar.hide()
@@ -293,9 +407,172 @@ class MainWindow(QMainWindow):
         menu = QMenu(self)
         menu.addAction("DICOM Folder", self.input_button_click)
         menu.addAction("Puncture Planned Route CSV", self.input_plan_coor_data)
+        menu.addAction("Suggest Trajectories...", self.suggest_trajectories)
         menu.addAction("Puncture Real-Time Route CSV", self.select_realtime_csv)
+        menu.addAction("Real-Time Stream Source...", self.select_realtime_source)
+        menu.addAction("Add Needle Track...", self.add_realtime_track)
+        menu.addAction("Export Needle HU Profile...", self.export_needle_profile)
+        if self.session_recorder is None:
+            menu.addAction("Start Session Recording", self.start_session_recording)
+        else:
+            menu.addAction("Stop Session Recording", self.stop_session_recording)
+        menu.addAction("Replay Session...", self.open_replay)
+        menu.addAction("Export Performance Log", self.export_perf_log)
         menu.exec_(self.mapToGlobal(self.pos()))
 
+    def ui_state(self):
+        """Slice positions, zoom, pan and window/level, as recorded in a session"""
+        window_min, window_max = self.display_range()
+        return {'X': self.X, 'Y': self.Y, 'Z_for_axis': self.Z_for_axis,
+                'zoom_xy': self.zoom_xy, 'zoom_yz': self.zoom_yz, 'zoom_xz': self.zoom_xz,
+                'pan_xy_x': self.pan_xy[0], 'pan_xy_y': self.pan_xy[1], 'pan_yz_x': self.pan_yz[0],
+                'pan_yz_y': self.pan_yz[1], 'pan_xz_x': self.pan_xz[0], 'pan_xz_y': self.pan_xz[1],
+                'window_min': window_min if window_min is not None else np.nan,
+                'window_max': window_max if window_max is not None else np.nan,
+                'brightness': self.brightness, 'contrast': self.contrast}
+
+    def apply_ui_state(self, state):
+        """Restore a recorded UI state with one redraw"""
+        sliders = self.gui_components.sliders
+        for name, value in (("X Value", state['Y']), ("Y Value", state['X']), ("Z Value", state['Z_for_axis'])):
+            slider = sliders[name]['slider']
+            slider.blockSignals(True)
+            slider.setValue(int(value))
+            slider.blockSignals(False)
+            sliders[name]['label'].setText(str(int(value)))
+        self.X = self.geometry.slider_to_index(1, state['X'])
+        self.Y = self.geometry.slider_to_index(0, state['Y'])
+        self.set_z_value(int(state['Z_for_axis']))
+        self.zoom_xy, self.zoom_yz, self.zoom_xz = state['zoom_xy'], state['zoom_yz'], state['zoom_xz']
+        self.pan_xy = [state['pan_xy_x'], state['pan_xy_y']]
+        self.pan_yz = [state['pan_yz_x'], state['pan_yz_y']]
+        self.pan_xz = [state['pan_xz_x'], state['pan_xz_y']]
+        if not (np.isnan(state['window_min']) or np.isnan(state['window_max'])):
+            self.window_range = (state['window_min'], state['window_max'])
+        self.brightness, self.contrast = state['brightness'], state['contrast']
+        self.update_images()
+
+    def start_session_recording(self):
+        path = os.path.join("sessions", time.strftime("session-%Y%m%d-%H%M%S.psr"))
+        try:
+            self.session_recorder = SessionRecorder(path)
+        except OSError as e:
+            QMessageBox.warning(self, "Session Recording", f"Could not create '{path}': {e}")
+            return
+        self.csv_handler.recorder = self.session_recorder
+        self.session_recorder.add_state(self.ui_state())
+        self.statusBar().showMessage(f"Recording session to {path}")
+
+    def stop_session_recording(self):
+        if self.session_recorder is None:
+            return
+        self.csv_handler.recorder = None
+        self.session_recorder.close()
+        self.statusBar().showMessage(f"Session saved to {self.session_recorder.path}", 5000)
+        self.session_recorder = None
+
+    def open_replay(self):
+        file_path, _ = QFileDialog.getOpenFileName(self, "Select Session Recording", "sessions",
+                                                   "Session recordings (*.psr)")
+        if not file_path:
+            return
+        try:
+            reader = SessionReader(file_path)
+        except (OSError, ValueError) as e:
+            QMessageBox.warning(self, "Replay Session", f"Could not open '{file_path}': {e}")
+            return
+        # Replay drives the tracks; live acquisition and recording would interleave with it
+        self.stop_session_recording()
+        self.csv_handler.stop_realtime_monitoring()
+        self.close_replay()
+        self.session_reader = reader
+        self.replay_time = None
+        replay_bar = self.gui_components.replay_bar
+        replay_bar.show()
+        replay_bar.slider.blockSignals(True)
+        replay_bar.slider.setValue(0)
+        replay_bar.slider.blockSignals(False)
+        self.seek_replay(0.0)
+
+    def seek_replay(self, fraction):
+        """Show the recorded tracks and UI state at a fraction of the session's duration.
+
+        Moving forward appends only the samples recorded since the last position shown, so
+        projections, needle paths and deviation trackers carry on incrementally. Moving back
+        truncates the track buffers instead of re-reading them, but the caches see a shorter
+        track and rebuild it. A seek across a clear re-reads the tracks since that clear.
+        """
+        reader = self.session_reader
+        if reader is None:
+            return
+        t = reader.start + fraction * reader.duration()
+        tracks = self.csv_handler.tracks
+        previous = self.replay_time
+        if (previous is None or tracks.total_points() != self.replay_points
+                or reader.cleared_between(min(previous, t), max(previous, t))):
+            tracks.clear()
+            for track_id, points in reader.tracks_at(t).items():
+                tracks.get(track_id).extend(points)
+            # Tracks at the new time are not a continuation of the ones drawn before
+            self.track_projections = ProjectedTrackCache()
+            self.needle_paths = {}
+            self.deviation_trackers = {}
+        elif t >= previous:
+            for track_id, points in reader.tracks_between(previous, t).items():
+                tracks.get(track_id).extend(points)
+        else:
+            for track_id, points in reader.tracks_between(t, previous).items():
+                track = tracks.get(track_id)
+                track.truncate(len(track) - len(points))
+        self.replay_time = t
+        self.replay_points = tracks.total_points()
+        self.realtime_tracks = tracks.snapshot()
+        self.realtime_line_deleted = False
+        state = reader.state_at(t)
+        if state is not None and self.volume3d is not None:
+            self.apply_ui_state(state)
+        if self.realtime_tracks:
+            self.draw_realtime_line()
+        else:
+            for panel in self.gui_components.panels:
+                panel.set_realtime_tracks([])
+                panel.update()
+            self.gui_components.panel_3d_handler.update_realtime_tracks_vispy([], False, None)
+        self.gui_components.replay_bar.show_time(t - reader.start, reader.duration())
+
+    def close_replay(self):
+        if self.session_reader is None:
+            return
+        self.session_reader.close()
+        self.session_reader = None
+        self.replay_time = None
+        self.gui_components.replay_bar.hide()
+
+    def toggle_perf_overlay(self):
+        overlay = self.gui_components.perf_overlay
+        visible = not overlay.isVisible()
+        if visible:
+            perf_probes.enable(True)
+        overlay.set_visible(visible)
+
+    def export_perf_log(self):
+        if not perf_probes.stats():
+            QMessageBox.information(self, "Performance Log", "No timings recorded yet. Turn on the Perf Overlay first.")
+            return
+        message = f"Timings written to {perf_probes.export()}"
+        if latency_tracer.is_enabled():
+            message += f"\nLatency trace written to {latency_tracer.export()}"
+        QMessageBox.information(self, "Performance Log", message)
+
+    def on_latency_alarm(self, active, p99_ms):
+        if active:
+            self.statusBar().setStyleSheet("color: white; background-color: darkred;")
+            self.statusBar().showMessage(f"Real-time latency p99 {p99_ms:.0f} ms exceeds "
+                                         f"{latency_tracer.summary()['threshold_ms']:.0f} ms")
+        else:
+            self.statusBar().setStyleSheet("")
+            self.statusBar().showMessage(f"Real-time latency back to p99 {p99_ms:.0f} ms", 5000)
+
     def select_realtime_csv(self):
         file_path, _ = QFileDialog.getOpenFileName(self, "Select CSV File", "", "CSV files (*.csv)")
         if file_path:
@@ -304,18 +581,82 @@ class MainWindow(QMainWindow):
             self.cache_realtime_coordinates()
             print(f"Selected CSV file: {file_path}")
 
+    def ask_realtime_source(self, title, include_csv=False):
+        sources = {
+            "UDP stream": ("udp", "127.0.0.1:5005"),
+            "TCP stream": ("tcp", "127.0.0.1:5005"),
+            "Unix socket": ("unix", "/tmp/puncture_realtime.sock"),
+            "Shared memory ring": ("shm", DEFAULT_RING_NAME),
+        }
+        if include_csv:
+            sources = {"CSV file": ("csv", None), **sources}
+        label, ok = QInputDialog.getItem(self, title, "Tracker transport:", list(sources), 0, False)
+        if not ok:
+            return None
+        kind, default_address = sources[label]
+        if kind == "csv":
+            address, _ = QFileDialog.getOpenFileName(self, "Select CSV File", "", "CSV files (*.csv)")
+        else:
+            address, ok = QInputDialog.getText(self, title, f"{label} address:", text=default_address)
+            if not ok:
+                return None
+        if not address:
+            return None
+        return make_source(kind, address)
+
+    def select_realtime_source(self):
+        source = self.ask_realtime_source("Real-Time Source")
+        if source is None:
+            return
+        self.csv_handler.set_source(source)
+        self.realtime_line_deleted = False
+        print(f"Selected real-time source: {source.describe()}")
+
+    def add_realtime_track(self):
+        source = self.ask_realtime_source("Add Needle Track", include_csv=True)
+        if source is None:
+            return
+        track_id = self.csv_handler.add_track(source)
+        self.realtime_line_deleted = False
+        print(f"Added needle track {track_id}: {source.describe()}")
+
     def input_button_click(self):
         folder = QFileDialog.getExistingDirectory(self, "Select a Folder")
         if folder:
             self.load_folder(folder)
 
     def load_folder(self, folder):
-        folder_name = os.path.basename(folder)
-        destination = os.path.join(os.getcwd() + "/dicom-folder", folder_name)
-        if not os.path.exists(destination):
-            shutil.copytree(folder, destination)
-        self.dataList.append(destination)
-        self.gui_components.list_view.addItem(folder_name)
+        folder_name = self.dicom_registry.ingest(folder, self.ingest_mode,
+                                                 progress_callback=self.ingest_progress.emit,
+                                                 finished_callback=self.ingest_finished.emit)
+        if folder_name not in self.dataList:
+            self.dataList.append(folder_name)
+        self.gui_components.update_study_item(folder_name)
+
+    def on_ingest_progress(self, folder_name, done, total):
+        self.statusBar().showMessage(f"Copying '{folder_name}': {done}/{total} files")
+
+    def on_ingest_finished(self, folder_name):
+        self.statusBar().showMessage(f"'{folder_name}' ready", 3000)
+        self.refresh_study_index()
+
+    def populate_study_list(self):
+        """Fill the sidebar from the study index and registry without touching any DICOM file"""
+        names = self.study_index.names()
+        names += [name for name in self.dicom_registry.names() if name not in names]
+        for name in names:
+            if name not in self.dataList:
+                self.dataList.append(name)
+            self.gui_components.update_study_item(name, self.study_index.get(name), self.study_index.thumbnail(name))
+
+    def refresh_study_index(self):
+        self.study_index.scan_async(self.dicom_registry, self.study_index_updated.emit)
+
+    def on_study_index_updated(self, names):
+        for name in names:
+            if name not in self.dataList:
+                self.dataList.append(name)
+            self.gui_components.update_study_item(name, self.study_index.get(name), self.study_index.thumbnail(name))
 
     # *** THIS IS THE FIRST FIX ***
     def list_view_item_click(self):
@@ -328,7 +669,53 @@ class MainWindow(QMainWindow):
             self.IsSelectedItem = 1
 
     def load_dicom_images(self, folder_name):
-        volume3d, img_shape = self.dicom_handler.load_dicom_images(folder_name)
+        path = self.dicom_handler.resolve_path(folder_name)
+        key = f"{path}:{os.stat(path).st_mtime}" if os.path.isdir(path) else path
+        volume3d, meta = self.volume_manager.get(folder_name, key)
+        if volume3d is not None:
+            # Already open (or cached from an earlier session): no DICOM decode needed
+            img_shape = meta['shape']
+            self.global_min = meta['global_min']
+            self.global_max = meta['global_max']
+            self.histogram = VolumeHistogram.from_meta(meta.get('histogram'))
+            if self.histogram is None:
+                # Cached before histograms were recorded; build it once and keep it
+                self.histogram = VolumeHistogram.from_volume(volume3d)
+                self.volume_manager.update_meta(folder_name, histogram=self.histogram.to_meta())
+            stats_path = self.volume_manager.cache_path(folder_name, ".slices.npz")
+            self.slice_stats = SliceStatistics.load(stats_path, key)
+            if self.slice_stats is None:
+                self.slice_stats = SliceStatistics.from_volume(volume3d, key)
+                self.save_slice_stats(folder_name)
+            self.geometry = VolumeGeometry.from_meta(meta.get('geometry'), img_shape)
+            if self.geometry is None:
+                # Cached before geometry was recorded; the study index has the spacing
+                info = self.study_index.get(folder_name) or {}
+                self.geometry = VolumeGeometry.from_positions(
+                    img_shape, (info.get('spacing_x') or 1.0, info.get('spacing_y') or 1.0), None, None,
+                    thickness=info.get('spacing_z'))
+                self.volume_manager.update_meta(folder_name, geometry=self.geometry.to_meta())
+        else:
+            file_order = self.study_index.file_order(folder_name, path)
+            volume3d, img_shape = self.dicom_handler.load_dicom_images(folder_name, file_order)
+            # Min, max and histogram were gathered slice by slice during the decode
+            self.histogram = self.dicom_handler.histogram
+            self.global_min = self.histogram.min
+            self.global_max = self.histogram.max
+            self.geometry = self.dicom_handler.geometry
+            self.volume_manager.put(folder_name, volume3d,
+                                    {'key': key, 'global_min': self.global_min, 'global_max': self.global_max,
+                                     'histogram': self.histogram.to_meta(), 'geometry': self.geometry.to_meta()})
+            self.slice_stats = self.dicom_handler.slice_stats
+            self.slice_stats.key = key
+            self.save_slice_stats(folder_name)
+        info = self.study_index.get(folder_name)
+        if info is not None and not info.get('hu_exact'):
+            # The index only had one slice's range; the histogram has the whole series'
+            self.study_index.set_hu_range(folder_name, self.global_min, self.global_max)
+            self.gui_components.update_study_item(folder_name, self.study_index.get(folder_name), None)
+        self.set_window_preset(self.window_preset, redraw=False)
+        self.current_series = folder_name
         self.volume3d = volume3d
         self.X_init = img_shape[0]
         self.Y_init = img_shape[1]
@@ -336,16 +723,64 @@ class MainWindow(QMainWindow):
         self.X = img_shape[0] // 2
         self.Y = img_shape[1] // 2
         self.Z = img_shape[2] // 2
-        if self.volume3d is not None:
-            self.global_min = self.volume3d.min()
-            self.global_max = self.volume3d.max()
+        self.configure_sliders()
+        # HU samples belong to the previous volume; traverse again against this one
+        self.needle_paths = {}
+        self.slab_renderers = {}
+        self.update_plan_path()
+        if self.tissue_masks is None or self.tissue_masks.key != key:
+            self.tissue_masks = None
+            compute_tissue_masks(volume3d, self.volume_manager.cache_path(folder_name, ".tissue.npz"), key,
+                                 lambda masks: self.tissue_masks_ready.emit(folder_name, masks))
+        if self.slice_overview is None or self.slice_overview.key != key:
+            self.slice_overview = None
+            self.gui_components.filmstrip.set_overview(None, None)
+            compute_slice_overview(volume3d, key, lambda overview: self.slice_overview_ready.emit(folder_name, overview))
+        self.show_open_series()
+
+    def save_slice_stats(self, folder_name):
+        try:
+            path = self.volume_manager.cache_path(folder_name, ".slices.npz")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self.slice_stats.save(path)
+        except OSError as e:
+            print(f"Error saving slice statistics: {e}")
+
+    def panel_value_range(self, panel):
+        """(min, max) HU of the slice or slab a panel shows, from the slice statistics index"""
+        if self.slice_stats is None:
+            return None
+        axis, index = PLANE_AXES[panel.plane_name], self.slice_index(panel.plane_name)
+        if not -self.slice_stats.shape[axis] <= index < self.slice_stats.shape[axis]:
+            return None
+        if panel.slab_mode == "Slice" or panel.slab_thickness <= 1:
+            return self.slice_stats.value_range(axis, index)
+        # The same slices the slab renderer projects, shifted inward near the ends of the volume
+        start, stop = slab_bounds(index % self.slice_stats.shape[axis], panel.slab_thickness,
+                                  self.slice_stats.shape[axis])
+        return self.slice_stats.value_range(axis, start, stop)
+
+    def show_open_series(self):
+        resident_mb = self.volume_manager.resident_bytes() / (1024 * 1024)
+        budget_mb = self.volume_manager.budget_bytes / (1024 * 1024)
+        names = ", ".join(self.volume_manager.open_names())
+        message = f"Open series: {names} ({resident_mb:.0f} / {budget_mb:.0f} MB in RAM)"
+        if self.slice_stats is not None:
+            blank = len(self.slice_stats.blank(2))
+            if blank:
+                message += f"; {blank} blank axial slice(s)"
+        self.statusBar().showMessage(message)
 
     def btnLoadPictures_Click(self):
         if self.IsSelectedItem == 0 or self.selectedItem is None:
             QMessageBox.warning(self, "No Selection", "Please select a file from the list first.")
             return
 
-        self.load_dicom_images(self.selectedItem)
+        try:
+            self.load_dicom_images(self.selectedItem)
+        except DecodeError as e:
+            QMessageBox.warning(self, "Load Series", f"Could not decode '{self.selectedItem}': {e}")
+            return
 
         self.update_images()
 
@@ -359,59 +794,54 @@ class MainWindow(QMainWindow):
 
         if self.gui_components.panel_3d_handler.canvas:
             container_layout.addWidget(self.gui_components.panel_3d_handler.canvas.native)
+            latency_tracer.set_active_displays(latency_tracer.DISPLAY_STAGES)
 
 
+    @perf_probes.probe("load_panel_image")
     def load_panel_image(self, panel, num):
-        if self.IsSelectedItem == 0 or self.volume3d is None:
+        if self.volume3d is None:
             return
         image_2d = None
         
         if self.panel_locks[num] and hasattr(panel, 'image_data') and panel.image_data is not None:
             image_2d = panel.image_data
         else:
-            plane_name = panel.plane_name
             try:
-                if plane_name == "XY":
-                    image_2d = self.volume3d[:, :, self.Z]
-                elif plane_name == "YZ":
-                    image_2d = np.flipud(np.rot90(self.volume3d[:, self.Y, :]))
-                elif plane_name == "XZ":
-                    image_2d = np.flipud(np.rot90(self.volume3d[self.X, :, :]))
+                image_2d = extract_plane(self.volume3d, panel.plane_name, self.slice_index(panel.plane_name),
+                                         panel.slab_mode, panel.slab_thickness, self.slab_renderers)
             except (IndexError, AttributeError):
-                image_2d = np.zeros((512, 512), dtype=np.int16)
+                width, height = self.geometry.panel(panel.plane_name).size
+                image_2d = np.zeros((height, width), dtype=np.int16)
         
         if image_2d is None:
             return
 
         zoom = self.get_zoom_for_panel(num)
-        self.gui_components.update_panel_image(panel, image_2d, zoom, self.brightness, self.contrast)
+        self.gui_components.update_panel_image(panel, image_2d, zoom, self.brightness, self.contrast,
+                                               value_range=self.panel_value_range(panel),
+                                               scale=self.geometry.panel(panel.plane_name).scale)
         
         plane_name = panel.plane_name
         if plane_name == "XY":
-            self.draw_axes_value_change(panel, "magenta", "yellow", self.Y, self.X)
+            self.draw_axes_value_change(panel, "magenta", "yellow")
         elif plane_name == "YZ":
-            self.draw_axes_value_change(panel, "blue", "magenta", self.X, self.Z_for_axis)
+            self.draw_axes_value_change(panel, "blue", "magenta")
         elif plane_name == "XZ":
-            self.draw_axes_value_change(panel, "blue", "yellow", self.Y, self.Z_for_axis)
+            self.draw_axes_value_change(panel, "blue", "yellow")
             
         try:
             if not self.is_clear:
-                self.draw_needle_plan()
-
+                self.draw_needle_plan([panel])
+            self.draw_realtime_line_optimized([panel])
         except AttributeError:
             pass
+        if self.session_recorder is not None:
+            # Unchanged states are dropped by the recorder, so this costs nothing for the other panels
+            self.session_recorder.add_state(self.ui_state())
 
-    def draw_axes_value_change(self, panel, x_color, y_color, x_axis, y_axis):
-        panel.axes_lines = []
-        plane_type = panel.plane_name.lower()
-        
-        if y_axis == self.Z_for_axis:
-            x_pos, _ = self.get_canvas_coordinates(panel, x_axis, 0, plane_type)
-            _, y_pos = self.get_canvas_coordinates(panel, 0, y_axis, plane_type)
-        else:
-            x_pos, _ = self.get_canvas_coordinates(panel, x_axis, 0, plane_type)
-            _, y_pos = self.get_canvas_coordinates(panel, 0, y_axis, plane_type)
-        
+    def draw_axes_value_change(self, panel, x_color, y_color):
+        """Crosshair through the current (x, y, z) voxel: a horizontal line in x_color, a vertical one in y_color"""
+        x_pos, y_pos, _ = self.panel_projection(panel).project([self.Y, self.X, self.Z])[0]
         panel.axes_lines = [
             {'type': 'horizontal', 'y': y_pos, 'color': x_color},
             {'type': 'vertical', 'x': x_pos, 'color': y_color}
@@ -422,35 +852,27 @@ class MainWindow(QMainWindow):
         for num, panel in enumerate(self.gui_components.panels):
             self.load_panel_image(panel, num)
 
-    def get_canvas_coordinates(self, panel, image_x, image_y, plane_type):
-        canvas_width = panel.width() or 300
-        canvas_height = panel.height() or 300
-        
+    def panel_projection(self, panel):
+        """Map from voxel coordinates to the panel's widget pixels plus depth (voxels along the panel normal)"""
         try:
             panel_index = self.gui_components.panels.index(panel)
         except ValueError:
             panel_index = -1
-
-        if panel_index == 0:
-            zoom_factor = self.zoom_xy
-            pan_offset = self.pan_xy
-        elif panel_index == 1:
-            zoom_factor = self.zoom_yz
-            pan_offset = self.pan_yz
-        elif panel_index == 2:
-            zoom_factor = self.zoom_xz
-            pan_offset = self.pan_xz
-        else:
-            zoom_factor = 1.0
-            pan_offset = [0, 0]
-
-        zoomed_width = 512 * zoom_factor
-        zoomed_height = 512 * zoom_factor
-        offset_x = (canvas_width - zoomed_width) / 2 + pan_offset[0]
-        offset_y = (canvas_height - zoomed_height) / 2 + pan_offset[1]
-        canvas_x = offset_x + (image_x * zoom_factor)
-        canvas_y = offset_y + (image_y * zoom_factor)
-        return canvas_x, canvas_y
+        return self.geometry.panel(panel.plane_name).screen_projection(
+            self.get_zoom_for_panel(panel_index), panel.width() or 300, panel.height() or 300,
+            self.get_pan_for_panel(panel_index))
+
+    def panel_slice_position(self, panel):
+        return self.panel_slice_position_for(panel.plane_name)
+
+    def panel_slice_position_for(self, plane_name):
+        """Depth of the slice a panel shows: z for XY, x for YZ, y for XZ"""
+        plane_name = plane_name.lower()
+        if plane_name == 'xy':
+            return self.Z
+        if plane_name == 'yz':
+            return self.Y
+        return self.X
 
     def reset_pan_all(self):
         self.pan_xy = [0, 0]
@@ -487,43 +909,91 @@ class MainWindow(QMainWindow):
         file_path, _ = QFileDialog.getOpenFileName(self, "Select CSV File", "", "CSV files (*.csv)")
         if not file_path:
             return
-        self.point_start, self.point_end = self.csv_handler.load_plan_coordinates(file_path)
-        if self.point_start is None or self.point_end is None:
+        point_start, point_end = self.csv_handler.load_plan_coordinates(file_path)
+        if point_start is None or point_end is None:
             return
-        self.original_needle_coords = {
-            'xy': {
-                'start': (self.point_start[0], self.point_start[1]),
-                'end': (self.point_end[0], self.point_end[1])
-            }
-        }
+        self.set_plan(point_start, point_end)
+
+    def set_plan(self, point_start, point_end):
+        """Use a planned entry -> target route (from a CSV or the trajectory planner)"""
+        self.point_start, self.point_end = list(point_start), list(point_end)
+        endpoints = self.plan_endpoints()
+        self.deviation_trackers = {}
+        self.update_plan_path()
+        self.show_plan_risk()
+        self.original_needle_coords = {}
+        for plane_name in ('xy', 'yz', 'xz'):
+            projected = self.geometry.panel(plane_name).image_projection().project(endpoints)
+            self.original_needle_coords[plane_name] = {'start': tuple(projected[0, :2]), 'end': tuple(projected[1, :2])}
         self.is_clear = False
         self.plan_line_deleted = False
         self.draw_needle_plan()
         self.gui_components.panel_3d_handler.draw_needle_plan_vispy(self.point_start, self.point_end, self.plan_line_deleted)
 
-    def draw_needle_plan(self):
-        if self.plan_line_deleted or not self.original_needle_coords.get('xy') or not self.original_needle_coords['xy'].get('start'):
+    def suggest_trajectories(self):
+        if self.volume3d is None:
+            QMessageBox.warning(self, "No Series", "Load a DICOM series first.")
+            return
+        default = f"{self.Y},{self.X},{self.panel_slice_position_for('xy')}"
+        text, ok = QInputDialog.getText(self, "Suggest Trajectories", "Target voxel x,y,z:", text=default)
+        if not ok:
             return
         try:
-            for panel in self.gui_components.panels:
-                if panel.plane_name.lower() == 'xy':
-                    start_coords = self.original_needle_coords['xy']['start']
-                    end_coords = self.original_needle_coords['xy']['end']
-
-                    if start_coords is None or end_coords is None:
-                        continue
-                    
-                    x0_screen, y0_screen = self.get_canvas_coordinates(panel, start_coords[0], start_coords[1], 'xy')
-                    x1_screen, y1_screen = self.get_canvas_coordinates(panel, end_coords[0], end_coords[1], 'xy')
-                    
+            target = [float(value) for value in text.split(',')]
+            if len(target) != 3:
+                raise ValueError(text)
+        except ValueError:
+            QMessageBox.warning(self, "Suggest Trajectories", f"'{text}' is not an x,y,z voxel.")
+            return
+        self.statusBar().showMessage("Searching entry points...")
+        volume3d, masks = self.volume3d, self.tissue_masks
+
+        def worker():
+            try:
+                started = time.perf_counter()
+                routes, evaluated = TrajectoryPlanner(volume3d, masks).suggest(target)
+                self.trajectories_ready.emit(routes, evaluated, time.perf_counter() - started)
+            except Exception as e:
+                print(f"Error planning trajectories: {e}")
+                self.trajectories_ready.emit([], 0, 0.0)
+        threading.Thread(target=worker, daemon=True).start()
+
+    def on_trajectories_ready(self, routes, evaluated, seconds):
+        if not routes:
+            self.statusBar().showMessage("No entry point found within reach of the target", 5000)
+            return
+        self.statusBar().showMessage(f"Scored {evaluated} entry points in {seconds:.1f} s", 5000)
+        labels = [f"{i + 1}: entry ({route['entry'][0]:.0f}, {route['entry'][1]:.0f}, {route['entry'][2]:.0f}), "
+                  f"length {route['length']:.0f}, cost {route['cost']:.0f}" for i, route in enumerate(routes)]
+        label, ok = QInputDialog.getItem(self, "Suggested Trajectories", "Route:", labels, 0, False)
+        if ok:
+            route = routes[labels.index(label)]
+            self.set_plan(route['entry'].tolist(), route['target'].tolist())
+
+    def plan_endpoints(self):
+        """Planned entry and target as a (2, 3) array; a 2D plan lies on the current axial slice"""
+        z = self.panel_slice_position_for('xy')
+        return np.array([[*point[:2], point[2] if len(point) > 2 else z] for point in (self.point_start, self.point_end)],
+                        dtype=np.float64)
+
+    def draw_needle_plan(self, panels=None):
+        if self.plan_line_deleted or self.point_start is None or self.point_end is None:
+            return
+        try:
+            endpoints = self.plan_endpoints()
+            for panel in panels or self.gui_components.panels:
+                start, end = self.panel_projection(panel).project(endpoints)
+                segment = clip_segment_to_slab(start, end, self.panel_slice_position(panel), self.panel_overlay_slab(panel))
+                if segment is None:
+                    panel.needle_line = None
+                else:
                     panel.needle_line = {
-                        'start': (x0_screen, y0_screen),
-                        'end': (x1_screen, y1_screen),
+                        'start': (float(segment[0][0]), float(segment[0][1])),
+                        'end': (float(segment[1][0]), float(segment[1][1])),
                         'color': 'green'
                     }
-                    panel.update()
-                    break
-        except (AttributeError, TypeError, KeyError) as e:
+                panel.update()
+        except (AttributeError, TypeError, KeyError, ValueError) as e:
             print(f"Error drawing needle plan: {e}")
 
     def start_realtime_data(self):
@@ -532,36 +1002,152 @@ class MainWindow(QMainWindow):
     def stop_realtime_data(self):
         self.csv_handler.stop_realtime_monitoring()
 
+    def schedule_realtime_draw(self):
+        """Called from the acquisition thread; queues at most one redraw on the UI thread"""
+        if not self.realtime_draw_pending:
+            self.realtime_draw_pending = True
+            self.realtime_samples_ready.emit()
+
+    def on_realtime_samples_ready(self):
+        self.realtime_draw_pending = False
+        self.draw_realtime_line()
+
     def draw_realtime_line(self):
         if self.realtime_line_deleted:
             return
         self.cache_realtime_coordinates()
+        self.update_needle_paths()
+        self.update_deviation()
         self.draw_realtime_line_optimized()
-        self.gui_components.panel_3d_handler.update_realtime_line_vispy(self.csv_handler.realtime_points, self.realtime_line_deleted)
+        self.gui_components.panel_3d_handler.update_realtime_tracks_vispy(
+            self.realtime_tracks, self.realtime_line_deleted, self.csv_handler.previous_data_length - 1)
+
+    def update_needle_paths(self):
+        """Extend each track's voxel path with the samples that arrived since the last call"""
+        for track_id, _, points in self.realtime_tracks:
+            path = self.needle_paths.get(track_id)
+            if path is None:
+                path = self.needle_paths[track_id] = NeedlePath(self.volume3d)
+            path.update(points)
+
+    def update_plan_path(self):
+        if self.point_start is None or self.point_end is None:
+            self.plan_path = None
+            return
+        self.plan_path = NeedlePath(self.volume3d)
+        self.plan_path.update(self.plan_endpoints())
+
+    def on_tissue_masks_ready(self, folder_name, masks):
+        if folder_name != self.current_series:
+            return
+        self.tissue_masks = masks
+        self.volume_manager.update_meta(folder_name, tissue_cache=self.volume_manager.cache_path(folder_name, ".tissue.npz"))
+        self.show_plan_risk()
+
+    def on_slice_overview_ready(self, folder_name, overview):
+        if folder_name != self.current_series:
+            return
+        self.slice_overview = overview
+        self.gui_components.filmstrip.set_overview(overview, self.display_range())
+
+    def display_range(self):
+        """HU range mapped to black..white by the current window"""
+        return self.window_range or (self.global_min, self.global_max)
+
+    def go_to_slice(self, plane_name, index):
+        """Move the slider of a plane to a volume slice index (z for XY, x for YZ, y for XZ)"""
+        if plane_name == "XY":
+            self.gui_components.sliders["Z Value"]['slider'].setValue(self.geometry.index_to_slider(2, index))
+        elif plane_name == "YZ":
+            self.gui_components.sliders["X Value"]['slider'].setValue(self.geometry.index_to_slider(0, index))
+        elif plane_name == "XZ":
+            self.gui_components.sliders["Y Value"]['slider'].setValue(self.geometry.index_to_slider(1, index))
 
-    def draw_realtime_line_optimized(self):
-        if self.realtime_line_deleted or not self.realtime_needle_coords.get('xy'):
+    def show_plan_risk(self):
+        """Report how close the planned route comes to bone and vessels"""
+        if self.tissue_masks is None or self.plan_path is None or not len(self.plan_path.voxels()):
+            return
+        voxels = self.plan_path.voxels()
+        risk = self.tissue_masks.route_risk(voxels)
+        parts = [f"nearest {tissue} {distance:.0f} voxels" for tissue, (distance, _) in risk.items()]
+        crossed = [tissue for tissue in RISK_TISSUES if self.tissue_masks.contains(tissue, voxels).any()]
+        message = "Planned route: " + ", ".join(parts)
+        if crossed:
+            message += " - crosses " + " and ".join(crossed)
+        self.statusBar().showMessage(message)
+
+    def export_needle_profile(self):
+        paths = dict(self.needle_paths)
+        if self.plan_path is not None:
+            paths = {'plan': self.plan_path, **paths}
+        if not paths:
+            QMessageBox.information(self, "HU Profile", "Load a planned route or start a real-time route first.")
+            return
+        file_path, _ = QFileDialog.getSaveFileName(self, "Export Needle HU Profile", "needle-profile.csv", "CSV files (*.csv)")
+        if not file_path:
+            return
+        with open(file_path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['route', 'distance', 'x', 'y', 'z', 'hu'])
+            for route, path in paths.items():
+                distance, values = path.profile()
+                for d, (x, y, z), hu in zip(distance.tolist(), path.voxels().tolist(), values.tolist()):
+                    writer.writerow([route, f"{d:.2f}", x, y, z, "" if np.isnan(hu) else f"{hu:.1f}"])
+        self.statusBar().showMessage(f"HU profile written to {file_path}", 5000)
+
+    def update_deviation(self):
+        """Feed new samples of every track to its deviation tracker and show the result"""
+        if self.point_start is None or self.point_end is None or not self.realtime_tracks:
+            return
+        entry, target = self.plan_endpoints()
+        lines = []
+        alarm = False
+        for track_id, _, points in self.realtime_tracks:
+            tracker = self.deviation_trackers.get(track_id)
+            if tracker is None:
+                tracker = self.deviation_trackers[track_id] = DeviationTracker(
+                    entry, target, self.deviation_distance_alarm, self.deviation_angle_alarm)
+            tracker.update(points)
+            alarm = alarm or tracker.alarm
+            line = f"{track_id}: {tracker.format()}"
+            path = self.needle_paths.get(track_id)
+            tip = path.tip() if path is not None else None
+            if tip is not None:
+                tip_voxel, tip_hu = tip
+                if not np.isnan(tip_hu):
+                    line += f", tip {tip_hu:.0f} HU"
+                if self.tissue_masks is not None:
+                    line += "".join(f", {tissue} {self.tissue_masks.distance(tissue, tip_voxel[None, :])[0]:.0f}"
+                                    for tissue in RISK_TISSUES)
+            lines.append(line)
+        self.deviation_label.setText("  |  ".join(lines))
+        if alarm != self.deviation_alarm:
+            self.deviation_alarm = alarm
+            if alarm:
+                self.deviation_label.setStyleSheet("color: white; background-color: darkred;")
+                self.statusBar().showMessage(f"Needle off plan by more than {self.deviation_distance_alarm:.1f} voxels "
+                                             f"or {self.deviation_angle_alarm:.1f}°")
+            else:
+                self.deviation_label.setStyleSheet("")
+                self.statusBar().showMessage("Needle back within plan tolerance", 5000)
+
+    def draw_realtime_line_optimized(self, panels=None):
+        if self.realtime_line_deleted or not self.realtime_tracks:
             return
         
-        for panel in self.gui_components.panels:
-            if panel.plane_name.lower() == 'xy':
-                panel.realtime_lines = []
-                
-                cached_coords = self.realtime_needle_coords['xy']
-                line_segments = []
-                for i in range(1, len(cached_coords)):
-                    x0, y0 = cached_coords[i-1]
-                    x1, y1 = cached_coords[i]
-                    x0_screen, y0_screen = self.get_canvas_coordinates(panel, x0, y0, 'xy')
-                    x1_screen, y1_screen = self.get_canvas_coordinates(panel, x1, y1, 'xy')
-                    line_segments.append({
-                        'start': (x0_screen, y0_screen),
-                        'end': (x1_screen, y1_screen),
-                        'color': 'red'
-                    })
-                panel.realtime_lines = line_segments
-                panel.update()
-                break
+        for panel in panels or self.gui_components.panels:
+            # One affine per panel (plane, zoom and pan folded together), applied to new samples only
+            panel_index = self.gui_components.panels.index(panel)
+            projection = self.panel_projection(panel)
+            slice_position = self.panel_slice_position(panel)
+            overlay_slab = self.panel_overlay_slab(panel)
+            coords = [(color, self.track_projections.project(panel_index, track_id, points, projection))
+                      for track_id, color, points in self.realtime_tracks]
+            self.realtime_needle_coords[panel.plane_name.lower()] = coords
+            panel.set_realtime_tracks([(color, screen[start:stop, :2]) for color, screen in coords
+                                       for start, stop in slab_runs(screen[:, 2], slice_position, overlay_slab)])
+            panel.realtime_trace_id = self.csv_handler.previous_data_length - 1
+            panel.update()
 
     def clear_needle(self):
         self.is_clear = True
@@ -570,7 +1156,7 @@ class MainWindow(QMainWindow):
         self.realtime_needle_coords = {'xy': [], 'yz': [], 'xz': []}
         for panel in self.gui_components.panels:
             panel.needle_line = None
-            panel.realtime_lines = []
+            panel.realtime_tracks = []
             panel.update()
         self.gui_components.panel_3d_handler.clear_lines()
 
@@ -585,7 +1171,7 @@ class MainWindow(QMainWindow):
         self.realtime_line_deleted = True
         self.realtime_needle_coords = {'xy': [], 'yz': [], 'xz': []}
         for panel in self.gui_components.panels:
-            panel.realtime_lines = []
+            panel.realtime_tracks = []
             panel.update()
         self.gui_components.panel_3d_handler.update_realtime_line_vispy([], self.realtime_line_deleted)
 
@@ -607,22 +1193,29 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, "No Selection", "Please select a file to delete.")
             return
         folder_name = current_item.text()
-        folder_path = os.path.join(os.getcwd(), "dicom-folder", folder_name)
-        reply = QMessageBox.question(self, "Delete File", f"Are you sure you want to delete '{folder_name}'?",
+        if self.dicom_registry.is_owned(folder_name):
+            question = f"Are you sure you want to delete '{folder_name}'?"
+        else:
+            question = f"Remove '{folder_name}' from the list? The original files are left in place."
+        reply = QMessageBox.question(self, "Delete File", question,
                                 QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
         if reply == QMessageBox.Yes:
             try:
-                if os.path.exists(folder_path):
-                    shutil.rmtree(folder_path)
+                self.dicom_registry.remove(folder_name)
+                self.study_index.remove(folder_name)
+                self.volume_manager.discard(folder_name)
                 row = self.gui_components.list_view.row(current_item)
                 self.gui_components.list_view.takeItem(row)
-                if folder_path in self.dataList:
-                    self.dataList.remove(folder_path)
+                if folder_name in self.dataList:
+                    self.dataList.remove(folder_name)
                 self.selectedItem = None
                 self.IsSelectedItem = 0
-                self.volume3d = None
-                self.clear_needle()
-                self.clear_all_canvases()
+                if folder_name == self.current_series:
+                    # Other open series stay loaded; only the displayed one is torn down
+                    self.current_series = None
+                    self.volume3d = None
+                    self.clear_needle()
+                    self.clear_all_canvases()
                 QMessageBox.information(self, "Deleted", f"'{folder_name}' has been deleted.")
             except Exception as e:
                 QMessageBox.critical(self, "Error", f"Failed to delete '{folder_name}': {e}")
@@ -632,7 +1225,7 @@ class MainWindow(QMainWindow):
             panel.image_data = None
             panel.current_pixmap = None
             panel.needle_line = None
-            panel.realtime_lines = []
+            panel.realtime_tracks = []
             panel.axes_lines = []
             panel.update()
 
@@ -655,4 +1248,6 @@ class MainWindow(QMainWindow):
             placeholder_label.setStyleSheet("background-color: black; color: white;")
             layout.addWidget(placeholder_label)
 
+        self.slice_overview = None
+        self.gui_components.filmstrip.set_overview(None, None)
         self.volume3d = None
\ No newline at end of file
@@ -0,0 +1,135 @@
+import asyncio
+import threading
+import time
+
+
+class AcquisitionEngine:
+    """Drives any number of real-time sources on one asyncio event loop.
+
+    The loop runs on a single background thread no matter how many sources are attached.
+    Each source gets a reader task that pushes batches into one bounded queue; when the
+    queue is full the readers wait (backpressure), and the delivery task coalesces whatever
+    is queued into a single on_samples(source_id, samples, parsed_at) call per source, where
+    parsed_at is [(count, time)] runs saying when each batch was decoded. stop() cancels
+    every task, closes the sources and joins the thread, so a restart never leaves a
+    second reader attached to the same source.
+    """
+
+    def __init__(self, on_samples, queue_size=256):
+        self.on_samples = on_samples
+        self.queue_size = queue_size
+        self.sources = {}
+        self.loop = None
+        self.thread = None
+        self.tasks = {}
+        self.queue = None
+        self.stop_event = None
+        self.started = threading.Event()
+        self.lock = threading.Lock()
+        self.delivered = 0
+
+    def is_running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def add_source(self, source_id, source):
+        """Attach a source; if the engine is running it starts reading immediately"""
+        with self.lock:
+            old = self.sources.get(source_id)
+            self.sources[source_id] = source
+        if self.is_running():
+            if old is not None:
+                self._call_in_loop(self._cancel_reader, source_id)
+            self._call_in_loop(self._start_reader, source_id, source)
+
+    def remove_source(self, source_id):
+        with self.lock:
+            source = self.sources.pop(source_id, None)
+        if source is not None and self.is_running():
+            self._call_in_loop(self._cancel_reader, source_id)
+
+    def start(self):
+        if self.is_running():
+            return
+        self.started.clear()
+        self.thread = threading.Thread(target=self._run, name="acquisition-engine")
+        self.thread.daemon = True
+        self.thread.start()
+        self.started.wait(timeout=2)
+
+    def stop(self, timeout=2.0):
+        """Cancel all readers, close their sources and wait for the loop thread to exit"""
+        if not self.is_running():
+            self.thread = None
+            return
+        self.loop.call_soon_threadsafe(self.stop_event.set)
+        self.thread.join(timeout)
+        if self.thread.is_alive():
+            print("Acquisition engine did not stop in time")
+        self.thread = None
+
+    def _call_in_loop(self, func, *args):
+        self.loop.call_soon_threadsafe(func, *args)
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self._main())
+        finally:
+            self.loop.close()
+
+    async def _main(self):
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self.stop_event = asyncio.Event()
+        self.tasks = {}
+        with self.lock:
+            sources = dict(self.sources)
+        for source_id, source in sources.items():
+            self._start_reader(source_id, source)
+        delivery = asyncio.ensure_future(self._deliver())
+        self.started.set()
+
+        await self.stop_event.wait()
+
+        readers = list(self.tasks.values())
+        for task in readers + [delivery]:
+            task.cancel()
+        await asyncio.gather(*readers, delivery, return_exceptions=True)
+        self.tasks = {}
+
+    def _start_reader(self, source_id, source):
+        self.tasks[source_id] = asyncio.ensure_future(self._read(source_id, source))
+
+    def _cancel_reader(self, source_id):
+        task = self.tasks.pop(source_id, None)
+        if task is not None:
+            task.cancel()
+
+    async def _read(self, source_id, source):
+        try:
+            source.open()
+            while True:
+                samples = await source.read_async()
+                await self.queue.put((source_id, samples, time.time()))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Error reading real-time source {source.describe()}: {e}")
+        finally:
+            source.close()
+
+    async def _deliver(self):
+        while True:
+            source_id, samples, parsed = await self.queue.get()
+            batches = {source_id: (list(samples), [(len(samples), parsed)])}
+            while not self.queue.empty():
+                source_id, samples, parsed = self.queue.get_nowait()
+                batch, parsed_at = batches.setdefault(source_id, ([], []))
+                batch.extend(samples)
+                parsed_at.append((len(samples), parsed))
+            for source_id, (samples, parsed_at) in batches.items():
+                try:
+                    self.on_samples(source_id, samples, parsed_at)
+                except Exception as e:
+                    print(f"Error handling real-time samples: {e}")
+                self.delivered += len(samples)
@@ -1,60 +1,127 @@
 import csv
-import threading
+import itertools
 import time
+from handlers.realtime_sources import CSVTailSource
+from handlers.acquisition_engine import AcquisitionEngine
+from handlers.track_registry import TrackRegistry
+import perf_probes
+import latency_tracer
 
 class CSVHandler:
+    PRIMARY_SOURCE = "primary"
+
     def __init__(self, callback_func):
         self.csv_file_path = None
+        self.source = None
+        # Every source feeds its own needle track; the primary one is the CSV/stream picked in the File menu
+        self.sources = {}
+        self.tracks = TrackRegistry()
+        self.track_count = 1
         self.previous_data_length = 0
-        self.realtime_points = []
-        self.check_csv_thread = None
+        self.engine = AcquisitionEngine(self.on_engine_samples)
         self.stop_thread = False
         self.callback_func = callback_func
+        # SessionRecorder receiving every ingested sample while a session is being recorded
+        self.recorder = None
+
+    @property
+    def realtime_points(self):
+        """(N, 3) points of the primary track"""
+        return self.tracks.get(self.PRIMARY_SOURCE).points()
         
     def set_csv_file(self, file_path):
         """Set the CSV file path for real-time monitoring"""
         self.csv_file_path = file_path
+        self.set_source(CSVTailSource(file_path))
+
+    def set_source(self, source, track_id=PRIMARY_SOURCE):
+        """Use another real-time source (socket stream, shared-memory ring...) for a track"""
+        if track_id == self.PRIMARY_SOURCE:
+            self.source = source
+        self.sources[track_id] = source
+        self.tracks.get(track_id)
+        self.engine.add_source(track_id, source)
+
+    def add_track(self, source):
+        """Attach a source as an additional needle track; returns the new track id"""
+        self.track_count += 1
+        track_id = f"track-{self.track_count}"
+        self.set_source(source, track_id)
+        return track_id
+
+    def remove_track(self, track_id):
+        self.engine.remove_source(track_id)
+        self.sources.pop(track_id, None)
+        if track_id != self.PRIMARY_SOURCE:
+            self.tracks.remove(track_id)
         
     def start_realtime_monitoring(self):
-        """Start monitoring CSV file for new data"""
-        if self.csv_file_path is None:
-            print("Please select a CSV file first.")
+        """Start monitoring the real-time sources for new data"""
+        if not self.sources:
+            print("Please select a CSV file or real-time source first.")
             return
 
-        if self.check_csv_thread is None:
-            self.stop_thread = False
-            self.check_csv_thread = threading.Thread(target=self.check_csv_for_updates)
-            self.check_csv_thread.daemon = True
-            self.check_csv_thread.start()
-            print("Started real-time data acquisition")
-            
+        if not self.engine.is_running():
+            self.engine.start()
+            names = ", ".join(source.describe() for source in self.sources.values())
+            print(f"Started real-time data acquisition from {names}")
+
     def stop_realtime_monitoring(self):
-        """Stop monitoring CSV file"""
-        self.stop_thread = True
-        self.check_csv_thread = None
+        """Stop monitoring the real-time sources; returns once the readers have shut down"""
+        self.engine.stop()
         print("Stopped real-time data acquisition")
-        
-    def check_csv_for_updates(self):
-        """Check CSV file for new data periodically"""
-        while not self.stop_thread:
-            try:
-                with open(self.csv_file_path, 'r') as file:
-                    reader = csv.reader(file)
-                    data = list(reader)
 
-                if len(data) > self.previous_data_length:
-                    new_rows = data[self.previous_data_length:]
-                    self.previous_data_length = len(data)
+    def is_monitoring(self):
+        return self.engine.is_running()
 
-                    for row in new_rows:
-                        x, y, z = map(float, row)
-                        self.realtime_points.append([x, y, z])
-                        self.callback_func()
+    def on_engine_samples(self, source_id, samples, parsed_at):
+        """Called from the acquisition engine's thread with a coalesced batch"""
+        if source_id in self.sources:
+            self.ingest_samples(samples, source_id, parsed_at)
 
-                # time.sleep(1)
-            except Exception as e:
-                print(f"Error reading CSV file: {e}")
-                break
+    def ingest_samples(self, samples, track_id=PRIMARY_SOURCE, parsed_at=None):
+        """Append (x, y, z, timestamp) samples to a track and notify the GUI once for the whole batch
+
+        parsed_at is [(count, time)] runs of when the source decoded the samples, for the latency
+        trace; without it they count as parsed when they get here.
+        """
+        if parsed_at is None:
+            parsed_at = [(len(samples), time.time())]
+        with perf_probes.section("realtime.ingest"):
+            self.tracks.get(track_id).extend([sample[:3] for sample in samples])
+            if self.recorder is not None:
+                self.recorder.add_samples(track_id, samples)
+            # Latency trace ids are a sequence shared by all tracks
+            first_id = self.previous_data_length
+            self.previous_data_length += len(samples)
+            if latency_tracer.is_enabled():
+                parsed_times = itertools.chain.from_iterable(itertools.repeat(t, count) for count, t in parsed_at)
+                for sample_id, sample, parsed in zip(itertools.count(first_id), samples, parsed_times):
+                    if sample[3] is not None:
+                        latency_tracer.mark(sample_id, "write", sample[3])
+                    latency_tracer.mark(sample_id, "parse", parsed)
+        with perf_probes.section("csv.callback"):
+            self.callback_func()
+        # Stamped once the GUI has been notified, so "callback" covers the append, recording and hand-off
+        latency_tracer.mark_upto(first_id + len(samples) - 1, "callback")
+        
+    def check_csv_for_updates(self):
+        """Synchronously read the source on the calling thread until stop_thread is set
+        (used by scripts and benchmarks; the GUI uses the acquisition engine)"""
+        source = self.source
+        if source is None and self.csv_file_path is not None:
+            source = self.source = CSVTailSource(self.csv_file_path)
+        try:
+            source.open()
+            while not self.stop_thread:
+                with perf_probes.section("csv.read"):
+                    samples = source.read(timeout=0.05)
+                if samples:
+                    self.ingest_samples(samples, parsed_at=[(len(samples), time.time())])
+        except Exception as e:
+            print(f"Error reading real-time source: {e}")
+        finally:
+            source.close()
                 
     def load_plan_coordinates(self, file_path):
         """Load planned coordinates from CSV file"""
@@ -68,6 +135,9 @@ class CSVHandler:
         return points[0], points[1]
         
     def clear_realtime_points(self):
-        """Clear all real-time points"""
-        self.realtime_points = []
+        """Clear the points of every track"""
+        self.tracks.clear()
         self.previous_data_length = 0
+        if self.recorder is not None:
+            self.recorder.mark_clear()
+        latency_tracer.reset()
@@ -0,0 +1,134 @@
+import math
+from collections import deque
+import numpy as np # type: ignore
+
+# Below this insertion length (voxels) the direction of the real-time route is mostly noise
+MIN_ANGLE_LENGTH = 5.0
+
+
+class RollingStats:
+    """Statistics of a value stream, O(1) per value: mean/std/max over everything seen
+    (Welford) and over the last `window` values (running sums and a monotonic max queue)"""
+
+    def __init__(self, window=500):
+        self.window = window
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.peak = -math.inf
+        self.recent = deque()
+        self.recent_sum = 0.0
+        self.recent_sumsq = 0.0
+        self.recent_max = deque()
+
+    def push(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.peak = max(self.peak, value)
+
+        self.recent.append(value)
+        self.recent_sum += value
+        self.recent_sumsq += value * value
+        while self.recent_max and self.recent_max[-1][1] <= value:
+            self.recent_max.pop()
+        self.recent_max.append((self.count, value))
+        if len(self.recent) > self.window:
+            old = self.recent.popleft()
+            self.recent_sum -= old
+            self.recent_sumsq -= old * old
+        if self.recent_max[0][0] <= self.count - self.window:
+            self.recent_max.popleft()
+
+    def std(self):
+        return math.sqrt(self.m2 / self.count) if self.count else 0.0
+
+    def window_mean(self):
+        return self.recent_sum / len(self.recent) if self.recent else 0.0
+
+    def window_std(self):
+        if not self.recent:
+            return 0.0
+        mean = self.window_mean()
+        return math.sqrt(max(self.recent_sumsq / len(self.recent) - mean * mean, 0.0))
+
+    def window_max(self):
+        return self.recent_max[0][1] if self.recent_max else 0.0
+
+
+class DeviationTracker:
+    """Compares one real-time track with the planned entry -> target line.
+
+    For every new sample: perpendicular distance to the planned line, angle between the
+    actual insertion (first sample -> tip) and the plan, depth along the plan and distance
+    left to the target. update() only looks at samples it has not seen yet.
+    """
+
+    def __init__(self, entry, target, distance_threshold=5.0, angle_threshold=5.0, window=500):
+        self.entry = np.asarray(entry, dtype=np.float64)
+        self.target = np.asarray(target, dtype=np.float64)
+        self.length = float(np.linalg.norm(self.target - self.entry))
+        self.direction = (self.target - self.entry) / self.length if self.length > 0 else np.array([0.0, 0.0, 1.0])
+        self.distance_threshold = distance_threshold
+        self.angle_threshold = angle_threshold
+        self.window = window
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.first = None
+        self.latest = None
+        self.distance_stats = RollingStats(self.window)
+        self.angle_stats = RollingStats(self.window)
+        self.alarm = False
+
+    def update(self, points):
+        """points: the whole (N, 3) track; returns the latest values or None"""
+        if len(points) < self.count:
+            # Track was cleared
+            self.reset()
+        new = np.asarray(points[self.count:], dtype=np.float64)
+        if not len(new):
+            return self.latest
+        if self.first is None:
+            self.first = new[0].copy()
+        self.count += len(new)
+
+        offset = new - self.entry
+        depth = offset @ self.direction
+        distance = np.linalg.norm(offset - np.outer(depth, self.direction), axis=1)
+        remaining = np.linalg.norm(self.target - new, axis=1)
+        inserted = new - self.first
+        inserted_length = np.linalg.norm(inserted, axis=1)
+        cosine = np.clip(inserted @ self.direction / np.maximum(inserted_length, 1e-9), -1.0, 1.0)
+        angle = np.where(inserted_length >= MIN_ANGLE_LENGTH, np.degrees(np.arccos(cosine)), np.nan)
+
+        for value in distance.tolist():
+            self.distance_stats.push(value)
+        for value in angle.tolist():
+            if not math.isnan(value):
+                self.angle_stats.push(value)
+
+        latest_angle = float(angle[-1])
+        self.latest = {
+            'distance': float(distance[-1]),
+            'angle': None if math.isnan(latest_angle) else latest_angle,
+            'depth': float(depth[-1]),
+            'remaining': float(remaining[-1]),
+            'distance_mean': self.distance_stats.window_mean(),
+            'distance_std': self.distance_stats.window_std(),
+            'distance_max': self.distance_stats.window_max(),
+            'angle_mean': self.angle_stats.window_mean(),
+        }
+        self.alarm = (self.latest['distance'] > self.distance_threshold
+                      or (self.latest['angle'] is not None and self.latest['angle'] > self.angle_threshold))
+        return self.latest
+
+    def format(self):
+        if self.latest is None:
+            return "no samples"
+        s = self.latest
+        angle = "-" if s['angle'] is None else f"{s['angle']:.1f}°"
+        return (f"off plan {s['distance']:.1f} (mean {s['distance_mean']:.1f}, max {s['distance_max']:.1f}), "
+                f"angle {angle}, depth {s['depth']:.1f}, to target {s['remaining']:.1f}")
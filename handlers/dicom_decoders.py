@@ -0,0 +1,239 @@
+import importlib
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np # type: ignore
+from lazy_imports import lazy_import
+
+dicom = lazy_import("pydicom")
+
+# Uncompressed little-endian pixel data is read straight from the element bytes
+NATIVE_SYNTAXES = ("1.2.840.10008.1.2", "1.2.840.10008.1.2.1")
+# Local decoders per compressed transfer syntax, fastest first. pylibjpeg wraps libjpeg-turbo,
+# CharLS/libjpeg, OpenJPEG and a Rust RLE decoder; GDCM comes close; pydicom's own RLE decoder
+# and Pillow are the slow fallbacks. Names are pydicom 3 plugins; PYDICOM2_HANDLERS maps the
+# ones whose pydicom 2 handler is named differently.
+JPEG_BASELINE = ("pylibjpeg", "pillow", "gdcm")
+JPEG_LOSSLESS = ("pylibjpeg", "gdcm")
+JPEG_LS = ("pylibjpeg", "pyjpegls", "gdcm")
+JPEG_2000 = ("pylibjpeg", "gdcm", "pillow")
+RLE = ("pylibjpeg", "gdcm", "pydicom")
+BACKEND_PREFERENCE = {
+    "1.2.840.10008.1.2.4.50": JPEG_BASELINE,
+    "1.2.840.10008.1.2.4.51": JPEG_BASELINE,
+    "1.2.840.10008.1.2.4.57": JPEG_LOSSLESS,
+    "1.2.840.10008.1.2.4.70": JPEG_LOSSLESS,
+    "1.2.840.10008.1.2.4.80": JPEG_LS,
+    "1.2.840.10008.1.2.4.81": JPEG_LS,
+    "1.2.840.10008.1.2.4.90": JPEG_2000,
+    "1.2.840.10008.1.2.4.91": JPEG_2000,
+    "1.2.840.10008.1.2.4.201": JPEG_2000,
+    "1.2.840.10008.1.2.4.202": JPEG_2000,
+    "1.2.840.10008.1.2.4.203": JPEG_2000,
+    "1.2.840.10008.1.2.5": RLE,
+}
+PYDICOM2_HANDLERS = {"pydicom": "rle", "pyjpegls": "jpeg_ls"}
+# Packages that provide a decoder, for the error shown when none is installed
+INSTALL_HINT = "pip install pylibjpeg pylibjpeg-libjpeg pylibjpeg-openjpeg pylibjpeg-rle"
+
+
+class DecodeError(RuntimeError):
+    pass
+
+
+def _pixels_module():
+    """pydicom.pixels on pydicom 3, None on pydicom 2"""
+    try:
+        module = importlib.import_module("pydicom.pixels")
+    except ImportError:
+        return None
+    return module if hasattr(module, "get_decoder") else None
+
+
+def transfer_syntax(ds):
+    meta = getattr(ds, 'file_meta', None)
+    return str(getattr(meta, 'TransferSyntaxUID', NATIVE_SYNTAXES[1]))
+
+
+def available_backends(syntax):
+    """Installed decoders for a transfer syntax, fastest first"""
+    if syntax in NATIVE_SYNTAXES:
+        return ["native"]
+    candidates = BACKEND_PREFERENCE.get(syntax, ())
+    pixels = _pixels_module()
+    if pixels is not None:
+        try:
+            installed = pixels.get_decoder(syntax).available_plugins
+        except (NotImplementedError, ValueError):
+            return []
+        return [name for name in candidates if name in installed]
+    handlers = {handler.HANDLER_NAME: handler for handler in dicom.config.pixel_data_handlers}
+    names = []
+    for name in candidates:
+        handler = handlers.get(PYDICOM2_HANDLERS.get(name, name))
+        if handler is not None and handler.is_available() and handler.supports_transfer_syntax(syntax):
+            names.append(name)
+    return names
+
+
+def native_dtype(ds):
+    """dtype of grey 8/16/32-bit pixel data decode_native can read, else None"""
+    bits = int(getattr(ds, 'BitsAllocated', 0))
+    if int(getattr(ds, 'SamplesPerPixel', 1)) != 1 or bits not in (8, 16, 32):
+        return None
+    return np.dtype(f"<{'i' if int(ds.PixelRepresentation) == 1 else 'u'}{bits // 8}")
+
+
+def _sign_extend(ds, array):
+    shift = array.dtype.itemsize * 8 - int(getattr(ds, 'BitsStored', array.dtype.itemsize * 8))
+    if array.dtype.kind == 'i' and shift:
+        # Values stored in fewer bits than allocated
+        array = (array << shift) >> shift
+    return array
+
+
+def decode_native(ds, index=None):
+    """Frame(s) of uncompressed little-endian grey pixel data as a view of the element bytes"""
+    dtype = native_dtype(ds)
+    if dtype is None:
+        raise ValueError("not grey 8/16/32-bit pixel data")
+    frames = int(getattr(ds, 'NumberOfFrames', 1) or 1)
+    frame_pixels = int(ds.Rows) * int(ds.Columns)
+    if index is None:
+        array = np.frombuffer(ds.PixelData, dtype=dtype, count=frames * frame_pixels)
+        shape = (frames, ds.Rows, ds.Columns) if frames > 1 else (ds.Rows, ds.Columns)
+    else:
+        array = np.frombuffer(ds.PixelData, dtype=dtype, count=frame_pixels, offset=index * frame_pixels * dtype.itemsize)
+        shape = (ds.Rows, ds.Columns)
+    return _sign_extend(ds, array.reshape(shape))
+
+
+def memory_map_frames(ds, path):
+    """(frames, rows, cols) memmap of uncompressed pixel data that was left in the file
+    (dcmread with defer_size), or None when it is compressed or already read"""
+    if transfer_syntax(ds) not in NATIVE_SYNTAXES or native_dtype(ds) is None:
+        return None
+    try:
+        element = ds.get_item('PixelData', keep_deferred=True)
+    except TypeError:
+        # pydicom 2 returns the deferred element as stored
+        element = ds.get_item('PixelData')
+    offset = getattr(element, 'value_tell', None)
+    if element is None or offset is None or element.value is not None:
+        return None
+    shape = (int(getattr(ds, 'NumberOfFrames', 1) or 1), int(ds.Rows), int(ds.Columns))
+    return np.memmap(path, dtype=native_dtype(ds), mode='r', offset=offset, shape=shape)
+
+
+def decode_with(ds, backend, index=None):
+    """Pixel array of a dataset (or one frame of it) decoded by the named backend"""
+    if backend == "native":
+        return decode_native(ds, index)
+    pixels = _pixels_module()
+    if pixels is not None:
+        array, _ = pixels.get_decoder(transfer_syntax(ds)).as_array(ds, index=index, decoding_plugin=backend)
+        return array
+    ds.convert_pixel_data(handler_name=PYDICOM2_HANDLERS.get(backend, backend))
+    array = ds.pixel_array
+    return array if index is None or array.ndim == 2 else array[index]
+
+
+class FrameDecoder:
+    """Decodes DICOM pixel data with the fastest installed backend for each transfer syntax.
+
+    The first dataset of a syntax with several installed backends is decoded by each of them
+    and the fastest one is kept. A backend that fails falls through to the next one, then to
+    pydicom's default pixel_array. PUNCTURE_DECODER puts one backend first; decode jobs run
+    on PUNCTURE_DECODE_WORKERS threads (default: one per CPU), since the C decoders release the GIL.
+    """
+
+    def __init__(self, workers=None, preferred=None):
+        self.workers = workers or int(os.environ.get('PUNCTURE_DECODE_WORKERS', 0)) or os.cpu_count() or 1
+        self.preferred = preferred if preferred is not None else os.environ.get('PUNCTURE_DECODER', '')
+        self.chosen = {}
+        self.lock = threading.Lock()
+
+    def backends(self, syntax):
+        names = available_backends(syntax)
+        chosen = self.chosen.get(syntax)
+        for name in (chosen, self.preferred):
+            if name and name in names:
+                names.remove(name)
+                names.insert(0, name)
+        return names
+
+    def _calibrate(self, ds, syntax, names, index):
+        """Decode with every backend, keep the fastest; returns its array"""
+        best = None
+        for name in names:
+            try:
+                start = time.perf_counter()
+                array = decode_with(ds, name, index)
+                elapsed = time.perf_counter() - start
+            except Exception as e:
+                print(f"Error decoding with {name}: {e}")
+                continue
+            if best is None or elapsed < best[0]:
+                best = (elapsed, name, array)
+        if best is None:
+            return None
+        self.chosen[syntax] = best[1]
+        return best[2]
+
+    def decode(self, ds, index=None):
+        """Pixel array of a dataset (all frames, or frame `index`) before any rescale"""
+        syntax = transfer_syntax(ds)
+        names = self.backends(syntax)
+        if names == ["native"] and native_dtype(ds) is None:
+            names = []
+        if syntax not in self.chosen and not self.preferred and len(names) > 1:
+            with self.lock:
+                if syntax not in self.chosen:
+                    array = self._calibrate(ds, syntax, names, index)
+                    if array is not None:
+                        return array
+        for name in names:
+            try:
+                return decode_with(ds, name, index)
+            except Exception as e:
+                print(f"Error decoding with {name}, trying the next decoder: {e}")
+        try:
+            array = ds.pixel_array
+        except Exception as e:
+            name = getattr(dicom.uid.UID(syntax), 'name', syntax)
+            raise DecodeError(f"No installed decoder could read {name} pixel data ({e}). "
+                              f"Install one with: {INSTALL_HINT}") from e
+        return array if index is None or array.ndim == 2 else array[index]
+
+    def frame_reader(self, ds, path=None):
+        """frame(index) -> 2D pixel array of one frame of a multi-frame dataset, before rescale.
+
+        Uncompressed pixel data left in the file is memory-mapped, so frames are paged in as
+        they are copied and the frame set is never held in RAM next to the volume. Compressed
+        frames are decoded one at a time, so they can be spread over the decode threads.
+        """
+        frames = memory_map_frames(ds, path) if path else None
+        if frames is not None:
+            return lambda index: _sign_extend(ds, frames[index])
+        if _pixels_module() is None:
+            # pydicom 2 decodes every frame in one call
+            array = self.decode(ds)
+            return lambda index: array[index]
+        ds.PixelData  # load a deferred element once rather than on every decode thread
+        return lambda index: self.decode(ds, index)
+
+    def map(self, func, items):
+        """func over items on the decode threads; results come in order, at most 2 * workers ahead"""
+        if self.workers == 1:
+            yield from map(func, items)
+            return
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            pending = deque()
+            for item in items:
+                pending.append(pool.submit(func, item))
+                if len(pending) >= 2 * self.workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
@@ -1,40 +1,129 @@
 import os
 import numpy as np # type: ignore
-import pydicom as dicom # type: ignore
-from PIL import Image # type: ignore
+from lazy_imports import lazy_import
+from handlers.volume_histogram import VolumeHistogram
+from handlers.slice_statistics import SliceStatistics
+from handlers.dicom_decoders import FrameDecoder
+from handlers.multiframe import DEFER_SIZE, FrameLayout, is_multiframe
+from handlers.volume_geometry import VolumeGeometry
+
+dicom = lazy_import("pydicom")
+Image = lazy_import("PIL.Image")
 
 class DicomHandler:
-    def __init__(self):
+    def __init__(self, registry=None):
+        self.registry = registry
         self.volume3d = None
+        # HU histogram (with exact min/max) of the last loaded volume, filled as slices are decoded
+        self.histogram = None
+        # Per-slice min/max/mean/histogram along each axis of the last loaded volume
+        self.slice_stats = None
+        self.decoder = FrameDecoder()
+        # Voxel <-> patient mm geometry of the last loaded volume
+        self.geometry = None
         self.X_init = 256
         self.Y_init = 256
         self.Z_init = 256
 
-    def load_dicom_images(self, folder_name):
-        """Load DICOM images from a folder, convert to Hounsfield Units, and create 3D volume"""
-        path = "./dicom-folder/" + folder_name
-        ct_images = os.listdir(path)
-        slices = [dicom.read_file(os.path.join(path, s), force=True) for s in ct_images]
-        slices = sorted(slices, key=lambda x: x.ImagePositionPatient[2], reverse=True)
+    def resolve_path(self, folder_name):
+        """Folder holding the series' DICOM files"""
+        if self.registry is not None:
+            return self.registry.resolve(folder_name)
+        return "./dicom-folder/" + folder_name
+
+    def load_dicom_images(self, folder_name, file_order=None):
+        """Load DICOM images from a folder, convert to Hounsfield Units, and create 3D volume
 
-        img_shape = list(slices[0].pixel_array.shape)
-        img_shape.append(len(slices))
-        self.volume3d = np.zeros(img_shape, dtype=np.float32) # Use float for HU values
+        file_order is the already-sorted slice file list from the study index; when given,
+        headers are not sorted again and each slice is read, decoded and released on the
+        decoder's threads. Pixel data is decoded by the fastest installed backend for its
+        transfer syntax; DecodeError means none could read it. A folder holding a single
+        multi-frame object is loaded by load_multiframe.
+        """
+        path = self.resolve_path(folder_name)
+        names = file_order or os.listdir(path)
+        if len(names) == 1:
+            # A lone file may be an enhanced CT object holding the whole series as frames
+            file_path = os.path.join(path, names[0])
+            ds = dicom.dcmread(file_path, force=True, defer_size=DEFER_SIZE)
+            if is_multiframe(ds):
+                return self.load_multiframe(ds, file_path)
+        if file_order:
+            slice_count = len(file_order)
+            slices = [os.path.join(path, s) for s in file_order]
+        else:
+            ct_images = os.listdir(path)
+            slices = [dicom.dcmread(os.path.join(path, s), force=True) for s in ct_images]
+            slices = sorted(slices, key=lambda x: x.ImagePositionPatient[2], reverse=True)
+            slice_count = len(slices)
 
-        for i, s in enumerate(slices):
+        # First and last slice headers, for the volume geometry
+        headers = {}
+
+        def decode_slice(item):
+            i, s = item
+            if isinstance(s, str):
+                s = dicom.dcmread(s, force=True)
+            if i in (0, slice_count - 1):
+                headers[i] = s
             # === CHANGED: Apply Rescale Slope and Intercept to get Hounsfield Units (HU) ===
             # This ensures that the pixel values are in a standardized, comparable scale.
-            
+
             # Get slope and intercept, with defaults if they don't exist
             slope = getattr(s, 'RescaleSlope', 1)
             intercept = getattr(s, 'RescaleIntercept', 0)
 
             # Convert raw pixel array to HU
-            array2D = s.pixel_array.astype(np.float32)
-            array2D = array2D * slope + intercept
+            array2D = self.decoder.decode(s).astype(np.float32)
+            return array2D * slope + intercept
+
+        img_shape = None
+        self.histogram = VolumeHistogram()
+        # Slices are read and decoded on the decoder's threads and copied in here in order
+        for i, array2D in enumerate(self.decoder.map(decode_slice, enumerate(slices))):
+            if img_shape is None:
+                img_shape = list(array2D.shape)
+                img_shape.append(slice_count)
+                self.volume3d = np.zeros(img_shape, dtype=np.float32) # Use float for HU values
+                self.slice_stats = SliceStatistics(img_shape)
             
             self.volume3d[:, :, i] = array2D
+            self.histogram.add(array2D)
+            self.slice_stats.add(i, array2D)
+
+        self.geometry = VolumeGeometry.from_headers(img_shape, headers.get(0), headers.get(slice_count - 1))
+        self.X_init = img_shape[0]
+        self.Y_init = img_shape[1]
+        self.Z_init = img_shape[2]
+
+        return self.volume3d, img_shape
+
+    def load_multiframe(self, ds, file_path):
+        """Load an enhanced (multi-frame) CT object read with defer_size=DEFER_SIZE.
+
+        Frames are placed by their per-frame functional groups and decoded on the decoder's
+        threads straight into the preallocated volume; uncompressed frames are copied from a
+        memory map of the file.
+        """
+        layout = FrameLayout(ds)
+        read_frame = self.decoder.frame_reader(ds, file_path)
+        img_shape = [int(ds.Rows), int(ds.Columns), layout.count]
+        self.volume3d = np.zeros(img_shape, dtype=np.float32)
+        self.slice_stats = SliceStatistics(img_shape)
+        self.histogram = VolumeHistogram()
+
+        def decode_frame(frame):
+            slot = layout.slots[frame]
+            array2D = read_frame(frame).astype(np.float32) * float(layout.slopes[frame]) + float(layout.intercepts[frame])
+            self.volume3d[:, :, slot] = array2D
+            return slot, array2D
+
+        for slot, array2D in self.decoder.map(decode_frame, range(layout.count)):
+            self.histogram.add(array2D)
+            self.slice_stats.add(slot, array2D)
 
+        self.geometry = VolumeGeometry.from_positions(img_shape, layout.pixel_spacing, layout.orientation,
+                                                      layout.positions[0], layout.positions[-1], layout.slice_spacing)
         self.X_init = img_shape[0]
         self.Y_init = img_shape[1]
         self.Z_init = img_shape[2]
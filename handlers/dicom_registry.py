@@ -0,0 +1,197 @@
+import json
+import os
+import shutil
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+FICLONE = 0x40049409  # Linux ioctl for copy-on-write clones (btrfs, xfs)
+
+
+class DicomRegistry:
+    """Maps series names shown in the list to the folders their DICOM files live in.
+
+    Ingest modes:
+        reference - register the source folder in place, nothing is copied
+        link      - hard-link (or reflink) the files into ./dicom-folder/, copying only
+                    when the source is on another filesystem
+        copy      - always copy into ./dicom-folder/ (the old behaviour)
+    Copies run on a background thread; until they finish the series resolves to the source.
+    """
+
+    MODES = ("reference", "link", "copy")
+
+    def __init__(self, root=None):
+        self.root = root or os.path.join(os.getcwd(), "dicom-folder")
+        self.registry_path = os.path.join(self.root, "registry.json")
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        """Read the registry file, dropping entries whose folder has disappeared"""
+        if not os.path.exists(self.registry_path):
+            return
+        try:
+            with open(self.registry_path, 'r') as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Error reading DICOM registry: {e}")
+            return
+        self.entries = {name: entry for name, entry in entries.items() if os.path.isdir(entry['path'])}
+        for name, entry in self.entries.items():
+            if entry.get('pending'):
+                # The app quit mid-copy; keep serving the source and drop the partial copy
+                entry.update(mode="reference", pending=False)
+                shutil.rmtree(os.path.join(self.root, name + ".partial"), ignore_errors=True)
+
+    def save(self):
+        os.makedirs(self.root, exist_ok=True)
+        with self.lock:
+            entries = dict(self.entries)
+        tmp_path = self.registry_path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(entries, f, indent=2)
+        os.replace(tmp_path, self.registry_path)
+
+    def resolve(self, name):
+        """Return the folder holding the series, falling back to ./dicom-folder/<name>"""
+        with self.lock:
+            entry = self.entries.get(name)
+        if entry is not None:
+            return entry['path']
+        return os.path.join(self.root, name)
+
+    def names(self):
+        with self.lock:
+            return list(self.entries)
+
+    def is_owned(self, name):
+        """True when the files under the resolved path belong to the app and may be deleted"""
+        with self.lock:
+            entry = self.entries.get(name)
+        if entry is None:
+            return True
+        return entry['mode'] != "reference" and not entry.get('pending')
+
+    def ingest(self, source, mode="reference", progress_callback=None, finished_callback=None):
+        """Register a source folder and return its series name.
+
+        The series is usable as soon as this returns. In copy mode (or link mode across
+        filesystems) the copy runs on a daemon thread and progress_callback(name, done, total)
+        and finished_callback(name) are called from that thread.
+        """
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown ingest mode: {mode}")
+        source = os.path.abspath(source)
+        name = os.path.basename(source.rstrip(os.sep))
+        destination = os.path.join(self.root, name)
+
+        if name in self.entries or os.path.isdir(destination):
+            if name not in self.entries:
+                self._set_entry(name, destination, "copy")
+            if finished_callback:
+                finished_callback(name)
+            return name
+
+        if mode == "reference":
+            self._set_entry(name, source, "reference")
+            if finished_callback:
+                finished_callback(name)
+            return name
+
+        os.makedirs(self.root, exist_ok=True)
+        if mode == "link" and self._same_filesystem(source, self.root):
+            self._mirror(source, destination, self._link_file)
+            self._set_entry(name, destination, "link")
+            if finished_callback:
+                finished_callback(name)
+            return name
+
+        # Copy unavoidable: serve the series from the source until the copy lands
+        self._set_entry(name, source, "copy", pending=True)
+        thread = threading.Thread(target=self._copy_in_background,
+                                  args=(name, source, destination, progress_callback, finished_callback))
+        thread.daemon = True
+        thread.start()
+        return name
+
+    def remove(self, name):
+        """Unregister a series, deleting its files only if the app owns them"""
+        owned = self.is_owned(name)
+        path = self.resolve(name)
+        with self.lock:
+            self.entries.pop(name, None)
+        self.save()
+        if owned and os.path.isdir(path):
+            shutil.rmtree(path)
+
+    def _set_entry(self, name, path, mode, pending=False):
+        with self.lock:
+            self.entries[name] = {'path': path, 'mode': mode, 'pending': pending}
+        self.save()
+
+    def _copy_in_background(self, name, source, destination, progress_callback, finished_callback):
+        partial = destination + ".partial"
+        try:
+            self._mirror(source, partial, self._copy_file, name, progress_callback)
+            with self.lock:
+                removed = name not in self.entries
+            if removed:
+                shutil.rmtree(partial, ignore_errors=True)
+                return
+            os.replace(partial, destination)
+            self._set_entry(name, destination, "copy")
+        except OSError as e:
+            print(f"Error copying DICOM folder '{source}': {e}")
+            shutil.rmtree(partial, ignore_errors=True)
+            self._set_entry(name, source, "reference")
+        if finished_callback:
+            finished_callback(name)
+
+    def _mirror(self, source, destination, file_func, name=None, progress_callback=None):
+        files = []
+        for dirpath, _, filenames in os.walk(source):
+            for filename in filenames:
+                files.append(os.path.relpath(os.path.join(dirpath, filename), source))
+        total = len(files)
+        for done, rel_path in enumerate(files, 1):
+            target = os.path.join(destination, rel_path)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            file_func(os.path.join(source, rel_path), target)
+            if progress_callback and (done == total or done % 16 == 0):
+                progress_callback(name, done, total)
+
+    def _link_file(self, src, dst):
+        try:
+            os.link(src, dst)
+        except OSError:
+            if not self._reflink_file(src, dst):
+                shutil.copy2(src, dst)
+
+    def _copy_file(self, src, dst):
+        if not self._reflink_file(src, dst):
+            shutil.copy2(src, dst)
+
+    def _reflink_file(self, src, dst):
+        if fcntl is None:
+            return False
+        try:
+            with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+                fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+            shutil.copystat(src, dst)
+            return True
+        except OSError:
+            if os.path.exists(dst):
+                os.remove(dst)
+            return False
+
+    @staticmethod
+    def _same_filesystem(path_a, path_b):
+        try:
+            return os.stat(path_a).st_dev == os.stat(path_b).st_dev
+        except OSError:
+            return False
@@ -0,0 +1,112 @@
+import csv
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np # type: ignore
+from lazy_imports import lazy_import
+from handlers.dicom_handler import DicomHandler
+from handlers.dicom_registry import DicomRegistry
+from handlers.track_registry import TRACK_PALETTE
+from handlers.volume_histogram import preset_window
+from handlers.volume_geometry import VolumeGeometry
+from handlers.render_pipeline import (PLANE_AXES, extract_plane, window_to_uint8, zoom_image, draw_routes,
+                                     overlay_half_width)
+
+Image = lazy_import("PIL.Image")
+
+
+def read_points(path):
+    """(N, 3) points from a plan or real-time CSV (x, y, z per row; extra columns ignored)"""
+    with open(path, newline='') as csvfile:
+        rows = [row for row in csv.reader(csvfile) if row]
+    points = [[float(value) for value in row[:3]] for row in rows]
+    return np.array(points, dtype=np.float64).reshape(-1, len(points[0]) if points else 3)
+
+
+def render_view(volume, plane_name, index, value_range, brightness=0, contrast=1.0, zoom=1.0,
+                slab_mode="Slice", slab_thickness=1, plan=None, tracks=(), overlay_slab=0, slab_renderers=None,
+                geometry=None):
+    """One panel image as the GUI draws it, as a PIL image (RGB when routes are drawn).
+
+    geometry (VolumeGeometry) scales the image to the voxel spacing; without it voxels are square.
+    """
+    geometry = geometry or VolumeGeometry(volume.shape)
+    image_2d = extract_plane(volume, plane_name, index, slab_mode, slab_thickness, slab_renderers)
+    image = Image.fromarray(window_to_uint8(image_2d, *value_range, brightness, contrast), mode='L')
+    image = zoom_image(image, zoom, geometry.panel(plane_name).scale)
+    if plan is not None or tracks:
+        slice_index = index % volume.shape[PLANE_AXES[plane_name]]
+        image = draw_routes(image, geometry, plane_name, slice_index, zoom, plan, tracks,
+                            overlay_half_width(overlay_slab, slab_mode, slab_thickness))
+    return image
+
+
+def render_study(study, planes=("XY", "YZ", "XZ"), positions=(0.5,), window="Auto", brightness=0, contrast=1.0,
+                 zoom=1.0, slab_mode="Slice", slab_thickness=1, plan_path=None, track_paths=(), overlay_slab=0,
+                 output_dir=None, image_format="png"):
+    """Render planes of one series at fractional positions (0 = first slice, 1 = last).
+
+    study is a series name known to the registry or a folder of DICOM files. With output_dir,
+    images are written as PNG or raw bytes (<name>_<plane>_<index>_<width>x<height>_<mode>.raw)
+    and their paths returned; without it, [(name, uint8 array)] is returned.
+    """
+    handler = DicomHandler(DicomRegistry())
+    volume, _ = handler.load_dicom_images(study)
+    histogram = handler.histogram
+    value_range = preset_window(window, histogram) or (histogram.min, histogram.max)
+    plan = read_points(plan_path)[:2] if plan_path else None
+    tracks = [(TRACK_PALETTE[i % len(TRACK_PALETTE)][0], read_points(path)[:, :3])
+              for i, path in enumerate(track_paths)]
+    name = os.path.basename(os.path.normpath(study))
+    renderers = {}
+    outputs = []
+    for plane_name in planes:
+        length = volume.shape[PLANE_AXES[plane_name]]
+        for position in positions:
+            index = int(round(min(max(position, 0.0), 1.0) * (length - 1)))
+            route = plan
+            if plan is not None and plan.shape[1] == 2:
+                # A 2D plan lies on the axial slice being rendered, as in the GUI
+                route = np.column_stack([plan, np.full(2, index if plane_name == "XY" else volume.shape[2] // 2)])
+            image = render_view(volume, plane_name, index, value_range, brightness, contrast, zoom, slab_mode,
+                                slab_thickness, route, tracks, overlay_slab, renderers, handler.geometry)
+            label = f"{name}_{plane_name}_{index}"
+            if output_dir is None:
+                outputs.append((label, np.asarray(image)))
+                continue
+            os.makedirs(output_dir, exist_ok=True)
+            if image_format == "raw":
+                path = os.path.join(output_dir, f"{label}_{image.width}x{image.height}_{image.mode}.raw")
+                with open(path, 'wb') as f:
+                    f.write(image.tobytes())
+            else:
+                path = os.path.join(output_dir, f"{label}.png")
+                image.save(path)
+            outputs.append(path)
+    return outputs
+
+
+def _render_study_job(job):
+    study, options = job
+    try:
+        return study, render_study(study, **options), None
+    except Exception as e:
+        return study, [], f"{type(e).__name__}: {e}"
+
+
+def render_batch(studies, workers=None, **options):
+    """render_study for many series in a process pool (one series per process at a time).
+
+    Returns {study: (outputs, error message or None)}; one failing series does not stop the rest.
+    """
+    jobs = [(study, options) for study in studies]
+    if workers == 1 or len(jobs) <= 1:
+        finished = list(map(_render_study_job, jobs))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            finished = list(pool.map(_render_study_job, jobs))
+    results = {}
+    for study, outputs, error in finished:
+        results[study] = (outputs, error)
+        if error:
+            print(f"Error rendering '{study}': {error}")
+    return results
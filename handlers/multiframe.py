@@ -0,0 +1,64 @@
+import numpy as np # type: ignore
+
+# Elements larger than this are left in the file when a multi-frame object is opened,
+# so its pixel data can be memory-mapped instead of read
+DEFER_SIZE = 4096
+
+
+def is_multiframe(ds):
+    return int(getattr(ds, 'NumberOfFrames', 1) or 1) > 1
+
+
+def _functional_group(ds, per_frame, frame, name):
+    """First item of a functional group for a frame: its per-frame value, else the shared one"""
+    sources = [per_frame[frame]] if frame < len(per_frame) else []
+    shared = ds.get('SharedFunctionalGroupsSequence')
+    if shared:
+        sources.append(shared[0])
+    for groups in sources:
+        sequence = groups.get(name)
+        if sequence:
+            return sequence[0]
+    return None
+
+
+class FrameLayout:
+    """Where each frame of an enhanced (multi-frame) CT object belongs in the [y, x, z] volume.
+
+    Frames are ordered by their per-frame ImagePositionPatient along the slice normal, head
+    first, the same order single-frame series get from sorting on ImagePositionPatient[2].
+    Rescale slope and intercept are read per frame, since enhanced objects may vary them.
+    """
+
+    def __init__(self, ds):
+        self.count = int(ds.NumberOfFrames)
+        per_frame = ds.get('PerFrameFunctionalGroupsSequence') or []
+        plane = _functional_group(ds, per_frame, 0, 'PlaneOrientationSequence') or ds
+        orientation = getattr(plane, 'ImageOrientationPatient', None) or [1, 0, 0, 0, 1, 0]
+        self.orientation = np.array([float(value) for value in orientation])
+        normal = np.cross(self.orientation[:3], self.orientation[3:])
+
+        positions = np.empty((self.count, 3))
+        self.slopes = np.ones(self.count)
+        self.intercepts = np.zeros(self.count)
+        for frame in range(self.count):
+            plane = _functional_group(ds, per_frame, frame, 'PlanePositionSequence')
+            position = getattr(plane, 'ImagePositionPatient', None)
+            # Frames without a position keep their file order
+            positions[frame] = [float(value) for value in position] if position else -frame * normal
+            transform = _functional_group(ds, per_frame, frame, 'PixelValueTransformationSequence') or ds
+            self.slopes[frame] = float(getattr(transform, 'RescaleSlope', 1))
+            self.intercepts[frame] = float(getattr(transform, 'RescaleIntercept', 0))
+        depth = positions @ normal
+        # order[slot] is the frame shown at volume slice `slot`; slots[frame] is the inverse
+        self.order = np.argsort(-depth, kind='stable')
+        self.slots = np.empty(self.count, dtype=np.intp)
+        self.slots[self.order] = np.arange(self.count)
+        self.positions = positions[self.order]
+
+        measures = _functional_group(ds, per_frame, 0, 'PixelMeasuresSequence') or ds
+        self.pixel_spacing = [float(value) for value in (getattr(measures, 'PixelSpacing', None) or [1.0, 1.0])]
+        if self.count > 1 and np.ptp(depth) > 0:
+            self.slice_spacing = float(np.median(np.abs(np.diff(depth[self.order]))))
+        else:
+            self.slice_spacing = float(getattr(measures, 'SliceThickness', None) or 1.0)
@@ -0,0 +1,99 @@
+import numpy as np # type: ignore
+
+
+class PlaneProjection:
+    """Affine map from volume coordinates (x, y, z) to a panel's image coordinates (u, v)
+    plus the signed depth along the panel normal, as one 3x3 matrix and offset"""
+
+    def __init__(self, matrix, offset):
+        self.matrix = np.asarray(matrix, dtype=np.float64)
+        self.offset = np.asarray(offset, dtype=np.float64)
+
+    def project(self, points):
+        """(N, 3) volume points -> (N, 3) rows of (u, v, depth)"""
+        return np.asarray(points, dtype=np.float64).reshape(-1, 3) @ self.matrix.T + self.offset
+
+    def unproject(self, screen):
+        """(N, 3) rows of (u, v, depth) -> (N, 3) volume points"""
+        screen = np.asarray(screen, dtype=np.float64).reshape(-1, 3)
+        return (screen - self.offset) @ np.linalg.inv(self.matrix).T
+
+    def to_screen(self, zoom, offset_x, offset_y):
+        """Fold the panel's zoom and pan into the projection so one affine gives widget pixels"""
+        scale = np.array([zoom, zoom, 1.0])
+        return PlaneProjection(self.matrix * scale[:, None], self.offset * scale + [offset_x, offset_y, 0.0])
+
+    def key(self):
+        return self.matrix.tobytes() + self.offset.tobytes()
+
+
+def oblique_projection(center, u_direction, v_direction, image_center=(256, 256)):
+    """Projection for a plane through `center` spanned by two directions; `center` lands at
+    image_center with depth 0 and depth grows along u x v"""
+    u = np.asarray(u_direction, dtype=np.float64)
+    u = u / np.linalg.norm(u)
+    v = np.asarray(v_direction, dtype=np.float64)
+    v = v - u * (v @ u)
+    v = v / np.linalg.norm(v)
+    matrix = np.array([u, v, np.cross(u, v)])
+    offset = np.array([image_center[0], image_center[1], 0.0]) - matrix @ np.asarray(center, dtype=np.float64)
+    return PlaneProjection(matrix, offset)
+
+
+class ProjectedTrackCache:
+    """Projected coordinates of every track in every panel.
+
+    While a panel's projection (including zoom and pan) is unchanged, new samples are the only
+    points transformed; anything else re-projects the whole track once.
+    """
+
+    def __init__(self):
+        self.entries = {}
+
+    def project(self, panel_key, track_id, points, projection):
+        entry = self.entries.get((panel_key, track_id))
+        key = projection.key()
+        count = len(points)
+        if entry is None or entry['key'] != key or entry['count'] > count:
+            data = np.empty((max(count, 1024), 3))
+            data[:count] = projection.project(points)
+            entry = self.entries[(panel_key, track_id)] = {'key': key, 'data': data, 'count': count}
+        elif entry['count'] < count:
+            data = entry['data']
+            if count > len(data):
+                data = np.empty((max(count, 2 * len(data)), 3))
+                data[:entry['count']] = entry['data'][:entry['count']]
+                entry['data'] = data
+            data[entry['count']:count] = projection.project(points[entry['count']:count])
+            entry['count'] = count
+        return entry['data'][:count]
+
+    def clear(self):
+        self.entries = {}
+
+
+def slab_runs(depth, slice_position, half_width):
+    """(start, stop) index ranges of consecutive points within half_width of the slice
+    (every point when half_width <= 0); runs shorter than two points are dropped"""
+    if half_width <= 0:
+        return [(0, len(depth))] if len(depth) > 1 else []
+    inside = np.abs(depth - slice_position) <= half_width
+    edges = np.flatnonzero(np.diff(inside.astype(np.int8))) + 1
+    bounds = np.concatenate([[0], edges, [len(depth)]])
+    return [(int(start), int(stop)) for start, stop in zip(bounds[:-1], bounds[1:])
+            if inside[start] and stop - start > 1]
+
+
+def clip_segment_to_slab(start, end, slice_position, half_width):
+    """Part of the segment start -> end (rows of u, v, depth) inside the slab, or None"""
+    if half_width <= 0:
+        return start, end
+    low, high = slice_position - half_width, slice_position + half_width
+    d0, d1 = start[2], end[2]
+    if d0 == d1:
+        return (start, end) if low <= d0 <= high else None
+    t0, t1 = sorted(((low - d0) / (d1 - d0), (high - d0) / (d1 - d0)))
+    t0, t1 = max(t0, 0.0), min(t1, 1.0)
+    if t0 > t1:
+        return None
+    return start + (end - start) * t0, start + (end - start) * t1
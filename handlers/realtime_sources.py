@@ -0,0 +1,333 @@
+import asyncio
+import os
+import select
+import socket
+import time
+import numpy as np # type: ignore
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    shared_memory = None
+
+# Binary sample record shared by the socket and shared-memory transports:
+# little-endian float32 x, y, z followed by a float64 epoch timestamp (20 bytes, unpadded)
+RECORD_DTYPE = np.dtype([('x', '<f4'), ('y', '<f4'), ('z', '<f4'), ('t', '<f8')])
+RING_HEADER = np.dtype([('write_count', '<u8'), ('capacity', '<u8')])
+DEFAULT_RING_NAME = "puncture_realtime"
+DEFAULT_RING_CAPACITY = 65536
+
+
+def records_to_samples(records):
+    """Convert a RECORD_DTYPE array into [(x, y, z, timestamp), ...]"""
+    return list(zip(records['x'].tolist(), records['y'].tolist(), records['z'].tolist(), records['t'].tolist()))
+
+
+class RealtimeSource:
+    """A stream of needle positions. read() returns the samples that arrived since the last
+    call as (x, y, z, timestamp) tuples, waiting at most `timeout` seconds for the first one;
+    timestamp is None when the transport does not carry one."""
+
+    kind = None
+    poll_interval = 0.002
+
+    def open(self):
+        pass
+
+    def read(self, timeout=0.05):
+        raise NotImplementedError
+
+    async def read_async(self):
+        """Wait for the next batch without blocking the event loop (non-blocking poll + sleep)"""
+        while True:
+            samples = self.read(timeout=0)
+            if samples:
+                return samples
+            await asyncio.sleep(self.poll_interval)
+
+    def close(self):
+        pass
+
+    def describe(self):
+        return self.kind
+
+
+class CSVTailSource(RealtimeSource):
+    """Tails a text CSV (x,y,z[,timestamp]), reading only the bytes appended since the last poll"""
+
+    kind = "csv"
+
+    def __init__(self, path, poll_interval=0.002):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.file = None
+        self.offset = 0
+        self.pending = b""
+        self.rows_read = 0
+
+    def open(self):
+        # Resume where the last reader stopped so restarting monitoring does not replay old rows
+        self.file = open(self.path, 'rb')
+        self.file.seek(self.offset)
+
+    def read(self, timeout=0.05):
+        deadline = time.perf_counter() + timeout
+        while True:
+            chunk = self.file.read()
+            if chunk:
+                break
+            if time.perf_counter() >= deadline:
+                return []
+            time.sleep(self.poll_interval)
+        data = self.pending + chunk
+        lines = data.split(b"\n")
+        # Keep a trailing partial row for the next poll
+        self.pending = lines.pop()
+        samples = []
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            values = [float(v) for v in line.split(b",")]
+            samples.append((values[0], values[1], values[2], values[3] if len(values) > 3 else None))
+        self.rows_read += len(samples)
+        return samples
+
+    def close(self):
+        if self.file is not None:
+            self.offset = self.file.tell()
+            self.file.close()
+            self.file = None
+
+    def describe(self):
+        return f"CSV {self.path}"
+
+
+class SocketSource(RealtimeSource):
+    """Receives RECORD_DTYPE records over a local socket the app listens on.
+
+    kind is "udp" or "tcp" (address "host:port") or "unix" (address is a socket path).
+    TCP and Unix sockets accept one tracker connection at a time.
+    """
+
+    def __init__(self, kind, address):
+        self.kind = kind
+        self.address = address
+        self.server = None
+        self.conn = None
+        self.buffer = b""
+
+    def open(self):
+        if self.kind == "unix":
+            if os.path.exists(self.address):
+                os.remove(self.address)
+            self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.server.bind(self.address)
+        else:
+            host, port = self.address.rsplit(':', 1)
+            sock_type = socket.SOCK_DGRAM if self.kind == "udp" else socket.SOCK_STREAM
+            self.server = socket.socket(socket.AF_INET, sock_type)
+            self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self.server.bind((host, int(port)))
+            if self.kind == "udp":
+                self.server.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+        if self.kind != "udp":
+            self.server.listen(1)
+        self.server.setblocking(False)
+        self.buffer = b""
+
+    def read(self, timeout=0.05):
+        if self.kind == "udp":
+            sock = self.server
+        elif self.conn is None:
+            ready, _, _ = select.select([self.server], [], [], timeout)
+            if not ready:
+                return []
+            self.conn, _ = self.server.accept()
+            self.conn.setblocking(False)
+            self.buffer = b""
+            return []
+        else:
+            sock = self.conn
+
+        ready, _, _ = select.select([sock], [], [], timeout)
+        if not ready:
+            return []
+        return self._consume(sock, [])
+
+    async def read_async(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            if self.kind != "udp" and self.conn is None:
+                self.conn, _ = await loop.sock_accept(self.server)
+                self.conn.setblocking(False)
+                self.buffer = b""
+            sock = self.server if self.kind == "udp" else self.conn
+            chunk = await loop.sock_recv(sock, 65536)
+            if not chunk:
+                self._disconnect(sock)
+                continue
+            samples = self._consume(sock, [chunk])
+            if samples:
+                return samples
+
+    def _consume(self, sock, chunks):
+        """Drain whatever else is queued on the socket and decode the complete records"""
+        while True:
+            try:
+                chunk = sock.recv(65536)
+            except (BlockingIOError, InterruptedError):
+                break
+            if not chunk:
+                self._disconnect(sock)
+                break
+            chunks.append(chunk)
+        data = self.buffer + b"".join(chunks)
+        usable = len(data) - len(data) % RECORD_DTYPE.itemsize
+        self.buffer = data[usable:]
+        if not usable:
+            return []
+        return records_to_samples(np.frombuffer(data[:usable], dtype=RECORD_DTYPE))
+
+    def _disconnect(self, sock):
+        if sock is self.conn and self.conn is not None:
+            # Tracker disconnected; wait for the next one
+            self.conn.close()
+            self.conn = None
+
+    def close(self):
+        for sock in (self.conn, self.server):
+            if sock is not None:
+                sock.close()
+        self.conn = self.server = None
+        if self.kind == "unix" and os.path.exists(self.address):
+            os.remove(self.address)
+
+    def describe(self):
+        return f"{self.kind.upper()} {self.address}"
+
+
+class SharedMemoryRing:
+    """Single-writer ring buffer of RECORD_DTYPE samples in named shared memory.
+
+    The writer stores the record, then bumps write_count; readers keep their own count and
+    skip ahead (counting the loss) if they fall more than `capacity` samples behind.
+    """
+
+    def __init__(self, name=DEFAULT_RING_NAME, capacity=DEFAULT_RING_CAPACITY, create=False):
+        if shared_memory is None:
+            raise RuntimeError("Shared memory needs Python 3.8 or newer")
+        size = RING_HEADER.itemsize + capacity * RECORD_DTYPE.itemsize
+        if create:
+            try:
+                self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            except FileExistsError:
+                self.shm = self._attach(name)
+        else:
+            self.shm = self._attach(name)
+        self.header = np.ndarray((1,), dtype=RING_HEADER, buffer=self.shm.buf)
+        if create:
+            capacity = min(capacity, (self.shm.size - RING_HEADER.itemsize) // RECORD_DTYPE.itemsize)
+            self.header['write_count'] = 0
+            self.header['capacity'] = capacity
+        self.capacity = int(self.header['capacity'][0])
+        self.records = np.ndarray((self.capacity,), dtype=RECORD_DTYPE, buffer=self.shm.buf,
+                                  offset=RING_HEADER.itemsize)
+        self.owner = create
+
+    @staticmethod
+    def _attach(name):
+        try:
+            # Python 3.13+: don't let the reader's resource tracker unlink the writer's segment
+            return shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            shm = shared_memory.SharedMemory(name=name)
+            try:
+                from multiprocessing import resource_tracker
+                resource_tracker.unregister(shm._name, "shared_memory")
+            except Exception:
+                pass
+            return shm
+
+    def write(self, x, y, z, timestamp):
+        count = int(self.header['write_count'][0])
+        self.records[count % self.capacity] = (x, y, z, timestamp)
+        self.header['write_count'] = count + 1
+
+    def close(self):
+        del self.header, self.records
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+class SharedMemorySource(RealtimeSource):
+    """Reads samples from a SharedMemoryRing written by the tracker process"""
+
+    kind = "shm"
+
+    def __init__(self, name=DEFAULT_RING_NAME, poll_interval=0.0005):
+        self.name = name
+        self.poll_interval = poll_interval
+        self.ring = None
+        self.read_count = 0
+        self.dropped = 0
+
+    def open(self):
+        self.ring = None
+        self.read_count = 0
+        self.dropped = 0
+
+    def read(self, timeout=0.05):
+        deadline = time.perf_counter() + timeout
+        while True:
+            if self.ring is None:
+                try:
+                    self.ring = SharedMemoryRing(self.name)
+                except FileNotFoundError:
+                    self.ring = None
+            if self.ring is not None:
+                write_count = int(self.ring.header['write_count'][0])
+                if write_count < self.read_count:
+                    # The tracker restarted and recreated the ring
+                    self.read_count = 0
+                if write_count > self.read_count:
+                    break
+            if time.perf_counter() >= deadline:
+                return []
+            time.sleep(self.poll_interval)
+
+        capacity = self.ring.capacity
+        available = write_count - self.read_count
+        if available > capacity:
+            self.dropped += available - capacity
+            available = capacity
+        start = (write_count - available) % capacity
+        if start + available <= capacity:
+            records = self.ring.records[start:start + available].copy()
+        else:
+            records = np.concatenate([self.ring.records[start:], self.ring.records[:start + available - capacity]])
+        self.read_count = write_count
+        return records_to_samples(records)
+
+    def close(self):
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
+
+    def describe(self):
+        return f"shared memory '{self.name}'"
+
+
+SOURCE_KINDS = ("csv", "udp", "tcp", "unix", "shm")
+
+
+def make_source(kind, address):
+    """Build a source from a kind and its address (file path, host:port, socket path or ring name)"""
+    if kind == "csv":
+        return CSVTailSource(address)
+    if kind in ("udp", "tcp", "unix"):
+        return SocketSource(kind, address)
+    if kind == "shm":
+        return SharedMemorySource(address or DEFAULT_RING_NAME)
+    raise ValueError(f"Unknown real-time source: {kind}")
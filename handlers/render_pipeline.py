@@ -0,0 +1,82 @@
+import numpy as np # type: ignore
+from lazy_imports import lazy_import
+from handlers.slab_renderer import SlabRenderer
+from handlers.overlay_projection import slab_runs, clip_segment_to_slab
+from handlers.volume_geometry import orient_plane
+
+Image = lazy_import("PIL.Image")
+ImageDraw = lazy_import("PIL.ImageDraw")
+
+# Volume axis a plane cuts through: XY slices along z, YZ along x, XZ along y ([y, x, z] layout)
+PLANE_AXES = {"XY": 2, "YZ": 1, "XZ": 0}
+PLAN_COLOR = "#00ff00"
+
+
+def extract_plane(volume, plane_name, index, slab_mode="Slice", slab_thickness=1, slab_renderers=None):
+    """2D image of a plane at a slice index (or a slab around it), oriented as the panels show it.
+
+    slab_renderers is a dict kept by the caller so consecutive slabs reuse their blocks.
+    """
+    axis = PLANE_AXES[plane_name]
+    if slab_mode != "Slice" and slab_thickness > 1:
+        length = volume.shape[axis]
+        if not -length <= index < length:
+            raise IndexError(index)
+        renderers = {} if slab_renderers is None else slab_renderers
+        renderer = renderers.get(axis)
+        if renderer is None or renderer.volume is not volume:
+            renderer = renderers[axis] = SlabRenderer(volume, axis)
+        image = renderer.render(index % length, slab_thickness, slab_mode)
+    else:
+        slicer = [slice(None)] * 3
+        slicer[axis] = index
+        image = volume[tuple(slicer)]
+    return orient_plane(image, plane_name)
+
+
+def window_to_uint8(array, min_val, max_val, brightness=0, contrast=1.0):
+    """Map min_val..max_val to 0..255, then apply contrast around mid-grey and brightness"""
+    if max_val - min_val > 0:
+        array_clipped = np.clip(array, min_val, max_val)
+        array_normalized = ((array_clipped - min_val) / (max_val - min_val) * 255)
+    else:
+        array_normalized = np.zeros(array.shape)
+    adjusted_array = array_normalized.astype(np.float32)
+    adjusted_array = contrast * (adjusted_array - 128) + 128 + brightness
+    return np.clip(adjusted_array, 0, 255).astype(np.uint8)
+
+
+def zoom_image(image, zoom, scale=(1.0, 1.0)):
+    """Resize a panel image by the zoom times its per-axis display scale (PanelGeometry.scale)"""
+    size = (max(1, int(image.width * zoom * scale[0])), max(1, int(image.height * zoom * scale[1])))
+    if size == image.size:
+        return image
+    return image.resize(size, Image.LANCZOS)
+
+
+def overlay_half_width(overlay_slab, slab_mode="Slice", slab_thickness=1):
+    """Half thickness of the slab routes are drawn in; a thick-slab view shows them across its whole slab"""
+    if overlay_slab <= 0 or slab_mode == "Slice":
+        return overlay_slab
+    return max(overlay_slab, slab_thickness / 2)
+
+
+def draw_routes(image, geometry, plane_name, slice_index, zoom=1.0, plan=None, tracks=(), overlay_slab=0):
+    """Draw the planned route (green) and real-time tracks ((colour, (N, 3) points)) on a PIL image.
+
+    Uses the same VolumeGeometry projection and slab clipping as the panels; returns an RGB image.
+    """
+    image = image.convert("RGB")
+    draw = ImageDraw.Draw(image)
+    projection = geometry.panel(plane_name).image_projection(zoom)
+    width = max(1, int(round(zoom)))
+    if plan is not None:
+        start, end = projection.project(plan)
+        segment = clip_segment_to_slab(start, end, slice_index, overlay_slab)
+        if segment is not None:
+            draw.line([tuple(segment[0][:2]), tuple(segment[1][:2])], fill=PLAN_COLOR, width=width)
+    for color, points in tracks:
+        screen = projection.project(points)
+        for start, stop in slab_runs(screen[:, 2], slice_index, overlay_slab):
+            draw.line([tuple(point) for point in screen[start:stop, :2]], fill=color, width=width)
+    return image
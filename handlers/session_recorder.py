@@ -0,0 +1,250 @@
+import bisect
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+import numpy as np # type: ignore
+
+MAGIC = b"PSREC1\n"
+FOOTER = struct.Struct("<Q8s")              # index offset, FOOTER_MAGIC
+FOOTER_MAGIC = b"PSRINDEX"
+# Chunk header: magic, kind, record count, first and last timestamp, compressed payload size
+CHUNK = struct.Struct("<4sBIddI")
+CHUNK_MAGIC = b"CHNK"
+SAMPLES, STATE, CLEAR, TRACK = 0, 1, 2, 3     # TRACK chunks name a track number (payload: UTF-8 id)
+
+SAMPLE_DTYPE = np.dtype([('t', '<f8'), ('track', '<u2'), ('x', '<f4'), ('y', '<f4'), ('z', '<f4')])
+# UI state recorded with each change; replay restores the same fields
+STATE_FIELDS = ("X", "Y", "Z_for_axis", "zoom_xy", "zoom_yz", "zoom_xz", "pan_xy_x", "pan_xy_y",
+                "pan_yz_x", "pan_yz_y", "pan_xz_x", "pan_xz_y", "window_min", "window_max", "brightness", "contrast")
+STATE_DTYPE = np.dtype([('t', '<f8')] + [(name, '<f8') for name in STATE_FIELDS])
+
+
+class SessionRecorder:
+    """Appends real-time samples and UI state to a chunked, zlib-compressed binary log.
+
+    Records are buffered and written as one compressed chunk every chunk_seconds (or
+    chunk_records), each chunk behind a small header with its time range. close() appends
+    a JSON chunk index so a reader can seek without scanning; if the app dies first, the
+    headers alone are enough to rebuild the index.
+    """
+
+    def __init__(self, path, chunk_seconds=5.0, chunk_records=8192, level=1):
+        self.path = path
+        self.chunk_seconds = chunk_seconds
+        self.chunk_records = chunk_records
+        self.level = level
+        self.lock = threading.Lock()
+        self.tracks = {}
+        self.chunks = []
+        self.samples = []
+        self.states = []
+        self.last_state = None
+        self.buffer_started = None
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.file = open(path, 'wb')
+        self.file.write(MAGIC)
+        self.started = time.time()
+
+    def add_samples(self, track_id, samples, t=None):
+        """samples: (x, y, z, ...) tuples of one track"""
+        if not len(samples):
+            return
+        t = time.time() if t is None else t
+        with self.lock:
+            track = self.tracks.get(track_id)
+            if track is None:
+                track = self.tracks[track_id] = len(self.tracks)
+                self._write_chunk(TRACK, track, t, t, str(track_id).encode())
+            records = np.empty(len(samples), dtype=SAMPLE_DTYPE)
+            points = np.asarray([sample[:3] for sample in samples], dtype=np.float32)
+            records['t'] = t
+            records['track'] = track
+            records['x'], records['y'], records['z'] = points[:, 0], points[:, 1], points[:, 2]
+            self.samples.append(records)
+            self._maybe_flush(t)
+
+    def add_state(self, state, t=None):
+        """state: {field: value} for STATE_FIELDS; unchanged states are not recorded again"""
+        values = tuple(float(state.get(name, np.nan)) for name in STATE_FIELDS)
+        t = time.time() if t is None else t
+        with self.lock:
+            if values == self.last_state:
+                return
+            self.last_state = values
+            self.states.append((t,) + values)
+            self._maybe_flush(t)
+
+    def mark_clear(self, t=None):
+        """The real-time tracks were cleared; replay starts the tracks again from here"""
+        t = time.time() if t is None else t
+        with self.lock:
+            self._flush()
+            self._write_chunk(CLEAR, 0, t, t, b"")
+
+    def _maybe_flush(self, t):
+        if self.buffer_started is None:
+            self.buffer_started = t
+        pending = sum(len(records) for records in self.samples) + len(self.states)
+        if pending >= self.chunk_records or t - self.buffer_started >= self.chunk_seconds:
+            self._flush()
+
+    def _flush(self):
+        if self.samples:
+            records = np.concatenate(self.samples)
+            self._write_chunk(SAMPLES, len(records), records['t'][0], records['t'][-1],
+                              zlib.compress(records.tobytes(), self.level))
+            self.samples = []
+        if self.states:
+            records = np.array(self.states, dtype=np.float64).view(STATE_DTYPE).reshape(-1)
+            self._write_chunk(STATE, len(records), records['t'][0], records['t'][-1],
+                              zlib.compress(records.tobytes(), self.level))
+            self.states = []
+        self.buffer_started = None
+
+    def _write_chunk(self, kind, count, t_first, t_last, payload):
+        offset = self.file.tell()
+        self.file.write(CHUNK.pack(CHUNK_MAGIC, kind, count, t_first, t_last, len(payload)))
+        self.file.write(payload)
+        self.file.flush()
+        self.chunks.append([offset, kind, count, t_first, t_last])
+
+    def close(self):
+        with self.lock:
+            if self.file is None:
+                return
+            self._flush()
+            offset = self.file.tell()
+            index = {'started': self.started, 'tracks': sorted(self.tracks, key=self.tracks.get),
+                     'state_fields': list(STATE_FIELDS), 'chunks': self.chunks}
+            self.file.write(json.dumps(index).encode())
+            self.file.write(FOOTER.pack(offset, FOOTER_MAGIC))
+            self.file.close()
+            self.file = None
+
+
+class SessionReader:
+    """Random access to a recorded session through its chunk index.
+
+    Seeking decodes only the chunks overlapping the requested time; decoded sample chunks
+    are kept, so scrubbing back and forth does not decompress them again.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        if self.file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"'{path}' is not a session recording")
+        self.index = self._read_index() or self._rebuild_index()
+        self.tracks = self.index['tracks']
+        chunks = self.index['chunks']
+        self.sample_chunks = [chunk for chunk in chunks if chunk[1] == SAMPLES]
+        self.state_chunks = [chunk for chunk in chunks if chunk[1] == STATE]
+        self.clears = [chunk[3] for chunk in chunks if chunk[1] == CLEAR]
+        self.sample_ends = [chunk[4] for chunk in self.sample_chunks]
+        self.state_starts = [chunk[3] for chunk in self.state_chunks]
+        times = [chunk[3] for chunk in chunks] + [chunk[4] for chunk in chunks]
+        self.start = min(times) if times else self.index.get('started', 0.0)
+        self.end = max(times) if times else self.start
+        self.decoded = {}
+
+    def _read_index(self):
+        self.file.seek(0, os.SEEK_END)
+        size = self.file.tell()
+        if size < len(MAGIC) + FOOTER.size:
+            return None
+        self.file.seek(size - FOOTER.size)
+        offset, magic = FOOTER.unpack(self.file.read(FOOTER.size))
+        if magic != FOOTER_MAGIC:
+            return None
+        self.file.seek(offset)
+        try:
+            return json.loads(self.file.read(size - FOOTER.size - offset))
+        except ValueError:
+            return None
+
+    def _rebuild_index(self):
+        """Scan the chunk headers of a recording that was not closed"""
+        chunks = []
+        offset = len(MAGIC)
+        tracks = {}
+        file_size = self.file.seek(0, os.SEEK_END)
+        while True:
+            self.file.seek(offset)
+            header = self.file.read(CHUNK.size)
+            if len(header) < CHUNK.size:
+                break
+            magic, kind, count, t_first, t_last, size = CHUNK.unpack(header)
+            if magic != CHUNK_MAGIC:
+                break
+            if offset + CHUNK.size + size > file_size:
+                break
+            if kind == TRACK:
+                tracks[count] = self.file.read(size).decode()
+            chunks.append([offset, kind, count, t_first, t_last])
+            offset += CHUNK.size + size
+        return {'tracks': [tracks[number] for number in sorted(tracks)], 'state_fields': list(STATE_FIELDS),
+                'chunks': chunks}
+
+    def duration(self):
+        return self.end - self.start
+
+    def _decode(self, chunk, dtype):
+        key = chunk[0]
+        records = self.decoded.get(key)
+        if records is None:
+            self.file.seek(chunk[0])
+            size = CHUNK.unpack(self.file.read(CHUNK.size))[5]
+            records = np.frombuffer(zlib.decompress(self.file.read(size)), dtype=dtype)
+            if dtype is SAMPLE_DTYPE:
+                self.decoded[key] = records
+        return records
+
+    def samples_between(self, t_start, t_end):
+        """Sample records with t_start <= t <= t_end"""
+        first = bisect.bisect_left(self.sample_ends, t_start)
+        parts = []
+        for chunk in self.sample_chunks[first:]:
+            if chunk[3] > t_end:
+                break
+            records = self._decode(chunk, SAMPLE_DTYPE)
+            parts.append(records[(records['t'] >= t_start) & (records['t'] <= t_end)])
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=SAMPLE_DTYPE)
+
+    def tracks_at(self, t):
+        """{track id: (N, 3) points} as shown at time t (since the last clear before t)"""
+        clear = bisect.bisect_right(self.clears, t)
+        since = self.clears[clear - 1] if clear else -np.inf
+        return self._by_track(self.samples_between(since, t))
+
+    def tracks_between(self, t_start, t_end):
+        """{track id: (N, 3) points} recorded at t_start < t <= t_end, for stepping from one
+        replay position to the next without reading everything since the last clear"""
+        records = self.samples_between(t_start, t_end)
+        return self._by_track(records[records['t'] > t_start])
+
+    def cleared_between(self, t_start, t_end):
+        """Whether the tracks were cleared at some t_start < t <= t_end"""
+        return bisect.bisect_right(self.clears, t_end) > bisect.bisect_right(self.clears, t_start)
+
+    def _by_track(self, records):
+        tracks = {}
+        for number, track_id in enumerate(self.tracks):
+            selected = records[records['track'] == number]
+            if len(selected):
+                tracks[track_id] = np.column_stack([selected['x'], selected['y'], selected['z']])
+        return tracks
+
+    def state_at(self, t):
+        """{field: value} of the last UI state recorded at or before t, or None"""
+        position = bisect.bisect_right(self.state_starts, t)
+        if not position:
+            return None
+        records = self._decode(self.state_chunks[position - 1], STATE_DTYPE)
+        record = records[records['t'] <= t][-1]
+        return {name: float(record[name]) for name in STATE_FIELDS}
+
+    def close(self):
+        self.file.close()
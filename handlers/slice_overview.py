@@ -0,0 +1,77 @@
+import threading
+import numpy as np # type: ignore
+from handlers.volume_geometry import orient_plane
+
+THUMBNAIL_SIZE = 64     # longest in-plane side of a thumbnail, in pixels
+CHUNK_BLOCKS = 8        # z blocks averaged per step, to bound the temporary memory
+
+
+def block_average(volume, factor):
+    """Mean over factor^3 blocks of a [y, x, z] volume; edge blocks average what they contain"""
+    starts = [np.arange(0, n, factor) for n in volume.shape]
+    counts = [np.diff(np.append(s, n)) for s, n in zip(starts, volume.shape)]
+    coarse = np.empty([len(s) for s in starts], dtype=np.float32)
+    step = factor * CHUNK_BLOCKS
+    for start in range(0, volume.shape[2], step):
+        block = np.asarray(volume[:, :, start:start + step], dtype=np.float32)
+        block = np.add.reduceat(block, starts[0], axis=0)
+        block = np.add.reduceat(block, starts[1], axis=1)
+        block = np.add.reduceat(block, np.arange(0, block.shape[2], factor), axis=2)
+        first = start // factor
+        coarse[:, :, first:first + block.shape[2]] = block
+    coarse /= counts[0][:, None, None] * counts[1][None, :, None] * counts[2][None, None, :]
+    return coarse
+
+
+class SliceOverview:
+    """Block-averaged copy of a volume for slice-overview thumbnails.
+
+    Thumbnail i along an axis stands for the full-resolution slice at the centre of its
+    block. Thumbnails are cut from the coarse copy (a few hundred KB for a 512^3 series),
+    so drawing the whole strip again, e.g. after a window change, takes milliseconds.
+    """
+
+    def __init__(self, coarse, factor, shape, key=None):
+        self.coarse = coarse
+        self.factor = factor
+        self.shape = tuple(shape)
+        self.key = key
+
+    @classmethod
+    def compute(cls, volume, key=None, size=THUMBNAIL_SIZE):
+        factor = max(1, -(-max(volume.shape[:2]) // size))
+        return cls(block_average(volume, factor), factor, volume.shape, key)
+
+    def count(self, axis):
+        return self.coarse.shape[axis]
+
+    def slice_index(self, axis, index):
+        """Full-resolution slice represented by thumbnail `index`"""
+        return min(index * self.factor + self.factor // 2, self.shape[axis] - 1)
+
+    def thumbnail(self, plane_name, index, value_range):
+        """uint8 thumbnail of one plane, oriented like the panel showing it"""
+        if plane_name == "XY":
+            image = self.coarse[:, :, index]
+        elif plane_name == "YZ":
+            image = self.coarse[:, index, :]
+        else:
+            image = self.coarse[index, :, :]
+        image = orient_plane(image, plane_name)
+        low, high = value_range
+        scale = 255.0 / (high - low) if high > low else 0.0
+        return np.ascontiguousarray(np.clip((image - low) * scale, 0, 255).astype(np.uint8))
+
+
+def compute_async(volume, key, callback):
+    """Build the overview on a background thread; callback(overview) when done"""
+    def worker():
+        try:
+            overview = SliceOverview.compute(volume, key)
+        except Exception as e:
+            print(f"Error building slice overview: {e}")
+            return
+        callback(overview)
+    thread = threading.Thread(target=worker, daemon=True)
+    thread.start()
+    return thread
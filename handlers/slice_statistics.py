@@ -0,0 +1,107 @@
+import os
+import numpy as np # type: ignore
+
+# Coarse HU histogram per slice: 16 bins of 256 HU from -1024; values outside go to the end bins
+HIST_START = -1024
+HIST_BIN_WIDTH = 256
+HIST_BINS = 16
+# A slice whose values span less than this (HU) carries no image (padding, blank frames)
+BLANK_RANGE = 1.0
+
+
+class SliceStatistics:
+    """Min, max, mean and a coarse histogram of every slice along every axis of a [y, x, z] volume.
+
+    Filled one axial slice at a time while the series is decoded: the axial slice gives its
+    own statistics and updates the running row (y) and column (x) statistics, so building
+    the index takes no extra pass over the volume. Lookups afterwards are array reads.
+    """
+
+    def __init__(self, shape, key=None):
+        self.shape = tuple(shape)
+        self.key = key
+        self.min = [np.full(n, np.inf, dtype=np.float32) for n in self.shape]
+        self.max = [np.full(n, -np.inf, dtype=np.float32) for n in self.shape]
+        self.sum = [np.zeros(n, dtype=np.float64) for n in self.shape]
+        self.hist = [np.zeros((n, HIST_BINS), dtype=np.int64) for n in self.shape]
+
+    def add(self, index, array):
+        """Statistics of axial slice `index` ((y, x) array)"""
+        rows, cols = array.shape
+        self.min[2][index] = array.min()
+        self.max[2][index] = array.max()
+        self.sum[2][index] = array.sum(dtype=np.float64)
+        np.minimum(self.min[0], array.min(axis=1), out=self.min[0])
+        np.maximum(self.max[0], array.max(axis=1), out=self.max[0])
+        self.sum[0] += array.sum(axis=1, dtype=np.float64)
+        np.minimum(self.min[1], array.min(axis=0), out=self.min[1])
+        np.maximum(self.max[1], array.max(axis=0), out=self.max[1])
+        self.sum[1] += array.sum(axis=0, dtype=np.float64)
+
+        # Multiplying by the power-of-two reciprocal is exact and much faster than floor division;
+        # truncation towards zero only affects values that are clipped into bin 0 anyway
+        bins = ((array - HIST_START) * (1.0 / HIST_BIN_WIDTH)).astype(np.intp)
+        np.clip(bins, 0, HIST_BINS - 1, out=bins)
+        row_hist = np.bincount((bins + np.arange(rows)[:, None] * HIST_BINS).ravel(),
+                               minlength=rows * HIST_BINS).reshape(rows, HIST_BINS)
+        self.hist[0] += row_hist
+        self.hist[2][index] = row_hist.sum(axis=0)
+        self.hist[1] += np.bincount((bins + np.arange(cols)[None, :] * HIST_BINS).ravel(),
+                                    minlength=cols * HIST_BINS).reshape(cols, HIST_BINS)
+
+    @classmethod
+    def from_volume(cls, volume, key=None):
+        """Index of an already loaded volume (series cached before the index existed)"""
+        statistics = cls(volume.shape, key)
+        for index in range(volume.shape[2]):
+            statistics.add(index, np.asarray(volume[:, :, index]))
+        return statistics
+
+    def mean(self, axis):
+        """Mean of every slice along an axis"""
+        area = np.prod(self.shape) / self.shape[axis]
+        return self.sum[axis] / area
+
+    def value_range(self, axis, start, stop=None):
+        """(min, max) over slices start..stop-1 along an axis (one slice when stop is None)"""
+        length = self.shape[axis]
+        if stop is None:
+            start = start % length
+            stop = start + 1
+        start, stop = max(start, 0), min(stop, length)
+        if start >= stop:
+            return None
+        return float(self.min[axis][start:stop].min()), float(self.max[axis][start:stop].max())
+
+    def blank(self, axis):
+        """Indices of slices with (almost) no value range"""
+        return np.flatnonzero(self.max[axis] - self.min[axis] < BLANK_RANGE)
+
+    def save(self, path):
+        arrays = {}
+        for axis in range(3):
+            arrays.update({f"min{axis}": self.min[axis], f"max{axis}": self.max[axis],
+                           f"sum{axis}": self.sum[axis], f"hist{axis}": self.hist[axis]})
+        tmp_path = path + ".tmp.npz"
+        np.savez(tmp_path, shape=np.array(self.shape), key=np.array(self.key or ""), **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, key=None):
+        """Cached index for this key, or None"""
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path) as data:
+                if key is not None and str(data['key']) != key:
+                    return None
+                statistics = cls(data['shape'].tolist(), key)
+                for axis in range(3):
+                    statistics.min[axis] = data[f"min{axis}"]
+                    statistics.max[axis] = data[f"max{axis}"]
+                    statistics.sum[axis] = data[f"sum{axis}"]
+                    statistics.hist[axis] = data[f"hist{axis}"]
+                return statistics
+        except (OSError, KeyError, ValueError) as e:
+            print(f"Error reading slice statistics '{path}': {e}")
+            return None
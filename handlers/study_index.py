@@ -0,0 +1,268 @@
+import json
+import os
+import sqlite3
+import threading
+from contextlib import closing, contextmanager
+import numpy as np # type: ignore
+from lazy_imports import lazy_import
+from handlers.dicom_decoders import FrameDecoder
+from handlers.multiframe import DEFER_SIZE, FrameLayout, is_multiframe
+
+dicom = lazy_import("pydicom")
+
+THUMBNAIL_SIZE = 64
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS series (
+    name TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    folder_mtime REAL NOT NULL,
+    patient_id TEXT,
+    patient_name TEXT,
+    study_uid TEXT,
+    series_uid TEXT,
+    series_description TEXT,
+    slice_count INTEGER,
+    rows INTEGER,
+    cols INTEGER,
+    spacing_x REAL,
+    spacing_y REAL,
+    spacing_z REAL,
+    hu_min REAL,
+    hu_max REAL,
+    hu_exact INTEGER DEFAULT 0,
+    files TEXT,
+    thumbnail BLOB,
+    thumbnail_width INTEGER,
+    thumbnail_height INTEGER
+)
+"""
+
+
+class StudyIndex:
+    """Persistent SQLite index of every ingested series, filled by a header-only scan.
+
+    The sidebar list is populated from here at startup, and the stored slice order lets
+    DicomHandler.load_dicom_images skip the header sort when a series is opened. The scan
+    only reads the middle slice, so hu_min/hu_max are that slice's range until the series is
+    first loaded and set_hu_range stores the exact one (hu_exact).
+    """
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or os.path.join(os.getcwd(), "dicom-folder", "index.sqlite")
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self.scan_lock = threading.Lock()
+        self.scan_thread = None
+        self.rescan_requested = False
+        with self.connect() as conn:
+            conn.execute(SCHEMA)
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(series)")]
+            if 'hu_exact' not in columns:
+                conn.execute("ALTER TABLE series ADD COLUMN hu_exact INTEGER DEFAULT 0")
+
+    @contextmanager
+    def connect(self):
+        # One short-lived connection per call so the scan thread and the UI thread never share one;
+        # committed (or rolled back) and closed on leaving the block
+        with closing(sqlite3.connect(self.db_path, timeout=10)) as conn, conn:
+            yield conn
+
+    def names(self):
+        with self.connect() as conn:
+            return [row[0] for row in conn.execute("SELECT name FROM series ORDER BY name")]
+
+    def get(self, name):
+        """Return the indexed metadata for a series as a dict, or None"""
+        with self.connect() as conn:
+            conn.row_factory = sqlite3.Row
+            row = conn.execute("SELECT * FROM series WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            return None
+        info = dict(row)
+        info['files'] = json.loads(info['files']) if info['files'] else []
+        return info
+
+    def file_order(self, name, path):
+        """Slice files of an up-to-date entry, already sorted the way load_dicom_images expects"""
+        info = self.get(name)
+        if info is None or info['path'] != path or not os.path.isdir(path):
+            return None
+        if info['folder_mtime'] != os.stat(path).st_mtime:
+            return None
+        return info['files']
+
+    def thumbnail(self, name):
+        """Return the stored thumbnail as a uint8 2D array, or None"""
+        with self.connect() as conn:
+            row = conn.execute("SELECT thumbnail, thumbnail_width, thumbnail_height FROM series WHERE name = ?",
+                               (name,)).fetchone()
+        if row is None or row[0] is None:
+            return None
+        return np.frombuffer(row[0], dtype=np.uint8).reshape(row[2], row[1])
+
+    def set_hu_range(self, name, hu_min, hu_max):
+        """Store the exact HU range of a series, known once its volume has been loaded"""
+        with self.connect() as conn:
+            conn.execute("UPDATE series SET hu_min = ?, hu_max = ?, hu_exact = 1 WHERE name = ?",
+                         (float(hu_min), float(hu_max), name))
+
+    def remove(self, name):
+        with self.connect() as conn:
+            conn.execute("DELETE FROM series WHERE name = ?", (name,))
+
+    def scan_async(self, registry, callback=None):
+        """Index new or changed series on a daemon thread; callback(names) is called when done"""
+        with self.scan_lock:
+            if self.scan_thread is not None and self.scan_thread.is_alive():
+                self.rescan_requested = True
+                return
+            self.scan_thread = threading.Thread(target=self._scan_loop, args=(registry, callback))
+            self.scan_thread.daemon = True
+            self.scan_thread.start()
+
+    def _scan_loop(self, registry, callback):
+        while True:
+            changed = self.scan(registry)
+            if callback:
+                callback(changed)
+            with self.scan_lock:
+                if not self.rescan_requested:
+                    self.scan_thread = None
+                    return
+                self.rescan_requested = False
+
+    def scan(self, registry):
+        """Index every series folder under ./dicom-folder/ and in the registry; returns updated names"""
+        folders = {}
+        root = registry.root
+        if os.path.isdir(root):
+            for entry in os.scandir(root):
+                if entry.is_dir() and not entry.name.startswith(".") and not entry.name.endswith(".partial"):
+                    folders[entry.name] = entry.path
+        for name in registry.names():
+            folders[name] = registry.resolve(name)
+
+        with self.connect() as conn:
+            known = dict(conn.execute("SELECT name, folder_mtime FROM series"))
+            stored_paths = dict(conn.execute("SELECT name, path FROM series"))
+            stale = [name for name in known if name not in folders]
+            conn.executemany("DELETE FROM series WHERE name = ?", [(name,) for name in stale])
+        changed = []
+        for name, path in sorted(folders.items()):
+            try:
+                mtime = os.stat(path).st_mtime
+                if known.get(name) == mtime and stored_paths.get(name) == path:
+                    continue
+                info = self.read_series_headers(path)
+            except Exception as e:
+                print(f"Error indexing '{path}': {e}")
+                continue
+            if info is None:
+                continue
+            info.update(name=name, path=path, folder_mtime=mtime)
+            self._store(info)
+            changed.append(name)
+        return changed
+
+    def read_series_headers(self, path):
+        """Read headers only (no pixel data) for each slice, plus one slice for the thumbnail"""
+        headers = []
+        multiframe = []
+        for file_name in os.listdir(path):
+            file_path = os.path.join(path, file_name)
+            if not os.path.isfile(file_path):
+                continue
+            try:
+                ds = dicom.dcmread(file_path, stop_before_pixels=True, force=True)
+            except Exception:
+                continue
+            if is_multiframe(ds):
+                multiframe.append((file_name, ds))
+                continue
+            if 'ImagePositionPatient' not in ds:
+                continue
+            headers.append((file_name, ds))
+        if not headers and len(multiframe) == 1:
+            return self.read_multiframe_headers(path, *multiframe[0])
+        if not headers:
+            return None
+
+        headers.sort(key=lambda item: item[1].ImagePositionPatient[2], reverse=True)
+        first = headers[0][1]
+        positions = np.array([float(ds.ImagePositionPatient[2]) for _, ds in headers])
+        if len(positions) > 1:
+            spacing_z = float(np.median(np.abs(np.diff(positions))))
+        else:
+            spacing_z = float(getattr(first, 'SliceThickness', 1.0) or 1.0)
+        pixel_spacing = getattr(first, 'PixelSpacing', [1.0, 1.0])
+
+        middle_name = headers[len(headers) // 2][0]
+        middle = dicom.dcmread(os.path.join(path, middle_name), force=True)
+        slope = float(getattr(middle, 'RescaleSlope', 1))
+        intercept = float(getattr(middle, 'RescaleIntercept', 0))
+        middle_hu = middle.pixel_array.astype(np.float32) * slope + intercept
+        hu_min, hu_max = self._header_hu_range(middle, slope, intercept)
+        if hu_min is None:
+            hu_min, hu_max = float(middle_hu.min()), float(middle_hu.max())
+        thumbnail = self._make_thumbnail(middle_hu)
+        return self._series_info(first, len(headers), pixel_spacing, spacing_z, hu_min, hu_max,
+                                 [file_name for file_name, _ in headers], thumbnail)
+
+    def read_multiframe_headers(self, path, file_name, header):
+        """Index entry for an enhanced CT object holding the whole series; the thumbnail is
+        decoded from its middle frame only"""
+        layout = FrameLayout(header)
+        file_path = os.path.join(path, file_name)
+        ds = dicom.dcmread(file_path, force=True, defer_size=DEFER_SIZE)
+        frame = layout.order[layout.count // 2]
+        raw = FrameDecoder(workers=1).frame_reader(ds, file_path)(frame)
+        middle_hu = raw.astype(np.float32) * float(layout.slopes[frame]) + float(layout.intercepts[frame])
+        hu_min, hu_max = self._header_hu_range(header, float(layout.slopes[frame]), float(layout.intercepts[frame]))
+        if hu_min is None:
+            hu_min, hu_max = float(middle_hu.min()), float(middle_hu.max())
+        return self._series_info(header, layout.count, layout.pixel_spacing, layout.slice_spacing, hu_min, hu_max,
+                                 [file_name], self._make_thumbnail(middle_hu))
+
+    def _series_info(self, first, slice_count, pixel_spacing, spacing_z, hu_min, hu_max, files, thumbnail):
+        return {
+            'patient_id': str(getattr(first, 'PatientID', '')),
+            'patient_name': str(getattr(first, 'PatientName', '')),
+            'study_uid': str(getattr(first, 'StudyInstanceUID', '')),
+            'series_uid': str(getattr(first, 'SeriesInstanceUID', '')),
+            'series_description': str(getattr(first, 'SeriesDescription', '')),
+            'slice_count': slice_count,
+            'rows': int(first.Rows),
+            'cols': int(first.Columns),
+            'spacing_x': float(pixel_spacing[0]),
+            'spacing_y': float(pixel_spacing[1]),
+            'spacing_z': spacing_z,
+            'hu_min': hu_min,
+            'hu_max': hu_max,
+            'files': json.dumps(files),
+            'thumbnail': thumbnail.tobytes(),
+            'thumbnail_width': thumbnail.shape[1],
+            'thumbnail_height': thumbnail.shape[0],
+        }
+
+    def _header_hu_range(self, ds, slope, intercept):
+        smallest = getattr(ds, 'SmallestImagePixelValue', None)
+        largest = getattr(ds, 'LargestImagePixelValue', None)
+        if smallest is None or largest is None:
+            return None, None
+        return float(smallest) * slope + intercept, float(largest) * slope + intercept
+
+    def _make_thumbnail(self, image_2d):
+        step = max(1, max(image_2d.shape) // THUMBNAIL_SIZE)
+        small = image_2d[::step, ::step]
+        low, high = small.min(), small.max()
+        if high - low > 0:
+            small = (small - low) / (high - low) * 255
+        else:
+            small = np.zeros(small.shape)
+        return np.ascontiguousarray(small.astype(np.uint8))
+
+    def _store(self, info):
+        columns = ", ".join(info)
+        placeholders = ", ".join("?" for _ in info)
+        with self.connect() as conn:
+            conn.execute(f"INSERT OR REPLACE INTO series ({columns}) VALUES ({placeholders})", list(info.values()))
@@ -0,0 +1,225 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np # type: ignore
+
+# HU ranges (lower bound inclusive, upper bound exclusive) for threshold segmentation.
+# Contrast-filled vessels and cancellous bone overlap around 300-400 HU; the split is a compromise.
+TISSUE_CLASSES = (
+    ("air", -np.inf, -400),
+    ("fat", -190, -30),
+    ("soft_tissue", -30, 150),
+    ("vessel", 150, 350),
+    ("bone", 350, np.inf),
+)
+# Tissues that get a distance transform for risk queries
+RISK_TISSUES = ("bone", "vessel")
+MAX_DISTANCE = 32       # voxels; distances beyond this are reported as MAX_DISTANCE
+DOWNSAMPLE = 2          # distance maps are computed on a grid this many times coarser
+CHUNK_SLICES = 32       # multiple of 8 so each chunk packs into whole bytes
+
+
+def _chunks(length, size):
+    return [(start, min(start + size, length)) for start in range(0, length, size)]
+
+
+def _run_chunks(func, chunks, workers):
+    # NumPy releases the GIL in the heavy element-wise work, so threads use several cores
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(lambda chunk: func(*chunk), chunks))
+
+
+def segment(volume, workers=None):
+    """Threshold a [y, x, z] HU volume into bit-packed masks, one per tissue class.
+
+    Returns {name: uint8 array (y, x, ceil(z / 8))}, bits packed along z (np.packbits order).
+    """
+    workers = workers or os.cpu_count() or 1
+    rows, cols, slices = volume.shape
+    packed = {name: np.zeros((rows, cols, (slices + 7) // 8), dtype=np.uint8) for name, _, _ in TISSUE_CLASSES}
+
+    def work(start, stop):
+        block = np.asarray(volume[:, :, start:stop])
+        for name, low, high in TISSUE_CLASSES:
+            mask = (block >= low) & (block < high)
+            packed[name][:, :, start // 8:(stop + 7) // 8] = np.packbits(mask, axis=2)
+
+    _run_chunks(work, _chunks(slices, CHUNK_SLICES), workers)
+    return packed
+
+
+def unpack(packed, slices):
+    return np.unpackbits(packed, axis=2, count=slices).astype(bool)
+
+
+def _downsample_any(mask, factor):
+    """Block 'any' reduction: a coarse voxel is set if any fine voxel in it is"""
+    rows, cols, slices = (-(-n // factor) * factor for n in mask.shape)
+    padded = np.zeros((rows, cols, slices), dtype=bool)
+    padded[:mask.shape[0], :mask.shape[1], :mask.shape[2]] = mask
+    return padded.reshape(rows // factor, factor, cols // factor, factor, slices // factor, factor).any(axis=(1, 3, 5))
+
+
+def _feature_distance_1d(mask, axis, limit):
+    """Squared distance to the nearest set voxel along one axis (sweeps over that axis,
+    vectorized over the other two); capped at (limit + 1)^2"""
+    mask = np.moveaxis(mask, axis, 0)
+    far = limit + 1
+    distance = np.full(mask.shape, far, dtype=np.float32)
+    current = np.full(mask.shape[1:], far, dtype=np.float32)
+    for i in range(mask.shape[0]):
+        current = np.where(mask[i], 0, np.minimum(current + 1, far))
+        distance[i] = current
+    current = np.full(mask.shape[1:], far, dtype=np.float32)
+    for i in range(mask.shape[0] - 1, -1, -1):
+        current = np.where(mask[i], 0, np.minimum(current + 1, far))
+        distance[i] = np.minimum(distance[i], current)
+    return np.moveaxis(distance * distance, 0, axis)
+
+
+def _parabola_pass(squared, axis, limit):
+    """min over |k| <= limit of squared[p + k] + k^2 along one axis (exact up to `limit`)"""
+    length = squared.shape[axis]
+    far = np.float32((limit + 1) ** 2)
+    padding = [(0, 0)] * 3
+    padding[axis] = (limit, limit)
+    padded = np.pad(squared, padding, constant_values=far)
+    result = squared.copy()
+    for k in range(-limit, limit + 1):
+        if k == 0:
+            continue
+        shifted = np.take(padded, np.arange(limit + k, limit + k + length), axis=axis)
+        np.minimum(result, shifted + k * k, out=result)
+    return result
+
+
+def distance_transform(mask, limit=MAX_DISTANCE, workers=None):
+    """Euclidean distance (voxels) from every voxel to the nearest set voxel, capped at limit.
+
+    Separable: exact 1D distance along y, then two parabola passes along x and z. Each pass
+    runs on chunks of the axes it does not touch, in parallel.
+    """
+    workers = workers or os.cpu_count() or 1
+    rows, cols, slices = mask.shape
+    squared = np.empty(mask.shape, dtype=np.float32)
+
+    def along_y(start, stop):
+        squared[:, :, start:stop] = _feature_distance_1d(mask[:, :, start:stop], 0, limit)
+    _run_chunks(along_y, _chunks(slices, 16), workers)
+
+    passed = np.empty_like(squared)
+    def along_x(start, stop):
+        passed[:, :, start:stop] = _parabola_pass(squared[:, :, start:stop], 1, limit)
+    _run_chunks(along_x, _chunks(slices, 16), workers)
+
+    def along_z(start, stop):
+        squared[start:stop] = _parabola_pass(passed[start:stop], 2, limit)
+    _run_chunks(along_z, _chunks(rows, 16), workers)
+
+    return np.minimum(np.sqrt(squared), limit)
+
+
+class TissueMasks:
+    """Segmentation of one volume: packed class masks and coarse distance maps.
+
+    Point queries index straight into the precomputed arrays, so checking a route costs
+    a few microseconds however large the volume is.
+    """
+
+    def __init__(self, shape, packed, distances, downsample=DOWNSAMPLE, key=None):
+        self.shape = tuple(shape)
+        self.packed = packed
+        self.distances = distances
+        self.downsample = downsample
+        self.key = key
+
+    @classmethod
+    def compute(cls, volume, key=None, workers=None):
+        packed = segment(volume, workers)
+        distances = {}
+        for name in RISK_TISSUES:
+            coarse = _downsample_any(unpack(packed[name], volume.shape[2]), DOWNSAMPLE)
+            # Distance in coarse voxels, stored in full-resolution voxels (0-255)
+            distance = distance_transform(coarse, -(-MAX_DISTANCE // DOWNSAMPLE), workers) * DOWNSAMPLE
+            distances[name] = np.round(distance).astype(np.uint8)
+        return cls(volume.shape, packed, distances, DOWNSAMPLE, key)
+
+    def save(self, path):
+        arrays = {f"mask_{name}": packed for name, packed in self.packed.items()}
+        arrays.update({f"distance_{name}": distance for name, distance in self.distances.items()})
+        tmp_path = path + ".tmp.npz"
+        np.savez(tmp_path, shape=np.array(self.shape), downsample=np.array(self.downsample),
+                 key=np.array(self.key or ""), **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, key=None):
+        """Cached masks for this key, or None"""
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path) as data:
+                if key is not None and str(data['key']) != key:
+                    return None
+                packed = {name: data[f"mask_{name}"] for name, _, _ in TISSUE_CLASSES}
+                distances = {name: data[f"distance_{name}"] for name in RISK_TISSUES}
+                return cls(data['shape'].tolist(), packed, distances, int(data['downsample']), key)
+        except (OSError, KeyError, ValueError) as e:
+            print(f"Error reading tissue masks '{path}': {e}")
+            return None
+
+    def _indices(self, voxels):
+        """(x, y, z) voxels -> clipped (y, x, z) index arrays"""
+        voxels = np.asarray(voxels, dtype=np.int64).reshape(-1, 3)
+        y = np.clip(voxels[:, 1], 0, self.shape[0] - 1)
+        x = np.clip(voxels[:, 0], 0, self.shape[1] - 1)
+        z = np.clip(voxels[:, 2], 0, self.shape[2] - 1)
+        return y, x, z
+
+    def contains(self, tissue, voxels):
+        """Whether each (x, y, z) voxel belongs to a tissue class"""
+        y, x, z = self._indices(voxels)
+        return (self.packed[tissue][y, x, z >> 3] >> (7 - (z & 7))) & 1 == 1
+
+    def labels(self, voxels):
+        """Tissue class name of each voxel"""
+        names = np.array([name for name, _, _ in TISSUE_CLASSES] + ["other"])
+        label = np.full(len(np.asarray(voxels).reshape(-1, 3)), len(TISSUE_CLASSES))
+        for index, (name, _, _) in enumerate(TISSUE_CLASSES):
+            label[self.contains(name, voxels) & (label == len(TISSUE_CLASSES))] = index
+        return names[label]
+
+    def distance(self, tissue, voxels):
+        """Distance (voxels, capped at MAX_DISTANCE) from each voxel to the nearest voxel of a tissue"""
+        y, x, z = self._indices(voxels)
+        factor = self.downsample
+        return self.distances[tissue][y // factor, x // factor, z // factor].astype(np.float32)
+
+    def route_risk(self, voxels):
+        """Closest approach to each risk tissue along a route: {tissue: (distance, voxel index)}"""
+        risk = {}
+        if not len(voxels):
+            return risk
+        for tissue in RISK_TISSUES:
+            distance = self.distance(tissue, voxels)
+            index = int(np.argmin(distance))
+            risk[tissue] = (float(distance[index]), index)
+        return risk
+
+
+def compute_async(volume, cache_path, key, callback):
+    """Load cached masks or compute them on a background thread; callback(masks) when done"""
+    def worker():
+        masks = TissueMasks.load(cache_path, key)
+        if masks is None:
+            try:
+                masks = TissueMasks.compute(volume, key)
+                os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+                masks.save(cache_path)
+            except Exception as e:
+                print(f"Error segmenting volume: {e}")
+                return
+        callback(masks)
+    thread = threading.Thread(target=worker, daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,121 @@
+import threading
+from collections import OrderedDict
+import numpy as np # type: ignore
+
+# Track colours as (hex for Qt, RGBA for VisPy); the first track keeps the original red
+TRACK_PALETTE = [
+    ("#ff0000", (1.0, 0.0, 0.0, 1.0)),
+    ("#00bfff", (0.0, 0.75, 1.0, 1.0)),
+    ("#ffd700", (1.0, 0.84, 0.0, 1.0)),
+    ("#ff00ff", (1.0, 0.0, 1.0, 1.0)),
+    ("#7fff00", (0.5, 1.0, 0.0, 1.0)),
+    ("#ff8c00", (1.0, 0.55, 0.0, 1.0)),
+]
+TRACK_PALETTE_RGBA = dict(TRACK_PALETTE)
+
+
+class TrackBuffer:
+    """Points of one needle track in a growable float32 (N, 3) array (capacity doubles when full)"""
+
+    def __init__(self, track_id, color, capacity=1024):
+        self.track_id = track_id
+        self.color, self.rgba = color
+        self.data = np.empty((capacity, 3), dtype=np.float32)
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def extend(self, points):
+        points = np.asarray(points, dtype=np.float32).reshape(-1, 3)
+        with self.lock:
+            needed = self.count + len(points)
+            if needed > len(self.data):
+                grown = np.empty((max(needed, 2 * len(self.data)), 3), dtype=np.float32)
+                grown[:self.count] = self.data[:self.count]
+                self.data = grown
+            self.data[self.count:needed] = points
+            self.count = needed
+
+    def points(self):
+        """(N, 3) view of the samples received so far; later appends never modify it"""
+        with self.lock:
+            return self.data[:self.count]
+
+    def truncate(self, count):
+        """Keep the first `count` points, in a new array so earlier views keep theirs"""
+        with self.lock:
+            count = max(0, min(count, self.count))
+            data = np.empty_like(self.data)
+            data[:count] = self.data[:count]
+            self.data, self.count = data, count
+
+    def clear(self):
+        # A new array, so views handed out before the clear keep their points
+        with self.lock:
+            self.data = np.empty_like(self.data)
+            self.count = 0
+
+    def __len__(self):
+        return self.count
+
+
+class TrackRegistry:
+    """Concurrent needle tracks (e.g. ablation probes, biopsy plus reference needle) by id.
+
+    Samples are appended from the acquisition thread and read from the UI thread.
+    """
+
+    def __init__(self):
+        self.tracks = OrderedDict()
+        self.lock = threading.Lock()
+        self.next_color = 0
+
+    def get(self, track_id, create=True):
+        with self.lock:
+            track = self.tracks.get(track_id)
+            if track is None and create:
+                color = TRACK_PALETTE[self.next_color % len(TRACK_PALETTE)]
+                self.next_color += 1
+                track = self.tracks[track_id] = TrackBuffer(track_id, color)
+            return track
+
+    def remove(self, track_id):
+        with self.lock:
+            self.tracks.pop(track_id, None)
+
+    def ids(self):
+        with self.lock:
+            return list(self.tracks)
+
+    def snapshot(self):
+        """[(track_id, color, (N, 3) points)] for every non-empty track"""
+        with self.lock:
+            tracks = list(self.tracks.values())
+        return [(track.track_id, track.color, points)
+                for track, points in ((track, track.points()) for track in tracks) if len(points)]
+
+    def clear(self):
+        with self.lock:
+            for track in self.tracks.values():
+                track.clear()
+
+    def total_points(self):
+        with self.lock:
+            return sum(len(track) for track in self.tracks.values())
+
+
+def batch_tracks(snapshot):
+    """Pack tracks into one vertex array with per-vertex RGBA colours and segment pairs
+    that never join the end of one track to the start of the next"""
+    if not snapshot:
+        return np.zeros((0, 3), dtype=np.float32), np.zeros((0, 4), dtype=np.float32), np.zeros((0, 2), dtype=np.uint32)
+    lengths = np.array([len(points) for _, _, points in snapshot])
+    positions = np.concatenate([points for _, _, points in snapshot])
+    rgba = np.array([TRACK_PALETTE_RGBA.get(color, (1.0, 0.0, 0.0, 1.0)) for _, color, _ in snapshot], dtype=np.float32)
+    colors = np.repeat(rgba, lengths, axis=0)
+    starts = np.arange(len(positions) - 1, dtype=np.uint32)
+    # A segment i -> i+1 is valid unless i is the last vertex of a track
+    keep = np.ones(len(starts), dtype=bool)
+    keep[np.cumsum(lengths)[:-1] - 1] = False
+    starts = starts[keep]
+    return positions, colors, np.column_stack([starts, starts + 1])
+
@@ -0,0 +1,161 @@
+import time
+import numpy as np # type: ignore
+from handlers.tissue_segmentation import TISSUE_CLASSES, RISK_TISSUES
+
+# Cost per voxel crossed, by tissue class. Air inside the body is lung (pneumothorax risk);
+# air outside the body is never sampled because routes start on the skin.
+TISSUE_COST = {"air": 5.0, "fat": 1.0, "soft_tissue": 1.0, "vessel": 200.0, "bone": 1000.0}
+# Extra cost for passing within SAFETY_MARGIN voxels of a vessel or bone (needs tissue masks)
+SAFETY_MARGIN = 6.0
+PROXIMITY_WEIGHT = 20.0
+BODY_MIN_HU = -400
+
+
+def build_cost_volume(volume, masks=None, factor=2):
+    """Cost per coarse voxel (every `factor`-th voxel of a [y, x, z] HU volume)"""
+    coarse = np.asarray(volume[::factor, ::factor, ::factor], dtype=np.float32)
+    cost = np.zeros(coarse.shape, dtype=np.float32)
+    for name, low, high in TISSUE_CLASSES:
+        cost[(coarse >= low) & (coarse < high)] = TISSUE_COST[name]
+    if masks is not None:
+        grid = np.indices(coarse.shape, sparse=True)
+        for tissue in RISK_TISSUES:
+            # Distance maps live on the masks' own grid; sample them at the coarse voxels
+            scale = factor / masks.downsample
+            distances = masks.distances[tissue]
+            distance = distances[tuple(np.minimum((g * scale).astype(np.int64), n - 1)
+                                       for g, n in zip(grid, distances.shape))].astype(np.float32)
+            closeness = np.clip(SAFETY_MARGIN - distance, 0, None) / SAFETY_MARGIN
+            cost += PROXIMITY_WEIGHT * closeness * closeness
+    # Lung, airway and bowel gas are inside the body; only air reaching the image border is outside
+    body = ~outside_air(coarse < BODY_MIN_HU)
+    return cost, body
+
+
+def _spread_runs(outside, free, axis):
+    """Mark every run of free voxels along an axis that already holds an outside voxel"""
+    free_lines = np.moveaxis(free, axis, -1)
+    outside_lines = np.moveaxis(outside, axis, -1)
+    starts = free_lines.copy()
+    starts[..., 1:] &= ~free_lines[..., :-1]
+    runs = np.cumsum(starts, dtype=np.int32).reshape(free_lines.shape)
+    runs[~free_lines] = 0
+    reached = np.zeros(int(runs.max()) + 1, dtype=bool)
+    reached[runs[outside_lines]] = True
+    reached[0] = False
+    return np.moveaxis(reached[runs], -1, axis)
+
+
+def outside_air(air):
+    """Air voxels connected to the image border within their axial slice (4-connected).
+
+    Seeded from the slice borders and grown by alternating row and column runs. A pass that adds
+    nothing means the mask is closed along both axes (the previous pass closed the other one),
+    which takes three passes for a body outline.
+    """
+    outside = np.zeros(air.shape, dtype=bool)
+    for border in (np.s_[0, :], np.s_[-1, :], np.s_[:, 0], np.s_[:, -1]):
+        outside[border] = air[border]
+    count = np.count_nonzero(outside)
+    passes = 0
+    while True:
+        outside = _spread_runs(outside, air, passes % 2)
+        passes += 1
+        grown = np.count_nonzero(outside)
+        if grown == count and passes > 1:
+            return outside
+        count = grown
+
+
+def skin_voxels(body):
+    """Body voxels with a non-body neighbour in their axial plane, as (y, x, z) indices.
+    With a hole-filled body mask (build_cost_volume) these lie on the outer contour only."""
+    padded = np.pad(body, ((1, 1), (1, 1), (0, 0)), constant_values=False)
+    inner = (padded[:-2, 1:-1] & padded[2:, 1:-1] & padded[1:-1, :-2] & padded[1:-1, 2:])
+    return np.argwhere(body & ~inner)
+
+
+def on_outer_contour(body, entries):
+    """Whether each coarse (y, x, z) entry is a body voxel next to outside air in its axial plane
+    (or on the image edge)"""
+    padded = np.pad(body, ((1, 1), (1, 1), (0, 0)), constant_values=False)
+    y, x, z = (entries[:, axis] for axis in range(3))
+    inside = body[y, x, z]
+    outside_next = ~padded[y, x + 1, z] | ~padded[y + 2, x + 1, z] | ~padded[y + 1, x, z] | ~padded[y + 1, x + 2, z]
+    return inside & outside_next
+
+
+class TrajectoryPlanner:
+    """Suggests straight needle routes to a target.
+
+    Entry candidates are skin voxels within reach of the target; each route's cost is the
+    line integral of the cost volume from entry to target, evaluated for thousands of
+    candidates at once (one fancy-index lookup per batch). Candidates are processed in
+    batches until all are scored or the time budget runs out.
+    """
+
+    def __init__(self, volume, masks=None, factor=2):
+        self.factor = factor
+        self.cost, self.body = build_cost_volume(volume, masks, factor)
+        self.skin = skin_voxels(self.body)
+
+    def candidates(self, target, max_length, max_tilt_degrees):
+        """Skin voxels (coarse y, x, z) within max_length of the target and tilted at most
+        max_tilt_degrees out of the target's axial plane"""
+        target = np.array([target[1], target[0], target[2]], dtype=np.float64) / self.factor
+        offset = self.skin - target
+        length = np.linalg.norm(offset, axis=1)
+        in_plane = np.linalg.norm(offset[:, :2], axis=1)
+        tilt = np.degrees(np.arctan2(np.abs(offset[:, 2]), np.maximum(in_plane, 1e-9)))
+        keep = (length * self.factor <= max_length) & (length > 0) & (tilt <= max_tilt_degrees)
+        return self.skin[keep]
+
+    def score(self, entries, target, samples=None):
+        """Line integral of cost from each coarse (y, x, z) entry to the target; returns
+        (cost, length in full-resolution voxels, worst voxel cost)"""
+        target = np.array([target[1], target[0], target[2]], dtype=np.float64) / self.factor
+        entries = entries.astype(np.float64)
+        delta = target - entries
+        length = np.linalg.norm(delta, axis=1)
+        if samples is None:
+            samples = max(int(np.ceil(length.max())) + 1, 2) if len(length) else 2
+        fractions = (np.arange(samples) + 0.5) / samples
+        points = entries[:, None, :] + delta[:, None, :] * fractions[None, :, None]
+        index = np.clip(np.rint(points).astype(np.int64), 0, np.array(self.cost.shape) - 1)
+        values = self.cost[index[..., 0], index[..., 1], index[..., 2]]
+        return values.mean(axis=1) * length * self.factor, length * self.factor, values.max(axis=1)
+
+    def suggest(self, target, top_k=5, max_length=300, max_tilt_degrees=30, time_budget=3.0,
+                min_separation=15, batch_size=2048):
+        """Best routes to a target (x, y, z voxel) as dicts with entry, target, cost, length and
+        worst_cost, cheapest first; entries are at least min_separation voxels apart"""
+        started = time.perf_counter()
+        candidates = self.candidates(target, max_length, max_tilt_degrees)
+        order = np.random.default_rng(0).permutation(len(candidates))
+        scores, lengths, worst = [], [], []
+        evaluated = 0
+        for start in range(0, len(order), batch_size):
+            batch = candidates[order[start:start + batch_size]]
+            cost, length, peak = self.score(batch, target)
+            scores.append(cost)
+            lengths.append(length)
+            worst.append(peak)
+            evaluated += len(batch)
+            if time.perf_counter() - started > time_budget:
+                break
+        if not evaluated:
+            return [], 0
+        scores, lengths, worst = np.concatenate(scores), np.concatenate(lengths), np.concatenate(worst)
+        entries = candidates[order[:evaluated]]
+
+        chosen = []
+        for index in np.argsort(scores):
+            entry = entries[index][[1, 0, 2]] * self.factor
+            if any(np.linalg.norm(entry - route['entry']) < min_separation for route in chosen):
+                continue
+            chosen.append({'entry': entry.astype(np.float64), 'target': np.asarray(target, dtype=np.float64),
+                           'cost': float(scores[index]), 'length': float(lengths[index]),
+                           'worst_cost': float(worst[index])})
+            if len(chosen) >= top_k:
+                break
+        return chosen, evaluated
@@ -1,7 +1,12 @@
 import numpy as np # type: ignore
-from vispy import scene # type: ignore
-from vispy.scene import visuals # type: ignore
-from vispy.visuals.transforms import STTransform # type: ignore
+from lazy_imports import lazy_import
+import perf_probes
+import latency_tracer
+from handlers.track_registry import batch_tracks
+
+scene = lazy_import("vispy.scene")
+visuals = lazy_import("vispy.scene.visuals")
+transforms = lazy_import("vispy.visuals.transforms")
 
 class VisualizationHandler:
     def __init__(self):
@@ -11,11 +16,13 @@ class VisualizationHandler:
         self.scatter = None
         self.dash_line = None
         self.realtime_line_vispy = None
+        self.realtime_trace_id = None
 
     def visualize_vispy(self, volume3d):
         """Create 3D visualization using VisPy"""
         self.canvas = scene.SceneCanvas(keys='interactive', show=True)
         self.view = self.canvas.central_widget.add_view()
+        self.canvas.events.draw.connect(self.on_canvas_draw, position='last')
 
         new_volume3d = np.rollaxis(volume3d, 2)
         self.volume = scene.visuals.Volume(new_volume3d, parent=self.view.scene, threshold=0.225)
@@ -26,7 +33,7 @@ class VisualizationHandler:
         self.view.camera.azimuth_range = (None, None)
 
         axis = scene.visuals.XYZAxis(parent=self.view.scene)
-        s = STTransform(translate=(50, 50, 0), scale=(50, 50, 50))
+        s = transforms.STTransform(translate=(50, 50, 0), scale=(50, 50, 50))
         axis.transform = s
 
         self.scatter = visuals.Markers()
@@ -36,9 +43,12 @@ class VisualizationHandler:
         self.realtime_line_vispy = visuals.Line(color='red', width=2, method='gl', parent=self.view.scene)
         self.view.add(self.realtime_line_vispy)
 
+    @perf_probes.probe("VisualizationHandler.draw_needle_plan_vispy")
     def draw_needle_plan_vispy(self, point_start, point_end, plan_line_deleted):
         """Draw planned needle path in 3D"""
-        if plan_line_deleted or not hasattr(self, 'dash_line'):
+        if self.dash_line is None:
+            return
+        if plan_line_deleted:
             self.dash_line.set_data(np.array([]).reshape(0,3))
             return
         try:
@@ -64,30 +74,35 @@ class VisualizationHandler:
             self.dash_line.set_data(np.array([]).reshape(0,3))
             pass
 
+    @perf_probes.probe("VisualizationHandler.update_realtime_line_vispy")
     def update_realtime_line_vispy(self, realtime_points, realtime_line_deleted):
-        """Update real-time line in 3D visualization"""
-        if realtime_line_deleted or not hasattr(self, 'realtime_line_vispy'):
-            if hasattr(self, 'realtime_line_vispy'):
-                self.realtime_line_vispy.set_data(np.array([]).reshape(0, 3))
+        """Update real-time line in 3D visualization (single track)"""
+        points = np.asarray(realtime_points, dtype=np.float32)
+        if points.ndim != 2 or points.shape[1] != 3:
+            points = np.zeros((0, 3), dtype=np.float32)
+        self.update_realtime_tracks_vispy([(None, "#ff0000", points)], realtime_line_deleted, len(points) - 1)
+
+    @perf_probes.probe("VisualizationHandler.update_realtime_tracks_vispy")
+    def update_realtime_tracks_vispy(self, tracks, realtime_line_deleted, trace_id=None):
+        """Draw every needle track with one line visual (per-vertex colours, no joins between tracks)"""
+        if self.realtime_line_vispy is None:
+            return
+        positions, colors, connect = batch_tracks([] if realtime_line_deleted else tracks)
+        if not len(connect):
+            # Reset colour and connectivity too, they must match the (empty) vertex count
+            self.realtime_line_vispy.set_data(np.array([]).reshape(0, 3), color='red', connect='strip')
             return
+        self.realtime_line_vispy.set_data(positions, color=colors, connect=connect)
+        self.realtime_trace_id = trace_id
 
-        if realtime_points and len(realtime_points) > 0:
-            try:
-                points = np.array(realtime_points)
-                if points.ndim == 2 and points.shape[1] == 3:
-                    self.realtime_line_vispy.set_data(points, connect='strip')
-                else:
-                    self.realtime_line_vispy.set_data(np.array([]).reshape(0, 3))
-            except (ValueError, TypeError):
-                self.realtime_line_vispy.set_data(np.array([]).reshape(0, 3))
-        else:
-            self.realtime_line_vispy.set_data(np.array([]).reshape(0, 3))
+    def on_canvas_draw(self, event):
+        latency_tracer.mark_upto(self.realtime_trace_id, "gl_draw")
 
     def clear_lines(self):
         """Clear all visualization lines"""
         empty_points_3d = np.array([]).reshape(0, 3)
 
-        if hasattr(self, 'dash_line'):
+        if self.dash_line is not None:
             self.dash_line.set_data(empty_points_3d, connect='segments')
-        if hasattr(self, 'realtime_line_vispy'):
-            self.realtime_line_vispy.set_data(empty_points_3d, connect='strip')
\ No newline at end of file
+        if self.realtime_line_vispy is not None:
+            self.realtime_line_vispy.set_data(empty_points_3d, color='red', connect='strip')
\ No newline at end of file
@@ -0,0 +1,163 @@
+import numpy as np # type: ignore
+from handlers.overlay_projection import PlaneProjection
+
+DEFAULT_ORIENTATION = (1.0, 0.0, 0.0, 0.0, 1.0, 0.0)
+# Voxel axes (0 = x, 1 = y, 2 = z) each panel shows across, down and as depth. In YZ and XZ z grows
+# downwards, so the first slice (the head) is at the top. Panel images are laid out from this table
+# too (orient_plane), so the overlays and the image cannot disagree on which row a voxel is in.
+PANEL_AXES = {"XY": (0, 1, 2), "YZ": (1, 2, 0), "XZ": (0, 2, 1)}
+# Voxel axis along each array dimension of a [y, x, z] volume
+VOLUME_AXES = (1, 0, 2)
+
+
+def orient_plane(image, plane_name):
+    """Lay out a 2D cut of the volume (the plane's depth axis removed) as its panel shows it:
+    rows along the panel's down axis, columns along its across axis"""
+    across, down, depth = PANEL_AXES[plane_name]
+    rows = [axis for axis in VOLUME_AXES if axis != depth][0]
+    return image if rows == down else image.T
+
+
+class VolumeGeometry:
+    """Voxel <-> patient geometry of a [y, x, z] volume, from its DICOM headers.
+
+    Voxels are (x, y, z) = (column, row, slice index) as everywhere else in the app; patient
+    coordinates are DICOM LPS millimetres. One 4x4 affine (and its inverse) holds pixel spacing,
+    slice spacing and ImageOrientationPatient. The per-panel screen mappings are built once per
+    volume (PanelGeometry), so anisotropic and non-512 series are drawn to scale.
+    """
+
+    def __init__(self, shape, pixel_spacing=(1.0, 1.0), slice_vector=None, orientation=DEFAULT_ORIENTATION,
+                 origin=(0.0, 0.0, 0.0)):
+        rows, cols, slices = (int(n) for n in shape)
+        self.shape = (rows, cols, slices)
+        self.dims = (cols, rows, slices)
+        orientation = np.asarray(orientation, dtype=np.float64)
+        row_direction, column_direction = orientation[:3], orientation[3:]
+        if slice_vector is None:
+            # Slices are stored head first, so the index grows against the slice normal
+            slice_vector = -np.cross(row_direction, column_direction)
+        self.pixel_spacing = (float(pixel_spacing[0]), float(pixel_spacing[1]))
+        self.orientation = orientation
+        self.origin = np.asarray(origin, dtype=np.float64)
+        self.slice_vector = np.asarray(slice_vector, dtype=np.float64)
+        # PixelSpacing is (between rows, between columns): column spacing steps x, row spacing steps y
+        self.affine = np.eye(4)
+        self.affine[:3, 0] = row_direction * self.pixel_spacing[1]
+        self.affine[:3, 1] = column_direction * self.pixel_spacing[0]
+        self.affine[:3, 2] = self.slice_vector
+        self.affine[:3, 3] = self.origin
+        self.inverse = np.linalg.inv(self.affine)
+        # mm per voxel along x, y, z; one screen pixel at zoom 1 is the finest in-plane spacing
+        self.spacing = np.linalg.norm(self.affine[:3, :3], axis=0)
+        self.pixel_mm = float(min(self.spacing[0], self.spacing[1]))
+        # The z slider runs towards the head, whichever way the slices are stored
+        self.flipped = (False, False, bool(self.slice_vector @ np.cross(row_direction, column_direction) < 0))
+        self.panels = {plane_name: PanelGeometry(self, plane_name) for plane_name in PANEL_AXES}
+
+    @classmethod
+    def from_positions(cls, shape, pixel_spacing, orientation, first_position, last_position=None, thickness=None):
+        """Geometry from the positions of the first and last slice (the slice vector is their
+        difference over the slice count); a single slice steps `thickness` along the normal"""
+        orientation = np.asarray(DEFAULT_ORIENTATION if orientation is None else orientation, dtype=np.float64)
+        first = np.asarray(first_position if first_position is not None else (0.0, 0.0, 0.0), dtype=np.float64)
+        slice_vector = None
+        if last_position is not None and shape[2] > 1:
+            step = (np.asarray(last_position, dtype=np.float64) - first) / (shape[2] - 1)
+            if np.linalg.norm(step) > 0:
+                slice_vector = step
+        if slice_vector is None:
+            slice_vector = -np.cross(orientation[:3], orientation[3:]) * float(thickness or 1.0)
+        return cls(shape, (1.0, 1.0) if pixel_spacing is None else pixel_spacing, slice_vector, orientation, first)
+
+    @classmethod
+    def from_headers(cls, shape, first, last=None):
+        """Geometry from the DICOM headers of the first and last slice of a single-frame series"""
+        def values(ds, keyword):
+            value = getattr(ds, keyword, None) if ds is not None else None
+            return [float(v) for v in value] if value else None
+        thickness = getattr(first, 'SpacingBetweenSlices', None) or getattr(first, 'SliceThickness', None)
+        return cls.from_positions(shape, values(first, 'PixelSpacing'), values(first, 'ImageOrientationPatient'),
+                                  values(first, 'ImagePositionPatient'), values(last, 'ImagePositionPatient'),
+                                  float(thickness) if thickness else None)
+
+    def to_meta(self):
+        return {'pixel_spacing': list(self.pixel_spacing), 'orientation': self.orientation.tolist(),
+                'origin': self.origin.tolist(), 'slice_vector': self.slice_vector.tolist()}
+
+    @classmethod
+    def from_meta(cls, meta, shape):
+        if not meta:
+            return None
+        try:
+            return cls(shape, meta['pixel_spacing'], meta['slice_vector'], meta['orientation'], meta['origin'])
+        except (KeyError, TypeError, ValueError, np.linalg.LinAlgError) as e:
+            print(f"Error reading cached geometry: {e}")
+            return None
+
+    def voxel_to_patient(self, points):
+        """(N, 3) voxel (x, y, z) -> (N, 3) patient mm"""
+        return np.asarray(points, dtype=np.float64).reshape(-1, 3) @ self.affine[:3, :3].T + self.affine[:3, 3]
+
+    def patient_to_voxel(self, points):
+        """(N, 3) patient mm -> (N, 3) voxel (x, y, z), fractional"""
+        return np.asarray(points, dtype=np.float64).reshape(-1, 3) @ self.inverse[:3, :3].T + self.inverse[:3, 3]
+
+    def patient_projection(self, projection):
+        """A voxel projection (e.g. a panel's screen projection) taking patient mm instead"""
+        return PlaneProjection(projection.matrix @ self.inverse[:3, :3],
+                               projection.matrix @ self.inverse[:3, 3] + projection.offset)
+
+    def panel(self, plane_name):
+        return self.panels[plane_name.upper()]
+
+    def slider_to_index(self, axis, value):
+        """Volume index along a voxel axis for a slider value (sliders run 0..dims - 1)"""
+        index = min(max(int(value), 0), self.dims[axis] - 1)
+        return self.dims[axis] - 1 - index if self.flipped[axis] else index
+
+    def index_to_slider(self, axis, index):
+        return self.slider_to_index(axis, index)
+
+
+class PanelGeometry:
+    """Screen geometry of one plane of a volume: image size, per-axis display scale, and the
+    voxel -> widget pixel projection for the current zoom, pan and widget size"""
+
+    def __init__(self, geometry, plane_name):
+        u, v, depth = PANEL_AXES[plane_name]
+        self.plane_name = plane_name
+        # Image size in voxels and display pixels per voxel at zoom 1
+        self.size = (geometry.dims[u], geometry.dims[v])
+        # (rounded so oblique orientations don't lose a pixel to float noise)
+        self.scale = (round(float(geometry.spacing[u] / geometry.pixel_mm), 6),
+                      round(float(geometry.spacing[v] / geometry.pixel_mm), 6))
+        self.selector = np.zeros((3, 3))
+        self.selector[0, u] = self.selector[1, v] = self.selector[2, depth] = 1.0
+        self.view = None
+        self.projection = None
+
+    def image_size(self, zoom=1.0):
+        """(width, height) of the panel image at a zoom, as zoom_image sizes it"""
+        return (max(1, int(self.size[0] * zoom * self.scale[0])), max(1, int(self.size[1] * zoom * self.scale[1])))
+
+    def image_projection(self, zoom=1.0):
+        """Voxel (x, y, z) -> pixel (u, v) of the zoomed panel image (pixel centres), plus depth in voxels"""
+        width, height = self.image_size(zoom)
+        scale_u, scale_v = width / self.size[0], height / self.size[1]
+        return PlaneProjection(self.selector * [[scale_u], [scale_v], [1.0]], [scale_u / 2, scale_v / 2, 0.0])
+
+    def screen_projection(self, zoom, widget_width, widget_height, pan=(0, 0)):
+        """Voxel (x, y, z) -> widget pixels, with the image centred and panned as ImagePanel paints it.
+
+        The last view's projection is kept, so redraws at the same zoom and pan reuse it (and its
+        key, which ProjectedTrackCache compares).
+        """
+        view = (zoom, widget_width, widget_height, pan[0], pan[1])
+        if view != self.view:
+            width, height = self.image_size(zoom)
+            projection = self.image_projection(zoom)
+            offset = [(widget_width - width) // 2 + pan[0], (widget_height - height) // 2 + pan[1], 0.0]
+            self.projection = PlaneProjection(projection.matrix, projection.offset + offset)
+            self.view = view
+        return self.projection
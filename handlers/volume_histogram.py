@@ -0,0 +1,95 @@
+import numpy as np # type: ignore
+
+# One bin per HU over the range CT scanners produce; values outside are counted in the end bins
+HU_MIN = -2048
+HU_MAX = 4096
+# Clinical window presets as (width, level) in HU
+WINDOW_PRESETS = {
+    "Lung": (1500, -600),
+    "Soft Tissue": (400, 40),
+    "Bone": (1800, 400),
+}
+AUTO_PERCENTILES = (0.5, 99.5)
+
+
+class VolumeHistogram:
+    """HU histogram of a volume, built one slice at a time while it is decoded.
+
+    Also keeps the exact minimum and maximum, so loading needs no extra full-volume pass.
+    Percentiles are read from the cumulative counts, which takes microseconds.
+    """
+
+    def __init__(self, counts=None, minimum=None, maximum=None):
+        self.counts = np.zeros(HU_MAX - HU_MIN, dtype=np.int64) if counts is None else counts
+        self.min = minimum
+        self.max = maximum
+        self.cumulative = None
+
+    def add(self, array):
+        low, high = float(array.min()), float(array.max())
+        self.min = low if self.min is None else min(self.min, low)
+        self.max = high if self.max is None else max(self.max, high)
+        bins = np.clip(array, HU_MIN, HU_MAX - 1).astype(np.int32).ravel() - HU_MIN
+        self.counts += np.bincount(bins, minlength=len(self.counts))
+        self.cumulative = None
+
+    @classmethod
+    def from_volume(cls, volume, chunk_slices=16):
+        """Histogram of an already loaded [y, x, z] volume (series cached before histograms existed)"""
+        histogram = cls()
+        for start in range(0, volume.shape[2], chunk_slices):
+            histogram.add(np.asarray(volume[:, :, start:start + chunk_slices]))
+        return histogram
+
+    def total(self):
+        return int(self.counts.sum())
+
+    def percentile(self, percent):
+        """HU value below which `percent` % of the voxels lie"""
+        if self.cumulative is None:
+            self.cumulative = np.cumsum(self.counts)
+        total = self.cumulative[-1]
+        if not total:
+            return 0.0
+        index = int(np.searchsorted(self.cumulative, total * percent / 100.0))
+        return float(min(max(index + HU_MIN, self.min), self.max))
+
+    def auto_window(self, low=AUTO_PERCENTILES[0], high=AUTO_PERCENTILES[1]):
+        """(min, max) display range between two percentiles, ignoring metal and air outliers"""
+        return self.percentile(low), self.percentile(high) + 1
+
+    def to_meta(self):
+        """JSON-friendly form for the volume cache metadata (zero bins at both ends trimmed)"""
+        used = np.flatnonzero(self.counts)
+        start = int(used[0]) if len(used) else 0
+        stop = int(used[-1]) + 1 if len(used) else 0
+        return {'start': start + HU_MIN, 'counts': self.counts[start:stop].tolist(), 'min': self.min, 'max': self.max}
+
+    @classmethod
+    def from_meta(cls, meta):
+        if not meta:
+            return None
+        try:
+            counts = np.zeros(HU_MAX - HU_MIN, dtype=np.int64)
+            start = int(meta['start']) - HU_MIN
+            values = np.asarray(meta['counts'], dtype=np.int64)
+            counts[start:start + len(values)] = values
+            return cls(counts, meta['min'], meta['max'])
+        except (KeyError, TypeError, ValueError) as e:
+            print(f"Error reading cached histogram: {e}")
+            return None
+
+
+def preset_range(name):
+    """(min, max) HU display range of a window preset"""
+    width, level = WINDOW_PRESETS[name]
+    return level - width / 2, level + width / 2
+
+
+def preset_window(name, histogram=None):
+    """Display range for "Auto" (needs the histogram) or a preset name; None means the full range"""
+    if name in WINDOW_PRESETS:
+        return preset_range(name)
+    if name == "Auto" and histogram is not None:
+        return histogram.auto_window()
+    return None
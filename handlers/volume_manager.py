@@ -0,0 +1,139 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+import numpy as np # type: ignore
+
+DEFAULT_BUDGET_MB = 2048
+# Files derived from a volume (tissue masks...) that live next to it in the cache
+DERIVED_SUFFIXES = (".tissue.npz", ".slices.npz")
+
+
+class VolumeManager:
+    """Keeps several loaded volumes open under a RAM budget.
+
+    Volumes are kept in least-recently-used order. When the in-RAM total exceeds the
+    budget, the oldest volumes are written to ./dicom-folder/.volume-cache/<name>.npy
+    and replaced by a read-only memory map, so switching back needs no DICOM decode.
+    The cache survives restarts and is reused while the source folder is unchanged.
+    """
+
+    def __init__(self, budget_mb=None, cache_dir=None):
+        if budget_mb is None:
+            budget_mb = float(os.environ.get('PUNCTURE_VOLUME_BUDGET_MB', DEFAULT_BUDGET_MB))
+        self.budget_bytes = int(budget_mb * 1024 * 1024)
+        self.cache_dir = cache_dir or os.path.join(os.getcwd(), "dicom-folder", ".volume-cache")
+        self.volumes = OrderedDict()
+        self.lock = threading.RLock()
+
+    def get(self, name, key=None):
+        """Return (volume, meta) for an open or cached series, or (None, None).
+
+        key identifies the source version (e.g. folder path and mtime); a cached volume
+        written for a different key is ignored.
+        """
+        with self.lock:
+            entry = self.volumes.get(name)
+            if entry is None or (key is not None and entry['meta'].get('key') != key):
+                volume, meta = self._load_cached(name, key)
+                if volume is None:
+                    return None, None
+                entry = {'volume': volume, 'meta': meta, 'resident': False}
+                self.volumes[name] = entry
+            self.volumes.move_to_end(name)
+            if not entry['resident'] and entry['volume'].nbytes <= self.budget_bytes:
+                # Promote back into RAM (slicing a memory map across the slice axis is slow),
+                # evicting older volumes if needed
+                entry['volume'] = np.array(entry['volume'])
+                entry['resident'] = True
+                self._enforce_budget(keep=name)
+            return entry['volume'], entry['meta']
+
+    def put(self, name, volume, meta=None):
+        """Register a freshly loaded volume as the most recently used one"""
+        meta = dict(meta or {})
+        meta['shape'] = list(volume.shape)
+        meta['dtype'] = str(volume.dtype)
+        with self.lock:
+            self.volumes[name] = {'volume': volume, 'meta': meta, 'resident': True}
+            self.volumes.move_to_end(name)
+            self._remove_cache_files(name)
+            self._enforce_budget(keep=name)
+
+    def update_meta(self, name, **values):
+        """Attach derived data (statistics, masks paths...) to an open volume"""
+        with self.lock:
+            entry = self.volumes.get(name)
+            if entry is None:
+                return
+            entry['meta'].update(values)
+            if not entry['resident']:
+                self._write_meta(name, entry['meta'])
+
+    def discard(self, name):
+        """Close a series and drop its cache files, including derived ones"""
+        with self.lock:
+            self.volumes.pop(name, None)
+            self._remove_cache_files(name, (".npy", ".json") + DERIVED_SUFFIXES)
+
+    def open_names(self):
+        with self.lock:
+            return list(self.volumes)
+
+    def resident_bytes(self):
+        with self.lock:
+            return sum(entry['volume'].nbytes for entry in self.volumes.values() if entry['resident'])
+
+    def cache_path(self, name, suffix=".npy"):
+        return os.path.join(self.cache_dir, name + suffix)
+
+    def _enforce_budget(self, keep=None):
+        for name in list(self.volumes):
+            if self.resident_bytes() <= self.budget_bytes:
+                return
+            entry = self.volumes[name]
+            if name == keep or not entry['resident']:
+                continue
+            self._evict(name, entry)
+
+    def _evict(self, name, entry):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        npy_path = self.cache_path(name)
+        if not os.path.exists(npy_path):
+            tmp_path = self.cache_path(name, ".tmp.npy")
+            np.save(tmp_path, entry['volume'])
+            os.replace(tmp_path, npy_path)
+        self._write_meta(name, entry['meta'])
+        entry['volume'] = np.load(npy_path, mmap_mode='r')
+        entry['resident'] = False
+
+    def _write_meta(self, name, meta):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        serializable = {k: v for k, v in meta.items() if isinstance(v, (str, int, float, bool, list, dict, type(None)))}
+        with open(self.cache_path(name, ".json"), 'w') as f:
+            json.dump(serializable, f)
+
+    def _load_cached(self, name, key):
+        npy_path = self.cache_path(name)
+        meta_path = self.cache_path(name, ".json")
+        if not (os.path.exists(npy_path) and os.path.exists(meta_path)):
+            return None, None
+        try:
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+            if key is not None and meta.get('key') != key:
+                return None, None
+            return np.load(npy_path, mmap_mode='r'), meta
+        except (OSError, ValueError) as e:
+            print(f"Error reading cached volume '{name}': {e}")
+            return None, None
+
+    def _remove_cache_files(self, name, suffixes=(".npy", ".json")):
+        for suffix in suffixes:
+            path = self.cache_path(name, suffix)
+            try:
+                if os.path.exists(path):
+                    os.remove(path)
+            except OSError as e:
+                # Still memory-mapped somewhere (Windows); it is overwritten on the next eviction
+                print(f"Error removing cached volume '{path}': {e}")
@@ -0,0 +1,159 @@
+import numpy as np # type: ignore
+
+
+def traverse_segments(starts, ends):
+    """Voxels crossed by many line segments at once (3D DDA, Amanatides-Woo order).
+
+    starts/ends are (S, 3) points in voxel units with integer coordinates at voxel centres.
+    Returns (voxels, segment_ids, t_enter): the (M, 3) integer voxels in the order each
+    segment crosses them, the segment each voxel belongs to and the fraction of that
+    segment at which it is entered. Every boundary crossing of every segment is computed
+    in one batch and sorted, instead of stepping voxel by voxel in Python.
+    """
+    starts = np.asarray(starts, dtype=np.float64).reshape(-1, 3) + 0.5
+    ends = np.asarray(ends, dtype=np.float64).reshape(-1, 3) + 0.5
+    delta = ends - starts
+    first = np.floor(starts)
+    last = np.floor(ends)
+    segment_count = len(starts)
+
+    crossing_t = [np.zeros(segment_count)]
+    crossing_segment = [np.arange(segment_count)]
+    for axis in range(3):
+        steps = np.abs(last[:, axis] - first[:, axis]).astype(np.int64)
+        total = int(steps.sum())
+        if total == 0:
+            continue
+        segment = np.repeat(np.arange(segment_count), steps)
+        # k-th boundary crossed along this axis, k = 1..steps for each segment
+        k = np.arange(total) - np.repeat(np.cumsum(steps) - steps, steps) + 1
+        direction = np.sign(delta[segment, axis])
+        boundary = first[segment, axis] + np.where(direction > 0, k, 1 - k)
+        crossing_t.append((boundary - starts[segment, axis]) / delta[segment, axis])
+        crossing_segment.append(segment)
+
+    t = np.concatenate(crossing_t)
+    segment = np.concatenate(crossing_segment)
+    order = np.lexsort((t, segment))
+    t, segment = t[order], segment[order]
+
+    # Each crossing enters a new voxel; sample just after it to find which one
+    following = np.append(t[1:], 1.0)
+    following[np.append(segment[1:] != segment[:-1], True)] = 1.0
+    middle = (t + following) / 2
+    points = starts[segment] + delta[segment] * middle[:, None]
+    voxels = np.floor(points).astype(np.int64)
+    keep = np.ones(len(voxels), dtype=bool)
+    # Crossings of two axes at the same place (through an edge) would repeat the voxel
+    keep[1:] = np.any(voxels[1:] != voxels[:-1], axis=1) | (segment[1:] != segment[:-1])
+    return voxels[keep], segment[keep], t[keep]
+
+
+def path_voxels(points):
+    """Voxels along a polyline, without repeating the voxel shared by consecutive segments"""
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+    if len(points) < 2:
+        return np.floor(points + 0.5).astype(np.int64)
+    voxels, _, _ = traverse_segments(points[:-1], points[1:])
+    keep = np.ones(len(voxels), dtype=bool)
+    keep[1:] = np.any(voxels[1:] != voxels[:-1], axis=1)
+    return voxels[keep]
+
+
+def sample_volume(volume, voxels):
+    """Values of (x, y, z) voxels in a volume indexed [y, x, z] (as loaded by DicomHandler);
+    NaN for voxels outside the volume"""
+    values = np.full(len(voxels), np.nan, dtype=np.float32)
+    if volume is None or not len(voxels):
+        return values
+    x, y, z = voxels[:, 0], voxels[:, 1], voxels[:, 2]
+    inside = ((y >= 0) & (y < volume.shape[0]) & (x >= 0) & (x < volume.shape[1])
+              & (z >= 0) & (z < volume.shape[2]))
+    values[inside] = volume[y[inside], x[inside], z[inside]]
+    return values
+
+
+class NeedlePath:
+    """Voxels and HU values along one route, extended as samples arrive.
+
+    update() traverses only the segments added since the last call, so the cost per new
+    sample is the few voxels it crosses; the volume itself is only indexed at those voxels.
+    Voxels, distances and HU values are appended to arrays whose capacity doubles when full
+    (like TrackBuffer), so reading the path or its tip never copies it.
+    """
+
+    def __init__(self, volume=None, capacity=1024):
+        self.volume = volume
+        self.capacity = capacity
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.last_point = None
+        self.length = 0.0
+        self.size = 0
+        self.voxel_data = np.empty((self.capacity, 3), dtype=np.int64)
+        self.distance_data = np.empty(self.capacity)
+        self.value_data = np.empty(self.capacity, dtype=np.float32)
+
+    def set_volume(self, volume):
+        self.volume = volume
+        self.reset()
+
+    def update(self, points):
+        """points: the whole (N, 3) route; returns the number of new voxels"""
+        if len(points) < self.count:
+            self.reset()
+        # Only the new samples are converted; the track may hold many thousands
+        new = np.asarray(points[self.count:], dtype=np.float64).reshape(-1, 3)
+        if not len(new):
+            return 0
+        self.count = len(points)
+        if self.last_point is None:
+            path = new
+        else:
+            path = np.vstack([self.last_point[None, :], new])
+        self.last_point = path[-1].copy()
+        if len(path) < 2:
+            voxels = np.floor(path + 0.5).astype(np.int64)
+            distance = np.zeros(len(voxels))
+        else:
+            voxels, segment, t = traverse_segments(path[:-1], path[1:])
+            lengths = np.linalg.norm(np.diff(path, axis=0), axis=1)
+            distance = self.length + np.concatenate([[0], np.cumsum(lengths)[:-1]])[segment] + t * lengths[segment]
+            self.length += float(lengths.sum())
+        # Drop the voxel each segment shares with the one before it (also across updates)
+        previous = np.vstack([self.voxel_data[self.size - 1:self.size] if self.size else np.full((1, 3), -2**62),
+                              voxels[:-1]])
+        keep = np.any(voxels != previous, axis=1)
+        voxels, distance = voxels[keep], distance[keep]
+        if len(voxels):
+            self._append(voxels, distance, sample_volume(self.volume, voxels))
+        return len(voxels)
+
+    def _append(self, voxels, distance, values):
+        needed = self.size + len(voxels)
+        if needed > len(self.distance_data):
+            capacity = max(needed, 2 * len(self.distance_data))
+            for name in ('voxel_data', 'distance_data', 'value_data'):
+                data = getattr(self, name)
+                grown = np.empty((capacity,) + data.shape[1:], dtype=data.dtype)
+                grown[:self.size] = data[:self.size]
+                setattr(self, name, grown)
+        self.voxel_data[self.size:needed] = voxels
+        self.distance_data[self.size:needed] = distance
+        self.value_data[self.size:needed] = values
+        self.size = needed
+
+    def voxels(self):
+        return self.voxel_data[:self.size]
+
+    def profile(self):
+        """(distance along the route in voxels, HU) at every voxel entered"""
+        return self.distance_data[:self.size], self.value_data[:self.size]
+
+    def tip(self):
+        """(voxel, HU) of the last voxel entered, or None before the first sample"""
+        if not self.size:
+            return None
+        return self.voxel_data[self.size - 1], float(self.value_data[self.size - 1])
@@ -0,0 +1,173 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+
+# Stages a real-time sample passes through, in order. "write" comes from the timestamp
+# column the tracker (or realtimecsv.py) appends to each row; the rest are stamped here.
+STAGES = ("write", "parse", "callback", "cache", "paint", "gl_draw")
+DISPLAY_STAGES = ("paint", "gl_draw")
+HISTOGRAM_EDGES_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000)
+WINDOW_SIZE = 5000
+
+_enabled = os.environ.get('PUNCTURE_TRACE_LATENCY') == '1'
+_threshold_ms = float(os.environ.get('PUNCTURE_LATENCY_P99_MS', 100))
+_lock = threading.Lock()
+_traces = {}
+_marked_upto = {}
+_latencies = deque(maxlen=WINDOW_SIZE)
+_stage_deltas = {stage: deque(maxlen=WINDOW_SIZE) for stage in STAGES[1:]}
+_active_displays = {"paint"}
+_alarm_callbacks = []
+_alarm_active = False
+
+
+def enable(enabled=True):
+    global _enabled
+    _enabled = enabled
+
+
+def is_enabled():
+    return _enabled
+
+
+def set_threshold_ms(threshold_ms):
+    global _threshold_ms
+    _threshold_ms = float(threshold_ms)
+
+
+def set_active_displays(stages):
+    """Display stages a sample must reach to count as on screen (no VisPy canvas -> paint only)"""
+    global _active_displays
+    _active_displays = set(stages)
+
+
+def add_alarm_callback(callback):
+    """callback(active, p99_ms) is called whenever the p99 alarm turns on or off"""
+    _alarm_callbacks.append(callback)
+
+
+def mark(sample_id, stage, timestamp=None):
+    """Stamp one sample at a stage (wall clock, so the writer process can share the clock)"""
+    if not _enabled:
+        return
+    with _lock:
+        trace = _traces.get(sample_id)
+        if trace is None:
+            if len(_traces) >= WINDOW_SIZE:
+                # Samples that never reached the screen (e.g. overlay deleted); drop the oldest
+                del _traces[min(_traces)]
+            trace = _traces[sample_id] = {}
+        trace.setdefault(stage, time.time() if timestamp is None else timestamp)
+
+
+def mark_upto(last_sample_id, stage):
+    """Stamp every sample up to last_sample_id that has not reached this stage yet.
+
+    Used by paint/draw handlers: one repaint shows all samples received since the last one.
+    """
+    if not _enabled or last_sample_id is None:
+        return
+    now = time.time()
+    completed = []
+    with _lock:
+        first = _marked_upto.get(stage, -1) + 1
+        for sample_id in range(first, last_sample_id + 1):
+            trace = _traces.get(sample_id)
+            if trace is None:
+                continue
+            trace.setdefault(stage, now)
+            if all(s in trace for s in _active_displays):
+                completed.append(sample_id)
+        _marked_upto[stage] = max(_marked_upto.get(stage, -1), last_sample_id)
+        for sample_id in completed:
+            _complete(sample_id, _traces.pop(sample_id))
+    if completed:
+        _check_alarm()
+
+
+def _complete(sample_id, trace):
+    start = trace.get("write", trace.get("parse"))
+    end = max(trace[s] for s in DISPLAY_STAGES if s in trace)
+    _latencies.append((end - start) * 1000)
+    previous = trace.get("write")
+    for stage in STAGES[1:]:
+        if stage in trace and previous is not None:
+            _stage_deltas[stage].append((trace[stage] - previous) * 1000)
+        previous = trace.get(stage, previous)
+
+
+def reset():
+    """Forget all in-flight traces, e.g. when the real-time point list is cleared"""
+    with _lock:
+        _traces.clear()
+        _marked_upto.clear()
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def summary():
+    with _lock:
+        latencies = list(_latencies)
+        deltas = {stage: list(values) for stage, values in _stage_deltas.items()}
+    counts = [0] * (len(HISTOGRAM_EDGES_MS) + 1)
+    for value in latencies:
+        index = 0
+        while index < len(HISTOGRAM_EDGES_MS) and value > HISTOGRAM_EDGES_MS[index]:
+            index += 1
+        counts[index] += 1
+    return {
+        'samples': len(latencies),
+        'p50_ms': percentile(latencies, 0.50),
+        'p95_ms': percentile(latencies, 0.95),
+        'p99_ms': percentile(latencies, 0.99),
+        'max_ms': max(latencies) if latencies else 0.0,
+        'threshold_ms': _threshold_ms,
+        'alarm': _alarm_active,
+        'histogram': {'edges_ms': list(HISTOGRAM_EDGES_MS), 'counts': counts},
+        'stage_p50_ms': {stage: percentile(values, 0.50) for stage, values in deltas.items() if values},
+        'stage_p99_ms': {stage: percentile(values, 0.99) for stage, values in deltas.items() if values},
+    }
+
+
+def format_summary():
+    s = summary()
+    lines = [f"Latency write->screen: n={s['samples']} p50={s['p50_ms']:.1f} p95={s['p95_ms']:.1f} "
+             f"p99={s['p99_ms']:.1f} max={s['max_ms']:.1f} ms" + ("  ALARM" if s['alarm'] else "")]
+    peak = max(s['histogram']['counts']) or 1
+    labels = [f"<={edge}" for edge in HISTOGRAM_EDGES_MS] + [f">{HISTOGRAM_EDGES_MS[-1]}"]
+    for label, count in zip(labels, s['histogram']['counts']):
+        lines.append(f"{label:>7} ms {'#' * int(30 * count / peak):<30} {count}")
+    stages = " ".join(f"{stage}={value:.1f}" for stage, value in s['stage_p50_ms'].items())
+    lines.append(f"stage p50 (ms since previous stage): {stages}")
+    return "\n".join(lines)
+
+
+def export(path=None):
+    if path is None:
+        folder = os.path.join(os.getcwd(), "perf-logs")
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, time.strftime("latency-%Y%m%d-%H%M%S.json"))
+    with _lock:
+        latencies = [round(value, 3) for value in _latencies]
+    with open(path, 'w') as f:
+        json.dump({'summary': summary(), 'latencies_ms': latencies}, f, indent=1)
+    return path
+
+
+def _check_alarm():
+    global _alarm_active
+    with _lock:
+        recent = list(_latencies)[-500:]
+    p99 = percentile(recent, 0.99)
+    active = len(recent) >= 20 and p99 > _threshold_ms
+    if active != _alarm_active:
+        _alarm_active = active
+        for callback in _alarm_callbacks:
+            callback(active, p99)
@@ -0,0 +1,83 @@
+import importlib
+import sys
+import time
+import types
+
+_lazy_enabled = False
+_import_times = {}
+_startup_time = time.perf_counter()
+
+
+def enable_lazy_imports(enabled=True):
+    """Defer heavy imports (pydicom, PIL, vispy) until their first attribute access"""
+    global _lazy_enabled
+    _lazy_enabled = enabled
+
+
+def lazy_imports_enabled():
+    return _lazy_enabled
+
+
+def timed_import(name):
+    """Import a module and record how long the import took"""
+    if name in sys.modules:
+        return sys.modules[name]
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    elapsed = time.perf_counter() - start
+    _import_times[name] = {
+        'seconds': elapsed,
+        'at': start - _startup_time,
+        'deferred': _lazy_enabled,
+    }
+    return module
+
+
+class LazyModule(types.ModuleType):
+    """Module placeholder that performs the real import on first attribute access"""
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.__dict__['_lazy_module'] = None
+
+    def _load(self):
+        module = self.__dict__['_lazy_module']
+        if module is None:
+            module = timed_import(self.__name__)
+            self.__dict__['_lazy_module'] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+
+def lazy_import(name):
+    """Return the module, or a LazyModule placeholder when lazy imports are enabled"""
+    if _lazy_enabled and name not in sys.modules:
+        return LazyModule(name)
+    return timed_import(name)
+
+
+def record_import(name, start):
+    """Record the cost of an import done outside lazy_import (e.g. the main window module)"""
+    _import_times[name] = {
+        'seconds': time.perf_counter() - start,
+        'at': start - _startup_time,
+        'deferred': False,
+    }
+
+
+def startup_report():
+    """Build a per-module import cost report, most expensive first"""
+    lines = ["Startup import report ({} mode)".format("lazy" if _lazy_enabled else "eager")]
+    total = 0.0
+    for name, info in sorted(_import_times.items(), key=lambda item: item[1]['seconds'], reverse=True):
+        total += info['seconds']
+        when = "deferred" if info['deferred'] else "startup"
+        lines.append(f"  {name:<32} {info['seconds'] * 1000:9.1f} ms  ({when}, t+{info['at']:.2f}s)")
+    lines.append(f"  {'sum (nested imports overlap)':<32} {total * 1000:9.1f} ms")
+    lines.append(f"  time since launch: {time.perf_counter() - _startup_time:.2f}s")
+    return "\n".join(lines)
@@ -1,9 +1,41 @@
+import os
 import sys
+import time
 from PyQt5.QtWidgets import QApplication
-from gui.main_window import MainWindow
+from PyQt5.QtCore import QTimer
+import lazy_imports
+import perf_probes
+import latency_tracer
 
 if __name__ == '__main__':
-    app = QApplication(sys.argv)
+    # --lazy-imports (or PUNCTURE_LAZY_IMPORTS=1) defers pydicom/PIL/vispy until first use,
+    # --startup-report prints the per-module import cost once the window is up and again on exit,
+    # --profile (or PUNCTURE_PROFILE=1) turns on the hot-path timing probes and saves them on exit,
+    # --trace-latency (or PUNCTURE_TRACE_LATENCY=1) traces each real-time sample from CSV write to screen.
+    lazy = '--lazy-imports' in sys.argv or os.environ.get('PUNCTURE_LAZY_IMPORTS') == '1'
+    report = '--startup-report' in sys.argv
+    profile = '--profile' in sys.argv or perf_probes.is_enabled()
+    trace_latency = '--trace-latency' in sys.argv or latency_tracer.is_enabled()
+    argv = [arg for arg in sys.argv if arg not in ('--lazy-imports', '--startup-report', '--profile', '--trace-latency')]
+    lazy_imports.enable_lazy_imports(lazy)
+    perf_probes.enable(profile)
+    latency_tracer.enable(trace_latency)
+
+    start = time.perf_counter()
+    from gui.main_window import MainWindow
+    lazy_imports.record_import('gui.main_window', start)
+
+    app = QApplication(argv)
     main_window = MainWindow()
     main_window.show()
-    sys.exit(app.exec_())
\ No newline at end of file
+    # Closing the recording writes its chunk index
+    app.aboutToQuit.connect(main_window.stop_session_recording)
+    if report:
+        QTimer.singleShot(0, lambda: print(lazy_imports.startup_report()))
+        app.aboutToQuit.connect(lambda: print(lazy_imports.startup_report()))
+    if profile:
+        app.aboutToQuit.connect(lambda: print(f"Performance log written to {perf_probes.export()}"))
+    if trace_latency:
+        app.aboutToQuit.connect(lambda: print(latency_tracer.format_summary()))
+        app.aboutToQuit.connect(lambda: print(f"Latency trace written to {latency_tracer.export()}"))
+    sys.exit(app.exec_())
@@ -0,0 +1,133 @@
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+WINDOW_SIZE = 2000  # samples kept per probe for the rolling percentiles
+
+_enabled = os.environ.get('PUNCTURE_PROFILE') == '1'
+_samples = {}
+_counts = {}
+_lock = threading.Lock()
+_started = time.perf_counter()
+
+
+def enable(enabled=True):
+    global _enabled
+    _enabled = enabled
+
+
+def is_enabled():
+    return _enabled
+
+
+def record(name, seconds):
+    with _lock:
+        samples = _samples.get(name)
+        if samples is None:
+            samples = _samples[name] = deque(maxlen=WINDOW_SIZE)
+            _counts[name] = 0
+        samples.append((time.perf_counter(), seconds))
+        _counts[name] += 1
+
+
+def probe(name):
+    """Decorator timing every call while probes are enabled; a single flag check otherwise"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+class _Section:
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class _NullSection:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SECTION = _NullSection()
+
+
+def section(name):
+    """Context manager timing a block of code, e.g. one iteration of the CSV reader loop"""
+    if not _enabled:
+        return _NULL_SECTION
+    return _Section(name)
+
+
+def stats():
+    """Rolling percentiles (in ms) and call rate for every probe"""
+    now = time.perf_counter()
+    with _lock:
+        snapshot = {name: list(samples) for name, samples in _samples.items()}
+        counts = dict(_counts)
+    result = {}
+    for name, samples in snapshot.items():
+        durations = sorted(seconds for _, seconds in samples)
+        n = len(durations)
+        span = now - samples[0][0] if n > 1 else 0
+        result[name] = {
+            'count': counts[name],
+            'p50': durations[n // 2] * 1000,
+            'p95': durations[min(n - 1, int(n * 0.95))] * 1000,
+            'p99': durations[min(n - 1, int(n * 0.99))] * 1000,
+            'max': durations[-1] * 1000,
+            'per_second': (n - 1) / span if span > 0 else 0.0,
+        }
+    return result
+
+
+def format_stats():
+    lines = [f"{'probe':<28}{'p50':>8}{'p95':>8}{'p99':>8}{'max':>8}{'/s':>7}"]
+    for name, s in sorted(stats().items()):
+        lines.append(f"{name:<28}{s['p50']:8.2f}{s['p95']:8.2f}{s['p99']:8.2f}{s['max']:8.2f}{s['per_second']:7.1f}")
+    return "\n".join(lines)
+
+
+def export(path=None):
+    """Write the rolling statistics and raw samples to a JSON file and return its path"""
+    if path is None:
+        folder = os.path.join(os.getcwd(), "perf-logs")
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, time.strftime("perf-%Y%m%d-%H%M%S.json"))
+    with _lock:
+        raw = {name: [[round(t - _started, 6), round(seconds * 1000, 4)] for t, seconds in samples]
+               for name, samples in _samples.items()}
+    with open(path, 'w') as f:
+        json.dump({'stats_ms': stats(), 'samples_ms': raw}, f, indent=1)
+    return path
+
+
+def reset():
+    with _lock:
+        _samples.clear()
+        _counts.clear()
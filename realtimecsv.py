@@ -1,26 +1,279 @@
+"""Tracker simulator: generates or replays needle positions for the real-time route.
+
+Examples:
+    python realtimecsv.py                                   # y = 179..319 in steps of 10, one every 5 s
+    python realtimecsv.py generate --rate 500 --duration 60 --jitter-ms 0.5 --burst-prob 0.02
+    python realtimecsv.py generate --rate 1000 --count 20000 --transport tcp --address 127.0.0.1:5005
+    python realtimecsv.py replay recorded.csv --speed 1
+    python realtimecsv.py replay recorded.csv --fast --output stress.csv
+
+Every row is "x,y,z,timestamp" (timestamp in epoch seconds, used by --trace-latency).
+Transports: file (default, kept open and flushed per row), pipe (stdout or a named FIFO),
+tcp, udp and unix (local sockets) and shm (shared-memory ring buffer). Sockets and shm carry
+packed binary records (float32 x, y, z + float64 timestamp, see handlers/realtime_sources.py).
+"""
+import argparse
 import csv
+import os
+import socket
+import sys
 import time
+import numpy as np # type: ignore
+from handlers.realtime_sources import RECORD_DTYPE, SharedMemoryRing, DEFAULT_RING_NAME
 
-def generate_random_values(start_y, end_y, step_y):
-    x = 256
-    z = 83
-    return x, z
-
-def write_to_csv(filename, start_y, end_y, step_y):
-    y = start_y
-    while y <= end_y:
-        x, z = generate_random_values(start_y, end_y, step_y)
-        with open(filename, mode='a', newline='') as file:
-            writer = csv.writer(file)
-            writer.writerow([x, y, z])
-        print(f'Written values: x={x}, y={y}, z={z}')
-        y += step_y
-        time.sleep(5)
 
-if __name__ == "__main__":
-    # Create the file and clear any existing content
-    filename = 'realtime.csv'
-    with open(filename, mode='w', newline='') as file:
+def needle_trajectory(start, end, count, rng, noise=0.3, bend=4.0, breathing=1.5, rate=1.0, pauses=True):
+    """Realistic insertion from start to end: uneven advance with pauses and small retractions,
+    bending that grows with depth, breathing motion along z and sensor noise (all in voxels)"""
+    start = np.asarray(start, dtype=np.float64)
+    end = np.asarray(end, dtype=np.float64)
+    direction = end - start
+    length = np.linalg.norm(direction)
+    direction = direction / length if length > 0 else np.array([0.0, 0.0, 1.0])
+
+    # Depth fraction: positive steps with random speed, occasional pauses and retractions
+    steps = rng.gamma(2.0, 1.0, size=count)
+    if pauses:
+        steps[rng.random(count) < 0.03] = 0.0
+        retract = rng.random(count) < 0.01
+        steps[retract] = -rng.uniform(1.0, 4.0, size=retract.sum())
+    depth = np.clip(np.cumsum(steps), 0, None)
+    depth = depth / depth.max() if depth.max() > 0 else depth
+
+    # Two unit vectors perpendicular to the insertion direction
+    helper = np.array([1.0, 0.0, 0.0]) if abs(direction[0]) < 0.9 else np.array([0.0, 1.0, 0.0])
+    perp_a = np.cross(direction, helper)
+    perp_a /= np.linalg.norm(perp_a)
+    perp_b = np.cross(direction, perp_a)
+    angle = rng.uniform(0, 2 * np.pi)
+    bend_direction = np.cos(angle) * perp_a + np.sin(angle) * perp_b
+
+    t = np.arange(count) / rate
+    points = start + np.outer(depth * length, direction)
+    points += np.outer(bend * depth ** 2, bend_direction)
+    points[:, 2] += breathing * np.sin(2 * np.pi * 0.25 * t)
+    points += rng.normal(0, noise, size=points.shape)
+    return points
+
+
+def linear_trajectory(start, end, step):
+    """Points every `step` voxels from start towards end, stopping at or before end"""
+    start = np.asarray(start, dtype=np.float64)
+    direction = np.asarray(end, dtype=np.float64) - start
+    length = np.linalg.norm(direction)
+    if length == 0 or step <= 0:
+        return start[np.newaxis]
+    return start + np.outer(np.arange(int(length // step) + 1) * step, direction / length)
+
+
+def sample_times(count, rate, rng, jitter_ms=0.0, burst_prob=0.0, burst_size=8):
+    """Send times (seconds from start) at the nominal rate, with jitter and bursts of
+    back-to-back samples as produced by buffering trackers"""
+    times = np.arange(count) / rate
+    if jitter_ms > 0:
+        times = times + rng.normal(0, jitter_ms / 1000.0, size=count)
+    if burst_prob > 0:
+        index = 0
+        while index < count:
+            if rng.random() < burst_prob:
+                stop = min(count, index + burst_size)
+                times[index:stop] = times[stop - 1]
+                index = stop
+            else:
+                index += 1
+    return np.maximum.accumulate(np.clip(times, 0, None))
+
+
+def load_recording(path):
+    """Read a recorded CSV (x,y,z[,timestamp]); returns points and relative times (or None)"""
+    rows = []
+    with open(path, newline='') as f:
+        for row in csv.reader(f):
+            if row:
+                rows.append([float(value) for value in row])
+    if not rows:
+        return np.zeros((0, 3)), None
+    width = min(len(row) for row in rows)
+    data = np.array([row[:width] for row in rows])
+    times = data[:, 3] - data[0, 3] if width > 3 else None
+    return data[:, :3], times
+
+
+class FileTransport:
+    def __init__(self, path, append=False):
+        self.file = open(path, 'a' if append else 'w', newline='')
+        self.writer = csv.writer(self.file)
+
+    def send(self, x, y, z, timestamp):
+        self.writer.writerow([f"{x:.3f}", f"{y:.3f}", f"{z:.3f}", f"{timestamp:.6f}"])
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class PipeTransport(FileTransport):
+    def __init__(self, path=None):
+        if path is None or path == '-':
+            self.file = sys.stdout
+        else:
+            if not os.path.exists(path):
+                if not hasattr(os, 'mkfifo'):
+                    raise SystemExit("Named pipes need a POSIX system; on Windows use --transport pipe without "
+                                     "--address (stdout), or tcp, udp or shm")
+                os.mkfifo(path)
+            print(f"Waiting for a reader on {path}...", file=sys.stderr)
+            self.file = open(path, 'w', newline='')
+        self.writer = csv.writer(self.file)
+
+    def close(self):
+        if self.file is not sys.stdout:
+            self.file.close()
+
+
+class SocketTransport:
+    def __init__(self, kind, address):
+        if kind == 'unix':
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.connect(address)
+            self.target = None
+        else:
+            host, port = address.rsplit(':', 1)
+            target = (host, int(port))
+            sock_type = socket.SOCK_DGRAM if kind == 'udp' else socket.SOCK_STREAM
+            self.sock = socket.socket(socket.AF_INET, sock_type)
+            if kind == 'tcp':
+                self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                self.sock.connect(target)
+                self.target = None
+            else:
+                self.target = target
+
+    def send(self, x, y, z, timestamp):
+        record = np.array([(x, y, z, timestamp)], dtype=RECORD_DTYPE).tobytes()
+        if self.target is None:
+            self.sock.sendall(record)
+        else:
+            self.sock.sendto(record, self.target)
+
+    def close(self):
+        self.sock.close()
+
+
+class SharedMemoryTransport:
+    def __init__(self, name=None):
+        self.ring = SharedMemoryRing(name or DEFAULT_RING_NAME, create=True)
+
+    def send(self, x, y, z, timestamp):
+        self.ring.write(x, y, z, timestamp)
+
+    def close(self):
+        # Give readers a moment to drain the ring before the segment is unlinked
+        time.sleep(0.5)
+        self.ring.close()
+
+
+def open_transport(args):
+    if args.transport == 'file':
+        return FileTransport(args.output, append=args.append)
+    if args.transport == 'pipe':
+        return PipeTransport(args.address)
+    if args.transport == 'shm':
+        return SharedMemoryTransport(args.address)
+    return SocketTransport(args.transport, args.address)
+
+
+def stream(points, times, transport, speed=1.0, fast=False, verbose=False):
+    """Send points at their scheduled times (divided by speed), or back-to-back when fast"""
+    start = time.perf_counter()
+    late = 0
+    for index, (x, y, z) in enumerate(points):
+        if not fast and times is not None:
+            due = start + times[index] / speed
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            elif delay < -0.001:
+                late += 1
+        transport.send(x, y, z, time.time())
+        if verbose:
+            print(f'Written values: x={x:.1f}, y={y:.1f}, z={z:.1f}', file=sys.stderr)
+    elapsed = time.perf_counter() - start
+    rate = len(points) / elapsed if elapsed > 0 else float('inf')
+    print(f"Sent {len(points)} samples in {elapsed:.2f}s ({rate:.0f}/s, {late} more than 1 ms late)",
+          file=sys.stderr)
+
+
+def parse_point(text):
+    return [float(value) for value in text.split(',')]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Needle tracker simulator and replayer")
+    sub = parser.add_subparsers(dest='command')
+
+    def add_output_options(p):
+        p.add_argument('--transport', choices=['file', 'pipe', 'tcp', 'udp', 'unix', 'shm'], default='file')
+        p.add_argument('--output', default='realtime.csv', help="CSV path for the file transport")
+        p.add_argument('--append', action='store_true', help="append instead of truncating the CSV")
+        p.add_argument('--address', help="host:port for tcp/udp, socket path for unix, FIFO path for pipe, ring name for shm")
+        p.add_argument('--verbose', action='store_true')
+
+    gen = sub.add_parser('generate', help="synthesize a needle insertion")
+    gen.add_argument('--start', type=parse_point, default=[256, 179, 83], help="entry point x,y,z")
+    gen.add_argument('--end', type=parse_point, default=[256, 320, 83], help="target point x,y,z")
+    gen.add_argument('--rate', type=float, default=0.2, help="samples per second (0.2 to 1000)")
+    gen.add_argument('--count', type=int, default=None, help="number of samples")
+    gen.add_argument('--step', type=float, default=None,
+                     help="advance a fixed number of voxels per sample in a straight line (no noise, pauses or "
+                          "bending); the count follows from the route length")
+    gen.add_argument('--duration', type=float, default=None, help="seconds to generate (instead of --count)")
+    gen.add_argument('--jitter-ms', type=float, default=0.0, help="timing jitter standard deviation")
+    gen.add_argument('--burst-prob', type=float, default=0.0, help="chance a sample starts a burst")
+    gen.add_argument('--burst-size', type=int, default=8)
+    gen.add_argument('--noise', type=float, default=0.3, help="sensor noise (voxels)")
+    gen.add_argument('--bend', type=float, default=4.0, help="needle deflection at full depth (voxels)")
+    gen.add_argument('--breathing', type=float, default=1.5, help="breathing amplitude along z (voxels)")
+    gen.add_argument('--seed', type=int, default=None)
+    gen.add_argument('--fast', action='store_true', help="send as fast as possible")
+    add_output_options(gen)
+
+    rep = sub.add_parser('replay', help="replay a recorded session")
+    rep.add_argument('recording')
+    rep.add_argument('--speed', type=float, default=1.0, help="1 = original pacing, 2 = twice as fast")
+    rep.add_argument('--rate', type=float, default=10.0, help="pacing when the recording has no timestamps")
+    rep.add_argument('--fast', action='store_true', help="send as fast as possible")
+    add_output_options(rep)
+
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        # Original behaviour: x=256, z=83, y=179..319 in steps of 10, one row every 5 seconds
+        argv = ['generate', '--step', '10', '--verbose']
+    args = parser.parse_args(argv)
+
+    if args.command == 'generate':
+        rng = np.random.default_rng(args.seed)
+        if args.step:
+            points = linear_trajectory(args.start, args.end, args.step)
+            count = len(points)
+        else:
+            count = args.count or int((args.duration or 60) * args.rate)
+            points = needle_trajectory(args.start, args.end, count, rng, args.noise, args.bend, args.breathing,
+                                       args.rate, pauses=count > 50)
+        times = sample_times(count, args.rate, rng, args.jitter_ms, args.burst_prob, args.burst_size)
+    else:
+        points, times = load_recording(args.recording)
+        if times is None:
+            times = np.arange(len(points)) / args.rate
+
+    transport = open_transport(args)
+    try:
+        stream(points, times, transport, getattr(args, 'speed', 1.0), args.fast, args.verbose)
+    except KeyboardInterrupt:
         pass
+    finally:
+        transport.close()
 
-    write_to_csv(filename, start_y=179, end_y=320, step_y=10)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Render panel images of DICOM series without the GUI.
+
+Examples:
+    python render_headless.py S1 S2 --output renders
+    python render_headless.py /data/ct/case7 --planes XY --positions 0.25 0.5 0.75 --window Lung
+    python render_headless.py S1 --plan plan.csv --track realtime.csv --zoom 2 --format raw --output renders
+"""
+import argparse
+import sys
+from handlers.headless_renderer import render_batch
+from handlers.slab_renderer import SLAB_MODES
+from handlers.volume_histogram import WINDOW_PRESETS
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless batch rendering of XY/YZ/XZ panels")
+    parser.add_argument('studies', nargs='+', help="series names from ./dicom-folder/ or DICOM folder paths")
+    parser.add_argument('--planes', nargs='+', choices=['XY', 'YZ', 'XZ'], default=['XY', 'YZ', 'XZ'])
+    parser.add_argument('--positions', nargs='+', type=float, default=[0.5],
+                        help="slice positions as fractions of each axis (0 = first slice, 1 = last)")
+    parser.add_argument('--window', choices=['Full Range', 'Auto', *WINDOW_PRESETS], default='Auto')
+    parser.add_argument('--brightness', type=float, default=0)
+    parser.add_argument('--contrast', type=float, default=1.0)
+    parser.add_argument('--zoom', type=float, default=1.0)
+    parser.add_argument('--slab-mode', choices=['Slice', *SLAB_MODES], default='Slice')
+    parser.add_argument('--slab-thickness', type=int, default=1)
+    parser.add_argument('--plan', help="planned route CSV (entry and target rows)")
+    parser.add_argument('--track', action='append', default=[], help="real-time route CSV (repeat for more needles)")
+    parser.add_argument('--overlay-slab', type=float, default=0,
+                        help="draw routes only within this many voxels of the slice (0 = whole route)")
+    parser.add_argument('--format', choices=['png', 'raw'], default='png')
+    parser.add_argument('--output', default='renders')
+    parser.add_argument('--workers', type=int, default=None, help="processes (default: one per CPU)")
+    args = parser.parse_args(argv)
+
+    results = render_batch(args.studies, args.workers, planes=args.planes, positions=args.positions,
+                           window=args.window, brightness=args.brightness, contrast=args.contrast, zoom=args.zoom,
+                           slab_mode=args.slab_mode, slab_thickness=args.slab_thickness, plan_path=args.plan,
+                           track_paths=args.track, overlay_slab=args.overlay_slab, output_dir=args.output,
+                           image_format=args.format)
+    failed = [study for study, (_, error) in results.items() if error]
+    written = sum(len(outputs) for outputs, _ in results.values())
+    print(f"Wrote {written} images for {len(results) - len(failed)} series to {args.output}", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())